@@ -4,7 +4,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.shortcuts import redirect, render
 
+from pizzeria.query_budget import query_budget
 
+
+@query_budget(4)
 def create_account(request):
     """
     Allows a site user to create a new account using the UserCreationForm
@@ -36,6 +39,7 @@ def create_account(request):
     return render(request, 'accounts/create_account.html', {'form': form})
 
 
+@query_budget(6)
 def login_user(request):
     """
     Allows a user to login to the site with valid credentials
@@ -59,6 +63,7 @@ def login_user(request):
     return render(request, 'accounts/login.html', {'form': form})
 
 
+@query_budget(4)
 @login_required
 def logout_user(request):
     """
@@ -0,0 +1,18 @@
+"""
+ASGI config for pizzeria project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server such as Uvicorn, for example
+``uvicorn pizzeria.asgi:application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pizzeria.settings')
+
+application = get_asgi_application()
@@ -0,0 +1,53 @@
+"""
+Helpers for serving views from the event loop when running under ASGI.
+
+stream_content keeps streamed responses streaming under ASGI, where Django
+would otherwise read a synchronous iterator to the end before sending any
+of it.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+# How many parts of a streamed response are read in each trip to a thread
+STREAM_BATCH_SIZE = 100
+
+
+def stream_content(request, content):
+    """
+    Gets the content of a streamed response ready for the server in use
+
+    :param request: Standard Django request object
+    :param content: An iterable of strings or bytes
+    :return:
+        The content itself under WSGI, or an async generator reading it in
+        batches from a thread under ASGI
+    """
+    if not isinstance(request, ASGIRequest):
+        return content
+
+    return iterate_in_thread(iter(content))
+
+
+async def iterate_in_thread(iterator):
+    """
+    Reads a synchronous iterator from a thread, a batch at a time
+
+    The same thread as the view is used, so database cursors opened by the
+    view can still be read.
+
+    :param iterator: An iterator that may query the database
+    :return: An async generator of the iterator's parts
+    """
+    read_batch = sync_to_async(
+        lambda: list(islice(iterator, STREAM_BATCH_SIZE))
+    )
+
+    while True:
+        batch = await read_batch()
+        if not batch:
+            break
+
+        for part in batch:
+            yield part
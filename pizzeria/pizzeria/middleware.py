@@ -0,0 +1,278 @@
+"""
+Measures where each request spends its time, cheaply enough to leave on.
+
+For a sample of requests, PerformanceMiddleware records the total time, the
+time spent in SQL, how many queries ran and how many of them were repeats,
+and the time spent rendering templates. The numbers are sent back in a
+Server-Timing header, written to the 'pizzeria.performance' logger as JSON
+and added to per URL name histograms, read through the
+'internal/performance/' page. Template rendering is timed by the
+template backend in pizzeria/template_backends.py.
+
+It works under both WSGI and ASGI. Under ASGI, Django runs synchronous views
+in another thread, so the recorder is kept in a context variable, which
+follows the request into it, and every database connection passes its
+queries to the recorder of the request being handled.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('pizzeria.performance')
+
+# The recorder for the request being handled, if it was sampled
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class RequestRecorder:
+    """Adds up the time a single request spends in SQL and templates"""
+
+    def __init__(self):
+        """Starts with nothing recorded"""
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.seen_queries = set()
+        self.duplicate_queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Times a query, used as a database execute wrapper
+
+        :return: Whatever the query returns
+        """
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started_at
+            self.queries += 1
+
+            # The same SQL with the same parameters is a repeated query
+            key = (sql, repr(params))
+            if key in self.seen_queries:
+                self.duplicate_queries += 1
+            else:
+                self.seen_queries.add(key)
+
+
+class LatencyHistograms:
+    """Counts how long the requests to each URL name took, in buckets"""
+
+    # The upper bound of each bucket, in milliseconds
+    BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+    def __init__(self):
+        """Starts with no requests counted"""
+        self.lock = threading.Lock()
+        self.url_names = {}
+
+    def record(self, url_name: str, total_ms: float, sql_ms: float,
+               queries: int):
+        """
+        Counts a request
+
+        :param url_name: The name of the URL pattern that was matched
+        :param total_ms: How long the request took
+        :param sql_ms: How long its queries took
+        :param queries: How many queries it ran
+        """
+        with self.lock:
+            stats = self.url_names.setdefault(url_name, {
+                'count': 0,
+                'total_ms': 0.0,
+                'sql_ms': 0.0,
+                'queries': 0,
+                'buckets': [0] * (len(self.BUCKETS) + 1),
+            })
+            stats['count'] += 1
+            stats['total_ms'] += total_ms
+            stats['sql_ms'] += sql_ms
+            stats['queries'] += queries
+
+            bucket = 0
+            while (bucket < len(self.BUCKETS) and
+                   total_ms > self.BUCKETS[bucket]):
+                bucket += 1
+            stats['buckets'][bucket] += 1
+
+    def reset(self):
+        """Forgets every request counted so far"""
+        with self.lock:
+            self.url_names.clear()
+
+    def snapshot(self):
+        """
+        Copies the histograms in a form that can be sent as JSON
+
+        :return:
+            A dictionary in the format of {url_name: {'count': int,
+            'mean_ms': float, 'mean_sql_ms': float, 'mean_queries': float,
+            'buckets': {'<=5ms': int, ..., '>5000ms': int}}}
+        """
+        labels = [f'<={bound}ms' for bound in self.BUCKETS]
+        labels.append(f'>{self.BUCKETS[-1]}ms')
+
+        with self.lock:
+            return {
+                url_name: {
+                    'count': stats['count'],
+                    'mean_ms': stats['total_ms'] / stats['count'],
+                    'mean_sql_ms': stats['sql_ms'] / stats['count'],
+                    'mean_queries': stats['queries'] / stats['count'],
+                    'buckets': dict(zip(labels, stats['buckets'])),
+                }
+                for url_name, stats in self.url_names.items()
+            }
+
+
+# The histograms for this process
+histograms = LatencyHistograms()
+
+
+class PerformanceMiddleware:
+    """
+    Records how long a sample of requests spend in SQL and templates
+
+    It should be first in MIDDLEWARE, so the time spent in the other
+    middleware is counted as well. PERFORMANCE_SAMPLE_RATE sets the fraction
+    of requests measured, the rest pass straight through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        :param get_response: The next middleware or the view
+        """
+        self.get_response = get_response
+
+        # Connections opened from now on are set up by add_query_recorder
+        for connection in connections.all(initialized_only=True):
+            add_query_recorder(self, connection)
+
+        # Under ASGI the rest of the chain is async, so this must be as well
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """
+        Handles a request, measuring it if it was sampled
+
+        :param request: Standard Django request object
+        :return: The response, with a Server-Timing header if sampled
+        """
+        if self.is_async:
+            return self.handle_async(request)
+
+        if random.random() >= settings.PERFORMANCE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = RequestRecorder()
+        token = current_recorder.set(recorder)
+
+        started_at = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        total_time = time.perf_counter() - started_at
+
+        return self.report(request, response, recorder, total_time)
+
+    async def handle_async(self, request):
+        """
+        Handles a request under ASGI, measuring it if it was sampled
+
+        :param request: Standard Django request object
+        :return: The response, with a Server-Timing header if sampled
+        """
+        if random.random() >= settings.PERFORMANCE_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        recorder = RequestRecorder()
+        token = current_recorder.set(recorder)
+
+        started_at = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        total_time = time.perf_counter() - started_at
+
+        return self.report(request, response, recorder, total_time)
+
+    def report(self, request, response, recorder: RequestRecorder,
+               total_time: float):
+        """
+        Adds the Server-Timing header, logs the request and counts it
+
+        :param request: Standard Django request object
+        :param response: The response to the request
+        :param recorder: What was recorded while handling the request
+        :param total_time: How long the request took, in seconds
+        :return: The response
+        """
+        total_ms = total_time * 1000
+        sql_ms = recorder.sql_time * 1000
+        template_ms = recorder.template_time * 1000
+
+        response['Server-Timing'] = (
+            f'total;dur={total_ms:.1f}, '
+            f'sql;dur={sql_ms:.1f};desc="{recorder.queries} queries, '
+            f'{recorder.duplicate_queries} duplicates", '
+            f'template;dur={template_ms:.1f}'
+        )
+
+        resolver_match = request.resolver_match
+        url_name = resolver_match.view_name if resolver_match else 'unmatched'
+        histograms.record(url_name, total_ms, sql_ms, recorder.queries)
+
+        logger.info(json.dumps({
+            'url_name': url_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'sql_ms': round(sql_ms, 2),
+            'queries': recorder.queries,
+            'duplicate_queries': recorder.duplicate_queries,
+            'template_ms': round(template_ms, 2),
+        }))
+
+        return response
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Passes a query to the recorder of the request being handled, if any
+
+    :return: Whatever the query returns
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def add_query_recorder(sender, connection, **kwargs):
+    """
+    Makes a database connection send its queries to record_query
+
+    It goes first, so the execute_wrapper context managers that come and go
+    later take their own wrappers back off the end.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
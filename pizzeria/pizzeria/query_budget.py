@@ -0,0 +1,87 @@
+"""
+Lets a view declare the most SQL queries it should ever run.
+
+A view going over its budget usually means a query was added inside a loop,
+so the count now grows with the number of rows. When QUERY_BUDGET_RAISE is
+on, as it is while testing, going over raises QueryBudgetExceeded. Otherwise
+a warning is logged to the 'pizzeria.query_budget' logger.
+"""
+import logging
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('pizzeria.query_budget')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a view runs more queries than its budget allows"""
+
+
+class QueryCounter:
+    """Counts queries, used as a database execute wrapper"""
+
+    def __init__(self):
+        """Starts counting from zero"""
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Counts a query and runs it
+
+        :return: Whatever the query returns
+        """
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def query_budget(max_queries: int):
+    """
+    Checks a view never runs more than a set number of queries
+
+    Only the queries run by the view itself are counted, including any lazy
+    ones such as loading the session or the user. Queries run while a
+    streamed response is being sent are not.
+
+    :param max_queries: The most queries the view may run
+    :return: A view decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = view(request, *args, **kwargs)
+
+            if counter.queries > max_queries:
+                message = (
+                    f'{get_view_name(view, request)} ran {counter.queries} '
+                    f'queries for {request.path}, over its budget of '
+                    f'{max_queries}'
+                )
+                if settings.QUERY_BUDGET_RAISE:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+
+            return response
+        return wrapper
+    return decorator
+
+
+def get_view_name(view, request):
+    """
+    Names a view for the budget messages
+
+    :param view: The decorated view
+    :param request: Standard Django request object
+    :return: The URL name the request matched, or else the view's own name
+    """
+    if getattr(request, 'resolver_match', None) is not None:
+        return request.resolver_match.view_name
+
+    # Class based views are decorated as a partial with no name of their own
+    return getattr(view, '__qualname__', repr(view))
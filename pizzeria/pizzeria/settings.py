@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'pizzeria.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +56,8 @@ ROOT_URLCONF = 'pizzeria.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing each render for PerformanceMiddleware
+        'BACKEND': 'pizzeria.template_backends.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,6 +72,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'pizzeria.wsgi.application'
+ASGI_APPLICATION = 'pizzeria.asgi.application'
 
 
 # Database
@@ -79,9 +82,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+
+        # An in-memory test database can not be written to from several
+        # threads at once, so the tests use a file just like the real site
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 
+# Keep the integer primary keys the tables were created with
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+
+# Caches
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+
+    # Buffered votes must never be culled. Use a shared cache like Memcached
+    # here when running more than one process, or when flushing the votes
+    # with the flush_votes command.
+    'votes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'votes',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 1000000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -111,8 +142,6 @@ TIME_ZONE = 'UTC'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 
@@ -124,3 +153,83 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
 ]
+
+
+# Performance
+
+# The fraction of requests PerformanceMiddleware measures, from 0 to 1. Each
+# one measured is logged as JSON to the 'pizzeria.performance' logger at the
+# INFO level. Lower it on a busy site. See pizzeria/middleware.py
+PERFORMANCE_SAMPLE_RATE = 1.0
+
+# Whether a view going over its query budget raises an error instead of only
+# logging a warning. TEST_RUNNER turns it on while testing, so a regression
+# fails the tests. See pizzeria/query_budget.py
+QUERY_BUDGET_RAISE = False
+TEST_RUNNER = 'pizzeria.test_runner.PizzeriaTestRunner'
+
+
+# Workshop
+
+# How long, in seconds, the homepage, Pizza pages and PizzaForm choices stay
+# cached. They are dropped sooner when anything they show changes. See
+# workshop/cache.py
+WORKSHOP_RESPONSE_CACHE_TIMEOUT = 300
+
+# Votes can be held in a cache and written to the database in batches, which
+# helps when many people vote on the same Pizza at once. See workshop/votes.py
+WORKSHOP_VOTE_BUFFERING = False
+WORKSHOP_VOTE_BUFFER_CACHE = 'votes'
+WORKSHOP_VOTE_BUFFER_FLUSH_INTERVAL = 10  # seconds
+WORKSHOP_VOTE_BUFFER_FLUSH_SIZE = 500  # votes
+
+# Set to 'sharded' to spread each Pizza's votes over several PizzaVoteShard
+# rows, which are added into the Pizza's likes and dislikes every so often
+WORKSHOP_VOTE_STORAGE = 'counter'
+WORKSHOP_VOTE_SHARD_COUNT = 8
+WORKSHOP_VOTE_SHARD_SYNC_INTERVAL = 10  # seconds
+
+# Every vote is also appended to a file in this directory, one for each
+# process, and the roll_up_votes command adds them to VoteEvent in batches.
+# It has to be on a local disk the site and the command can both write to.
+# See workshop/votes.py
+WORKSHOP_VOTE_EVENT_DIR = os.path.join(BASE_DIR, 'vote_events')
+
+# Which full-text search to use, 'fts5' for SQLite's FTS5 table, 'memory' for
+# an in-memory index, or 'auto' to use FTS5 when it is there
+WORKSHOP_SEARCH_BACKEND = 'auto'
+
+# How often each process rebuilds its in-memory search index, to pick up
+# Pizzas changed by other processes. See workshop/search.py
+WORKSHOP_SEARCH_INDEX_MAX_AGE = 60  # seconds
+
+# Set to True for a large Ingredient catalog, so PizzaForm finds Ingredients
+# through an autocomplete endpoint instead of listing every one in the page.
+# Otherwise the full list is cached until a Crust or Ingredient changes.
+WORKSHOP_INGREDIENT_AUTOCOMPLETE = False
+
+# How often each process rebuilds its in-memory index of Ingredient names,
+# to pick up names changed by other processes. See workshop/autocomplete.py
+WORKSHOP_INGREDIENT_INDEX_MAX_AGE = 60  # seconds
+
+# How vote counts reach the pages listening for them, 'memory' within this
+# process or 'cache' through WORKSHOP_LIVE_BROKER_CACHE, which must then be
+# shared by every process. Streams end after WORKSHOP_LIVE_STREAM_TIMEOUT and
+# the browser opens them again. See workshop/live.py
+WORKSHOP_LIVE_BROKER = 'memory'
+WORKSHOP_LIVE_BROKER_CACHE = 'default'
+WORKSHOP_LIVE_HEARTBEAT = 15  # seconds
+WORKSHOP_LIVE_STREAM_TIMEOUT = 300  # seconds
+
+# How many Pizzas each leaderboard ranks, and how often each process rebuilds
+# its boards to pick up votes counted by other processes. See
+# workshop/leaderboards.py
+WORKSHOP_LEADERBOARD_SIZE = 100
+WORKSHOP_LEADERBOARD_MAX_AGE = 60  # seconds
+
+# The trending sort weighs each vote by its age, halving it every
+# WORKSHOP_TRENDING_HALF_LIFE hours and ignoring votes older than
+# WORKSHOP_TRENDING_HORIZON hours. Scores are saved by the recompute_trending
+# command, see workshop/trending.py
+WORKSHOP_TRENDING_HALF_LIFE = 24  # hours
+WORKSHOP_TRENDING_HORIZON = 7 * 24  # hours
@@ -0,0 +1,52 @@
+"""
+A Django template backend that times rendering for PerformanceMiddleware.
+
+Set as the BACKEND in TEMPLATES, so views rendering with render() are timed
+without changing Django's own classes. Includes and extends happen inside
+the template being rendered, so they are not counted twice.
+"""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .middleware import current_recorder
+
+
+class TimedTemplate(Template):
+    """A Django template that adds its render time to the request's recorder"""
+
+    def render(self, context=None, request=None):
+        """
+        Renders the template, timing it if the request is being measured
+
+        :return: The rendered text
+        """
+        recorder = current_recorder.get()
+        if recorder is None:
+            return super().render(context, request)
+
+        started_at = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recorder.template_time += time.perf_counter() - started_at
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, handing out TimedTemplates"""
+
+    def from_string(self, template_code):
+        """
+        :param template_code: The template's source
+        :return: A TimedTemplate
+        """
+        template = super().from_string(template_code)
+        return TimedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        """
+        :param template_name: The name of the template to load
+        :return: A TimedTemplate
+        """
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,35 @@
+"""
+Runs the test suite with the settings only wanted while testing.
+"""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class PizzeriaTestRunner(DiscoverRunner):
+    """
+    The DiscoverRunner, with query budgets enforced and vote events written
+    to a throwaway directory
+    """
+
+    def setup_test_environment(self, **kwargs):
+        """
+        Makes a view going over its query budget fail the test, and keeps
+        the vote event files out of the project
+        """
+        super().setup_test_environment(**kwargs)
+        self.old_query_budget_raise = settings.QUERY_BUDGET_RAISE
+        settings.QUERY_BUDGET_RAISE = True
+
+        self.old_vote_event_dir = settings.WORKSHOP_VOTE_EVENT_DIR
+        settings.WORKSHOP_VOTE_EVENT_DIR = tempfile.mkdtemp()
+
+    def teardown_test_environment(self, **kwargs):
+        """Puts the settings back as they were"""
+        shutil.rmtree(settings.WORKSHOP_VOTE_EVENT_DIR, ignore_errors=True)
+        settings.WORKSHOP_VOTE_EVENT_DIR = self.old_vote_event_dir
+
+        settings.QUERY_BUDGET_RAISE = self.old_query_budget_raise
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,120 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .middleware import RequestRecorder, histograms
+from .query_budget import QueryBudgetExceeded, query_budget
+
+
+@query_budget(2)
+def count_users(request, times: int):
+    """Counts the Users a number of times, for testing query budgets"""
+    counts = [User.objects.count() for _ in range(times)]
+
+    return HttpResponse(str(counts[-1]))
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Tests for PerformanceMiddleware and the performance page"""
+
+    def setUp(self):
+        """Starts each test with empty histograms and an empty cache"""
+        histograms.reset()
+        caches['default'].clear()
+
+    def test_server_timing_header(self):
+        """Ensures measured requests say where their time went"""
+        resp = self.client.get(reverse('workshop:homepage'))
+
+        timing = resp['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('template;dur=', timing)
+        self.assertNotIn('template;dur=0.0', timing)
+
+    async def test_async_requests_are_measured(self):
+        """Ensures queries run by views are counted under ASGI"""
+        resp = await self.async_client.get(reverse('workshop:homepage'))
+
+        timing = resp['Server-Timing']
+        self.assertNotIn('"0 queries', timing)
+        self.assertNotIn('template;dur=0.0', timing)
+
+    def test_duplicate_queries_are_counted(self):
+        """Ensures the same query twice is reported as a duplicate"""
+        recorder = RequestRecorder()
+
+        def execute(sql, params, many, context):
+            """Stands in for the database"""
+            return sql
+
+        for params in [(1,), (2,), (1,)]:
+            recorder(execute, 'SELECT %s', params, False, {})
+
+        self.assertEqual(3, recorder.queries)
+        self.assertEqual(1, recorder.duplicate_queries)
+
+    def test_structured_log_line(self):
+        """Ensures each measured request is logged as JSON"""
+        with self.assertLogs('pizzeria.performance', 'INFO') as logs:
+            self.client.get(reverse('accounts:login'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual('accounts:login', record['url_name'])
+        self.assertEqual(200, record['status'])
+        self.assertIn('template_ms', record)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_unsampled_requests_pass_through(self):
+        """Ensures requests left out of the sample are not measured"""
+        resp = self.client.get(reverse('accounts:login'))
+
+        self.assertNotIn('Server-Timing', resp)
+        self.assertEqual({}, histograms.snapshot())
+
+    def test_performance_stats(self):
+        """Ensures staff can read the per URL name histograms"""
+        for _ in range(3):
+            self.client.get(reverse('accounts:login'))
+
+        resp = self.client.get(reverse('performance_stats'))
+        self.assertEqual(302, resp.status_code)
+
+        User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.login(username='staff', password='password')
+
+        stats = self.client.get(reverse('performance_stats')).json()
+        self.assertEqual(3, stats['accounts:login']['count'])
+        self.assertEqual(3, sum(stats['accounts:login']['buckets'].values()))
+
+
+class QueryBudgetTests(TestCase):
+    """Tests for the query_budget view decorator"""
+
+    def setUp(self):
+        """Creates a request to pass to the views"""
+        self.request = RequestFactory().get('/users/')
+
+    def test_within_budget(self):
+        """Ensures a view within its budget runs as normal"""
+        resp = count_users(self.request, 2)
+
+        self.assertEqual(b'0', resp.content)
+
+    def test_over_budget_raises(self):
+        """Ensures going over the budget fails while testing"""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'ran 3 queries'):
+            count_users(self.request, 3)
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_over_budget_warns(self):
+        """Ensures going over the budget is logged when not raising"""
+        with self.assertLogs('pizzeria.query_budget', 'WARNING') as logs:
+            resp = count_users(self.request, 3)
+
+        self.assertEqual(b'0', resp.content)
+        self.assertIn('count_users ran 3 queries for /users/', logs.output[0])
@@ -13,12 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls import include
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from . import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(
+        'internal/performance/',
+        views.performance_stats,
+        name='performance_stats'
+    ),
     path('accounts/', include('accounts.urls')),
     path('', include('workshop.urls')),
 ]
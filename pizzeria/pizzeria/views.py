@@ -0,0 +1,15 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .middleware import histograms
+
+
+@staff_member_required
+def performance_stats(request):
+    """
+    Shows how long the requests to each URL name have taken
+
+    :param request: Standard Django request object
+    :return: The histograms kept by PerformanceMiddleware, as JSON
+    """
+    return JsonResponse(histograms.snapshot())
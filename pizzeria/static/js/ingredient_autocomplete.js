@@ -0,0 +1,89 @@
+/*
+ * Turns an Ingredient <select> marked with data-autocomplete-url into a
+ * search box, for catalogs with too many Ingredients to list in the page.
+ * Picked Ingredients are added to the <select>, so the form is sent as usual.
+ *
+ * A text <input> marked with data-autocomplete-url instead suggests the
+ * Ingredients that already exist as the user types.
+ */
+(function () {
+  'use strict';
+
+  $('select[data-autocomplete-url]').each(function () {
+    var select = $(this);
+    var url = select.attr('data-autocomplete-url');
+    var search = $('<input type="search" class="form-control mt-2">')
+      .attr('placeholder', 'Find Ingredients');
+    var results = $('<div class="list-group text-left"></div>');
+    var more = $('<button type="button" class="btn btn-link">More</button>');
+    var nextUrl = null;
+    var timer = null;
+
+    select.after(search, results, more.hide());
+
+    function showPage(pageUrl, append) {
+      $.getJSON(pageUrl).done(function (page) {
+        if (!append) {
+          results.empty();
+        }
+        page.results.forEach(function (ingredient) {
+          $('<button type="button"></button>')
+            .addClass('list-group-item list-group-item-action')
+            .text(ingredient.name)
+            .data('ingredient', ingredient)
+            .appendTo(results);
+        });
+
+        // The next page is given as a query string for the same URL
+        nextUrl = page.next ? url + page.next : null;
+        more.toggle(nextUrl !== null);
+      });
+    }
+
+    // Wait for a pause in typing before searching
+    search.on('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        showPage(url + '?' + $.param({q: search.val()}), false);
+      }, 200);
+    });
+
+    more.on('click', function () {
+      showPage(nextUrl, true);
+    });
+
+    results.on('click', 'button', function () {
+      var ingredient = $(this).data('ingredient');
+      var option = select.find('option[value="' + ingredient.id + '"]');
+      if (!option.length) {
+        option = $('<option></option>')
+          .val(ingredient.id)
+          .text(ingredient.name)
+          .appendTo(select);
+      }
+      option.prop('selected', true);
+    });
+  });
+
+  $('input[data-autocomplete-url]').each(function () {
+    var input = $(this);
+    var url = input.attr('data-autocomplete-url');
+    var suggestions = $('<datalist></datalist>')
+      .attr('id', this.id + '_suggestions');
+    var timer = null;
+
+    input.attr('list', suggestions.attr('id')).after(suggestions);
+
+    input.on('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        $.getJSON(url, {q: input.val()}).done(function (page) {
+          suggestions.empty();
+          page.results.forEach(function (ingredient) {
+            $('<option></option>').val(ingredient.name).appendTo(suggestions);
+          });
+        });
+      }, 200);
+    });
+  });
+})();
@@ -0,0 +1,70 @@
+/*
+ * Casts votes without leaving the page, and keeps the vote counts shown up
+ * to date from the stream of vote events sent by workshop/live.py.
+ *
+ * Vote links are marked with data-vote-url and data-vote. Anything showing
+ * a count is marked with data-pizza and data-vote-count, and the first
+ * number in its text is replaced when the count changes.
+ */
+(function () {
+  'use strict';
+
+  var script = document.currentScript;
+
+  function getCookie(name) {
+    var cookies = document.cookie ? document.cookie.split('; ') : [];
+    for (var i = 0; i < cookies.length; i++) {
+      var parts = cookies[i].split('=');
+      if (parts[0] === name) {
+        return decodeURIComponent(parts.slice(1).join('='));
+      }
+    }
+    return null;
+  }
+
+  function showCounts(event) {
+    $('[data-pizza="' + event.id + '"][data-vote-count]').each(function () {
+      var count = event[this.getAttribute('data-vote-count')];
+      this.textContent = this.textContent.replace(/\d+/, count);
+    });
+  }
+
+  // Vote in the background, falling back to the link's page when the vote
+  // cannot be sent, such as when the user is not logged in
+  $(document).on('click', '[data-vote-url]', function (click) {
+    var link = this;
+    var token = getCookie('csrftoken');
+    if (token === null) {
+      return;
+    }
+
+    click.preventDefault();
+    $.ajax({
+      url: link.getAttribute('data-vote-url'),
+      method: 'POST',
+      data: {vote: link.getAttribute('data-vote')},
+      headers: {'X-CSRFToken': token}
+    }).done(showCounts).fail(function () {
+      window.location = link.href;
+    });
+  });
+
+  // Listen for the counts of every Pizza on the page
+  var pizzaIds = [];
+  $('[data-pizza]').each(function () {
+    var pizzaId = this.getAttribute('data-pizza');
+    if (pizzaIds.indexOf(pizzaId) === -1) {
+      pizzaIds.push(pizzaId);
+    }
+  });
+
+  if (pizzaIds.length && window.EventSource) {
+    var query = $.param({pizza: pizzaIds}, true);
+    var source = new EventSource(
+      script.getAttribute('data-stream-url') + '?' + query
+    );
+    source.addEventListener('votes', function (message) {
+      showCounts(JSON.parse(message.data));
+    });
+  }
+})();
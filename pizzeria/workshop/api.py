@@ -0,0 +1,399 @@
+"""
+A read-only JSON API for Pizzas, for clients that should not have to read
+the HTML pages, Pizza leaderboards and vote history, and an Ingredient
+autocomplete for the forms.
+
+Both Pizza endpoints take a 'fields' parameter, such as '?fields=id,name',
+so only the columns and related objects asked for are loaded and sent.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET
+
+from pizzeria.async_views import stream_content
+
+from .autocomplete import ingredient_index
+from .cache import get_cached_choices
+from .conditional import create_pizza_etag, get_pizza_last_modified
+from .forms import STATES
+from .leaderboards import METRICS, leaderboards
+from .models import Crust, Ingredient, Pizza, PizzaVoteDay, PizzaVoteWindow
+from .pagination import (
+    create_next_page_url, decode_cursor_or_404, encode_cursor,
+    paginate_by_keyset
+)
+from .views import (
+    DEFAULT_SORTED_BY, SORTED_BY_OPTIONS, create_homepage_queryset,
+    filter_by_ingredients
+)
+from .votes import merge_pending_votes
+
+# Every field a client can ask for, in the order they are sent
+API_FIELDS = [
+    'id', 'name', 'summary', 'city', 'state', 'crust', 'ingredients',
+    'likes', 'dislikes', 'time_created', 'updated_at'
+]
+
+# How many Pizzas the list endpoint loads from the database at a time
+CHUNK_SIZE = 500
+
+# How many Ingredients the autocomplete endpoint sends at a time
+AUTOCOMPLETE_PAGE_SIZE = 20
+
+# The rollups a Pizza's vote history can be read from, with their period
+VOTE_HISTORY_ROLLUPS = {
+    'hour': (PizzaVoteWindow, 'hour'),
+    'day': (PizzaVoteDay, 'day'),
+}
+
+""" Views """
+
+
+@require_GET
+def ingredient_autocomplete(request):
+    """
+    Finds the Ingredients whose names start with 'q', a page at a time
+
+    Names are looked up in ingredient_index, ignoring case, so typing does
+    not cost a query.
+
+    :param request: Standard Django request object
+    :return:
+        A JSON object in the format of
+        {'results': [{'id': int, 'name': str}], 'next': str or None}, where
+        'next' is the query string for the next page
+    :return if the cursor is invalid: HTTP 404
+    """
+    prefix = request.GET.get('q', '').strip()
+    name_field = Ingredient._meta.get_field('name')
+
+    cursor = request.GET.get('cursor')
+    after = decode_cursor_or_404(cursor, name_field) if cursor else None
+
+    # Ask for one extra Ingredient to tell whether there is a next page
+    ingredients = ingredient_index.search(
+        prefix, after, limit=AUTOCOMPLETE_PAGE_SIZE + 1
+    )
+
+    next_cursor = None
+    if len(ingredients) > AUTOCOMPLETE_PAGE_SIZE:
+        ingredients = ingredients[:AUTOCOMPLETE_PAGE_SIZE]
+        pk, name = ingredients[-1]
+        next_cursor = encode_cursor(Ingredient(pk=pk, name=name), name_field)
+
+    return JsonResponse({
+        'results': [{'id': pk, 'name': name} for pk, name in ingredients],
+        'next': create_next_page_url(request, next_cursor),
+    })
+
+
+@require_GET
+def leaderboard(request, metric: str):
+    """
+    Sends the top Pizzas by a metric, overall or within a state or Crust
+
+    The board is kept in memory in ranked order, see leaderboards.py, so only
+    the Pizzas sent are looked at. Boards can be limited with either a
+    'state' or a 'crust' id, and shortened with 'limit'.
+
+    :param request: Standard Django request object
+    :param metric: 'likes', or 'score' for likes less dislikes
+    :return if valid:
+        A JSON object in the format of {'metric': str, 'results': [{'rank':
+        int, 'id': int, 'name': str, 'state': str, 'crust': int, 'likes':
+        int, 'dislikes': int, 'score': int}]}
+    :return if the metric does not exist: HTTP 404 with a JSON error
+    :return if a parameter is invalid: HTTP 400 with a JSON error
+    """
+    if metric not in METRICS:
+        return create_error_response(
+            'The leaderboard requested does not exist.', 404
+        )
+
+    scope = get_leaderboard_scope(request)
+    if scope is None:
+        return create_error_response('Unknown state or Crust requested.', 400)
+
+    size = settings.WORKSHOP_LEADERBOARD_SIZE
+    try:
+        limit = int(request.GET.get('limit', size))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= size:
+        return create_error_response(
+            f'The limit has to be between 1 and {size}.', 400
+        )
+
+    rows = leaderboards.get_top(metric, *scope, limit=limit)
+
+    return JsonResponse({
+        'metric': metric,
+        'results': [
+            {
+                'rank': rank,
+                'id': row['id'],
+                'name': row['name'],
+                'state': row['state'],
+                'crust': row['crust_id'],
+                'likes': row['likes'],
+                'dislikes': row['dislikes'],
+                'score': row['likes'] - row['dislikes'],
+            }
+            for rank, row in enumerate(rows, start=1)
+        ],
+    })
+
+
+@require_GET
+@condition(create_pizza_etag, get_pizza_last_modified)
+def pizza_detail(request, pk: int):
+    """
+    Sends a single Pizza as JSON
+
+    :param request: Standard Django request object
+    :param pk: Primary key for a Pizza object
+    :return if found: A JSON object holding the fields asked for
+    :return if the Pizza does not exist: HTTP 404 with a JSON error
+    :return if a field does not exist: HTTP 400 with a JSON error
+    """
+    fields = get_fields(request)
+    if fields is None:
+        return create_error_response('Unknown field requested.', 400)
+
+    pizza = create_api_queryset(fields).filter(pk=pk).first()
+    if pizza is None:
+        return create_error_response(
+            'The Pizza requested does not exist.', 404
+        )
+
+    merge_pending_votes([pizza])
+
+    return JsonResponse(serialize_pizza(pizza, fields))
+
+
+@require_GET
+def pizza_list(request):
+    """
+    Streams every Pizza as a JSON array
+
+    Pizzas can be sorted with 'sorted_by', using the same options as the
+    homepage, and filtered with one or more 'ingredient' parameters. The
+    response is written a chunk of Pizzas at a time, so the whole catalog is
+    never held in memory.
+
+    :param request: Standard Django request object
+    :return if valid: A streamed JSON array of Pizza objects
+    :return if a field or sort does not exist: HTTP 400 with a JSON error
+    """
+    fields = get_fields(request)
+    if fields is None:
+        return create_error_response('Unknown field requested.', 400)
+
+    sorted_by = request.GET.get('sorted_by', DEFAULT_SORTED_BY)
+    if sorted_by not in SORTED_BY_OPTIONS:
+        return create_error_response('Unknown sort requested.', 400)
+
+    queryset = filter_by_ingredients(
+        create_api_queryset(fields, sorted_by),
+        request.GET.getlist('ingredient')
+    )
+
+    return StreamingHttpResponse(
+        stream_content(request, stream_pizzas(queryset, sorted_by, fields)),
+        content_type='application/json'
+    )
+
+
+@require_GET
+def pizza_votes(request, pk: int):
+    """
+    Sends a Pizza's likes and dislikes for each hour or day
+
+    The counts come from the rollups of the vote log, see votes.py, so votes
+    show up once they have been rolled up. Hours are only kept for
+    WORKSHOP_TRENDING_HORIZON hours, days are kept for good.
+
+    :param request: Standard Django request object
+    :param pk: Primary key for a Pizza object
+    :return if found:
+        A JSON object in the format of {'period': str, 'results':
+        [{'start': str, 'likes': int, 'dislikes': int}]}, oldest first
+    :return if the Pizza does not exist: HTTP 404 with a JSON error
+    :return if the period is not 'hour' or 'day': HTTP 400 with a JSON error
+    """
+    period = request.GET.get('period', 'day')
+    if period not in VOTE_HISTORY_ROLLUPS:
+        return create_error_response(
+            "The period must be 'hour' or 'day'.", 400
+        )
+
+    if not Pizza.objects.filter(pk=pk).exists():
+        return create_error_response(
+            'The Pizza requested does not exist.', 404
+        )
+
+    model, period_field = VOTE_HISTORY_ROLLUPS[period]
+    rows = model.objects.filter(pizza_id=pk).order_by(
+        period_field
+    ).values_list(period_field, 'likes', 'dislikes')
+
+    return JsonResponse({
+        'period': period,
+        'results': [
+            {'start': start, 'likes': likes, 'dislikes': dislikes}
+            for start, likes, dislikes in rows
+        ],
+    })
+
+
+""" Functions """
+
+
+def create_api_queryset(fields: list, sorted_by: str = DEFAULT_SORTED_BY):
+    """
+    Narrows the homepage queryset down to what the fields asked for need
+
+    :param fields: The fields being sent, from get_fields
+    :param sorted_by: The field the Pizzas are sorted by
+    :return: A Pizza queryset
+    """
+    queryset = create_homepage_queryset()
+
+    # Only join and prefetch the related objects that are sent
+    if 'crust' not in fields:
+        queryset = queryset.select_related(None)
+    if 'ingredients' not in fields:
+        queryset = queryset.prefetch_related(None)
+
+    # Votes are always loaded, because pending votes are added to them
+    columns = {'likes', 'dislikes', sorted_by.lstrip('-')}
+    columns.update(
+        field for field in fields if field not in ('id', 'ingredients')
+    )
+
+    return queryset.only(*columns)
+
+
+def create_error_response(message: str, status: int):
+    """
+    Creates a JSON response explaining why a request failed
+
+    :param message: The reason the request failed
+    :param status: The HTTP status code
+    :return: A JsonResponse in the format of {'error': message}
+    """
+    return JsonResponse({'error': message}, status=status)
+
+
+def get_leaderboard_scope(request):
+    """
+    Reads which state or Crust a leaderboard is limited to
+
+    Only known states and Crusts are accepted, so a board is never built
+    for a made up one.
+
+    :param request: Standard Django request object
+    :return if valid:
+        A tuple of (Pizza field, value), or (None, None) for every Pizza
+    :return if unknown or both are given: None
+    """
+    state = request.GET.get('state')
+    crust = request.GET.get('crust')
+
+    if state is not None and crust is not None:
+        return None
+
+    if state is not None:
+        if state not in dict(STATES):
+            return None
+        return 'state', state
+
+    if crust is not None:
+        try:
+            crust_id = int(crust)
+        except ValueError:
+            return None
+
+        if crust_id not in dict(get_cached_choices(Crust, 'type')):
+            return None
+        return 'crust_id', crust_id
+
+    return None, None
+
+
+def get_fields(request):
+    """
+    Reads which fields the client wants from the 'fields' parameter
+
+    :param request: Standard Django request object
+    :return if valid: A list of field names, every field when none are given
+    :return if a field does not exist: None
+    """
+    fields = request.GET.get('fields')
+    if not fields:
+        return API_FIELDS
+
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if not fields or not set(fields).issubset(API_FIELDS):
+        return None
+
+    return [field for field in API_FIELDS if field in fields]
+
+
+def serialize_pizza(pizza, fields: list):
+    """
+    Turns a Pizza into a dictionary that can be sent as JSON
+
+    :param pizza: A Pizza object from create_api_queryset
+    :param fields: The fields to include
+    :return: A dictionary in the format of {field: value}
+    """
+    data = {}
+    for field in fields:
+        if field == 'crust':
+            data[field] = pizza.crust.type
+        elif field == 'ingredients':
+            data[field] = [
+                ingredient.name for ingredient in pizza.ingredients.all()
+            ]
+        else:
+            data[field] = getattr(pizza, field)
+
+    return data
+
+
+def stream_pizzas(queryset, sorted_by: str, fields: list):
+    """
+    Writes out a queryset as a JSON array, a chunk of Pizzas at a time
+
+    Each chunk is a keyset page, so it is a quick index seek however deep
+    into the catalog it is, and its Ingredients are prefetched in one query.
+
+    :param queryset: A Pizza queryset from create_api_queryset
+    :param sorted_by: How the queryset is sorted
+    :param fields: The fields to include
+    :return: A generator of JSON strings
+    """
+    yield '['
+
+    separator = ''
+    cursor = None
+    while True:
+        pizzas, cursor = paginate_by_keyset(
+            queryset, sorted_by, cursor, per_page=CHUNK_SIZE
+        )
+        merge_pending_votes(pizzas)
+
+        for pizza in pizzas:
+            yield separator + json.dumps(
+                serialize_pizza(pizza, fields), cls=DjangoJSONEncoder
+            )
+            separator = ','
+
+        if cursor is None:
+            break
+
+    yield ']'
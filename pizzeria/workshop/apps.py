@@ -1,5 +1,20 @@
+import atexit
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WorkshopConfig(AppConfig):
     name = 'workshop'
+
+    def ready(self):
+        """Sets up the parts of the workshop that run outside of a view"""
+        from . import votes
+
+        # Importing the module connects its signal receivers
+        from . import signals  # noqa: F401
+
+        # Buffered votes in a local memory cache would be lost when the
+        # process stops, so write them to the database on the way out
+        if settings.WORKSHOP_VOTE_BUFFERING:
+            atexit.register(votes.flush_vote_buffer)
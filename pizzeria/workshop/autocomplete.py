@@ -0,0 +1,159 @@
+"""
+An in-memory index of Ingredient names, for the autocomplete endpoint.
+
+Every name is kept in a sorted list, so the names starting with a prefix
+sit next to each other and are found with a binary search, without going
+to the database. The index is filled on the first lookup. Changes made by
+this process are added once they are committed, by the receivers in
+signals.py and by bulk.NameLookup.
+
+Other processes change the choices version when they change an Ingredient,
+so the index is built again when the version moves on. A change committed
+elsewhere while this process applies its own may be missed that way, so
+the index is also built again once it is WORKSHOP_INGREDIENT_INDEX_MAX_AGE
+seconds old.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+
+from .cache import CHOICES_VERSION_KEY, get_version
+from .models import Ingredient
+
+
+class IngredientPrefixIndex:
+    """A sorted list of Ingredient names, ignoring case"""
+
+    def __init__(self):
+        """Creates an empty index, it is filled in on the first lookup"""
+        self.built = False
+        self.built_at = None
+        self.lock = threading.RLock()
+
+        # The choices version the index holds the Ingredients of
+        self.version = None
+
+        # (casefolded name, ingredient_id) for every Ingredient, in order
+        self.keys = []
+
+        # {ingredient_id: name}, used to send the name and take it back out
+        self.names = {}
+
+    def build(self, version: int):
+        """
+        Fills the index from the database
+
+        :param version: The choices version the index is built for
+        """
+        with self.lock:
+            self.names = dict(Ingredient.objects.values_list('pk', 'name'))
+            self.keys = sorted(
+                (name.casefold(), pk) for pk, name in self.names.items()
+            )
+            self.built = True
+            self.built_at = time.monotonic()
+            self.version = version
+
+    def is_stale(self, version: int):
+        """
+        Checks if the index has to be built again before it is used
+
+        :param version: The current choices version
+        :return: boolean
+        """
+        if not self.built or self.version != version:
+            return True
+
+        age = time.monotonic() - self.built_at
+        return age >= settings.WORKSHOP_INGREDIENT_INDEX_MAX_AGE
+
+    def add(self, pk: int, name: str):
+        """
+        Adds an Ingredient to the index, replacing any older name
+
+        :param pk: Primary key for an Ingredient object
+        :param name: The Ingredient's name
+        """
+        with self.lock:
+            self.remove(pk)
+
+            insort(self.keys, (name.casefold(), pk))
+            self.names[pk] = name
+
+    def remove(self, pk: int):
+        """
+        Takes an Ingredient out of the index
+
+        :param pk: Primary key for an Ingredient object
+        """
+        with self.lock:
+            name = self.names.pop(pk, None)
+            if name is None:
+                return
+
+            del self.keys[bisect_left(self.keys, (name.casefold(), pk))]
+
+    def search(self, prefix: str, after: tuple = None, limit: int = 20):
+        """
+        Finds the Ingredients whose names start with a prefix
+
+        :param prefix: The start of the names wanted, in any case
+        :param after:
+            A (name, id) pair to start after, such as the last Ingredient of
+            the previous page, or None to start at the beginning
+        :param limit: The most Ingredients to return
+        :return: A list of (id, name) tuples, in order of name
+        """
+        prefix = prefix.casefold()
+        version = get_version(CHOICES_VERSION_KEY)
+
+        with self.lock:
+            if self.is_stale(version):
+                self.build(version)
+
+            if after is None:
+                position = bisect_left(self.keys, (prefix,))
+            else:
+                name, pk = after
+                position = max(
+                    bisect_left(self.keys, (prefix,)),
+                    bisect_right(self.keys, (name.casefold(), pk))
+                )
+
+            results = []
+            while (position < len(self.keys) and len(results) < limit and
+                   self.keys[position][0].startswith(prefix)):
+                pk = self.keys[position][1]
+                results.append((pk, self.names[pk]))
+                position += 1
+
+            return results
+
+
+# The Ingredient index for this process
+ingredient_index = IngredientPrefixIndex()
+
+
+def update_ingredient_index(added=(), removed=()):
+    """
+    Applies committed Ingredient changes to the index, if it has been built
+
+    The changes were made by this process, so the index also takes on the
+    choices version they moved to.
+
+    :param added: An iterable of (id, name) tuples of new or renamed
+        Ingredients
+    :param removed: An iterable of ids of deleted Ingredients
+    """
+    with ingredient_index.lock:
+        if not ingredient_index.built:
+            return
+
+        for pk, name in added:
+            ingredient_index.add(pk, name)
+        for pk in removed:
+            ingredient_index.remove(pk)
+
+        ingredient_index.version = get_version(CHOICES_VERSION_KEY)
@@ -0,0 +1,236 @@
+"""
+Times the workshop and accounts pages through the real URLconf, using
+Django's test client, at several catalog sizes.
+
+The catalog comes from generate_catalog, so the same seed always measures
+the same data. Results are plain dictionaries that can be saved as JSON and
+compared with an earlier run by find_regressions.
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Crust, Ingredient, Pizza
+from .synthetic import generate_catalog
+from .views import SORTED_BY_OPTIONS
+
+# The user the benchmarks log in as
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+# The latency percentiles reported for every path
+PERCENTILES = [50, 95, 99]
+
+
+def create_request_paths(rng: random.Random):
+    """
+    Lists every request the benchmark makes
+
+    :param rng: Picks which Pizzas are viewed and voted on
+    :return:
+        A list of (name, function) tuples. Each function takes the number
+        of the request and returns (client, method, url, data).
+    """
+    pizza_pks = list(Pizza.objects.values_list('pk', flat=True))
+    crust = Crust.objects.values_list('pk', flat=True).first()
+    ingredients = list(Ingredient.objects.values_list('pk', flat=True)[:3])
+
+    reader = Client()
+    reader.login(username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD)
+    writer = Client()
+    writer.login(username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD)
+
+    def get(url_name, **kwargs):
+        """Creates a GET request for a URL name"""
+        return lambda number: (reader, 'get', reverse(url_name, **kwargs), {})
+
+    def pizza_request(client, method, url_name):
+        """Creates a request for a randomly picked Pizza"""
+        return lambda number: (
+            client, method,
+            reverse(url_name, args=(rng.choice(pizza_pks),)), {}
+        )
+
+    paths = [('homepage', get('workshop:homepage'))]
+    paths += [
+        (
+            f'homepage_sorted:{sorted_by}',
+            get('workshop:homepage_sorted', kwargs={'sorted_by': sorted_by})
+        )
+        for sorted_by in SORTED_BY_OPTIONS
+    ]
+    paths += [
+        ('view_pizza', pizza_request(reader, 'get', 'workshop:view_pizza')),
+        ('like_pizza', pizza_request(writer, 'get', 'workshop:like_pizza')),
+        (
+            'dislike_pizza',
+            pizza_request(writer, 'get', 'workshop:dislike_pizza')
+        ),
+        ('create_pizza', lambda number: (
+            writer, 'post', reverse('workshop:create_pizza'), {
+                'city': 'Knoxville',
+                'state': 'TN',
+                'crust': crust,
+                'ingredients': ingredients,
+                'name': f'Benchmark {len(pizza_pks)} {number}',
+                'summary': 'Created by the benchmark',
+            }
+        )),
+        ('login_user', lambda number: (
+            Client(), 'post', reverse('accounts:login'), {
+                'username': BENCHMARK_USERNAME,
+                'password': BENCHMARK_PASSWORD,
+            }
+        )),
+    ]
+
+    return paths
+
+
+def find_regressions(baseline: dict, results: dict, threshold: float):
+    """
+    Compares two benchmark runs
+
+    :param baseline: Results from an earlier run_benchmarks
+    :param results: Results from the run being checked
+    :param threshold:
+        How much slower a p95 latency can get, as a fraction, before it
+        counts. Any increase in the query count always counts.
+    :return: A list of messages, one for each regression found
+    """
+    regressions = []
+    for size, paths in results['sizes'].items():
+        for name, stats in paths.items():
+            old = baseline.get('sizes', {}).get(size, {}).get(name)
+            if old is None:
+                continue
+
+            if stats['queries'] > old['queries']:
+                regressions.append(
+                    f'{name} at {size} Pizzas went from {old["queries"]} '
+                    f'to {stats["queries"]} queries'
+                )
+            if stats['p95_ms'] > old['p95_ms'] * (1 + threshold):
+                regressions.append(
+                    f'{name} at {size} Pizzas went from a p95 of '
+                    f'{old["p95_ms"]:.2f}ms to {stats["p95_ms"]:.2f}ms'
+                )
+
+    return regressions
+
+
+def measure_path(create_request, requests: int, warmup: int,
+                 warm_cache: bool):
+    """
+    Makes the same kind of request many times and times each one
+
+    :param create_request: A function from create_request_paths
+    :param requests: How many requests to time
+    :param warmup: How many requests to make first without timing them
+    :param warm_cache:
+        Whether to keep the cache between requests. When False the cache is
+        cleared before each request, so every page is rendered.
+    :return: A dictionary of latency, throughput and query count stats
+    """
+    latencies = []
+    query_counts = []
+
+    for number in range(warmup + requests):
+        client, method, url, data = create_request(number)
+        if not warm_cache:
+            caches['default'].clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = time.perf_counter() - started_at
+
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+
+        # Votes leave a message behind, which would skip the page cache
+        client.cookies.pop('messages', None)
+
+        if number >= warmup:
+            latencies.append(elapsed)
+            query_counts.append(len(queries.captured_queries))
+
+    latencies.sort()
+    stats = {
+        f'p{percentile}_ms': get_percentile(latencies, percentile) * 1000
+        for percentile in PERCENTILES
+    }
+    stats['requests_per_sec'] = len(latencies) / sum(latencies)
+    stats['queries'] = max(query_counts)
+
+    return stats
+
+
+def get_percentile(values: list, percentile: float):
+    """
+    Finds a percentile of some sorted values, by the nearest rank
+
+    :param values: A sorted list of numbers
+    :param percentile: A number from 0 to 100
+    :return: The value at that percentile
+    """
+    rank = max(int(round(percentile / 100 * len(values))) - 1, 0)
+
+    return values[min(rank, len(values) - 1)]
+
+
+def run_benchmarks(sizes: list, requests: int = 100, warmup: int = 5,
+                   seed: int = 0, warm_cache: bool = False, log=None):
+    """
+    Times every request path at each catalog size, against the current
+    database
+
+    The catalog is grown to each size in turn, so sizes should be given
+    smallest first.
+
+    :param sizes: The numbers of Pizzas to measure at
+    :param requests: How many requests to time for each path and size
+    :param warmup: How many requests to make first without timing them
+    :param seed: Seeds the catalog and the Pizzas picked
+    :param warm_cache: Whether to keep the cache between requests
+    :param log: Called with a line of text as each path is measured
+    :return:
+        A dictionary in the format of
+        {'settings': {...}, 'sizes': {size: {path: stats}}}
+    """
+    if not User.objects.filter(username=BENCHMARK_USERNAME).exists():
+        User.objects.create_user(BENCHMARK_USERNAME, None, BENCHMARK_PASSWORD)
+
+    results = {
+        'settings': {
+            'requests': requests, 'warmup': warmup, 'seed': seed,
+            'warm_cache': warm_cache
+        },
+        'sizes': {},
+    }
+
+    for size in sizes:
+        generate_catalog(pizzas=size, seed=seed)
+
+        paths = create_request_paths(random.Random(seed))
+        results['sizes'][str(size)] = {}
+        for name, create_request in paths:
+            stats = measure_path(create_request, requests, warmup, warm_cache)
+            results['sizes'][str(size)][name] = stats
+
+            if log is not None:
+                log(
+                    f'{size:>8} {name:<28} p50 {stats["p50_ms"]:8.2f}ms '
+                    f'p95 {stats["p95_ms"]:8.2f}ms '
+                    f'p99 {stats["p99_ms"]:8.2f}ms '
+                    f'{stats["requests_per_sec"]:8.1f} req/s '
+                    f'{stats["queries"]:3} queries'
+                )
+
+    return results
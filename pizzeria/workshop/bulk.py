@@ -0,0 +1,315 @@
+"""
+Creates Pizzas, Crusts and Ingredients in batches, for loading far more of
+them than the forms could.
+
+Bulk inserts skip save() and its signals, so the search index, cached pages
+and leaderboards are brought up to date here instead.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .autocomplete import update_ingredient_index
+from .cache import (
+    bump_catalog_version, bump_choices_version, bump_leaderboard_version,
+    bump_pizza_version
+)
+from .forms import STATES
+from .models import Crust, Ingredient, Pizza
+from .search import index_documents
+
+# How many Pizzas are written to the database at a time
+BATCH_SIZE = 1000
+
+# The Pizza columns that can be loaded, besides crust and ingredients
+PIZZA_FIELDS = ['name', 'summary', 'city', 'state', 'likes', 'dislikes']
+
+# Columns that have to be text when they are given
+TEXT_PIZZA_FIELDS = ['name', 'summary', 'city', 'state', 'crust']
+
+# The form fields PizzaForm would use for each column. A missing name,
+# summary, city or state fails their checks, as does anything too long for
+# the database or a vote count that is not a whole number.
+PIZZA_FORM_FIELDS = {
+    field: Pizza._meta.get_field(field).formfield() for field in PIZZA_FIELDS
+}
+CRUST_FORM_FIELD = Crust._meta.get_field('type').formfield()
+INGREDIENT_FORM_FIELD = Ingredient._meta.get_field('name').formfield()
+
+# The states a Pizza can be from, the same as PizzaForm offers
+STATE_CODES = {code for code, name in STATES}
+
+
+class NameLookup:
+    """
+    Finds the primary keys of Crusts or Ingredients by name, creating the
+    missing ones in bulk
+
+    Names already seen are kept in memory, so each name is only looked up
+    once however many Pizzas use it.
+    """
+
+    def __init__(self, model, field_name: str):
+        """
+        :param model: Crust or Ingredient
+        :param field_name: The model's unique name field
+        """
+        self.model = model
+        self.field_name = field_name
+        self.pks = {}
+
+    def resolve(self, names):
+        """
+        Looks up the primary key for each name
+
+        :param names: An iterable of names
+        :return: A dictionary in the format of {name: primary key}
+        """
+        missing = set(names).difference(self.pks)
+
+        if missing:
+            self.load(missing)
+
+            # Anything still missing has to be created
+            new_names = missing.difference(self.pks)
+            if new_names:
+                self.model.objects.bulk_create(
+                    self.model(**{self.field_name: name})
+                    for name in new_names
+                )
+                self.load(new_names)
+
+                # PizzaForm and the autocomplete have to offer the new names
+                bump_choices_version()
+                if self.model is Ingredient:
+                    added = [(self.pks[name], name) for name in new_names]
+                    transaction.on_commit(
+                        lambda: update_ingredient_index(added=added)
+                    )
+
+        return {name: self.pks[name] for name in names}
+
+    def load(self, names):
+        """
+        Reads the primary keys of the names that exist into memory
+
+        :param names: A set of names
+        """
+        rows = self.model.objects.filter(
+            **{f'{self.field_name}__in': names}
+        ).values_list(self.field_name, 'pk')
+
+        self.pks.update(rows)
+
+
+def clean_pizza_row(row):
+    """
+    Checks a Pizza row the same way PizzaForm would and tidies up its names
+
+    Text is stripped and held to the lengths of the model's fields, the
+    state has to be one PizzaForm offers and likes and dislikes have to be
+    whole numbers. Ingredient names are title cased, the same as
+    IngredientForm.clean_name.
+
+    :param row:
+        A dictionary of Pizza fields, holding the Crust type under 'crust'
+        and a list of Ingredient names under 'ingredients'
+    :return if valid: A new dictionary holding only the Pizza's fields
+    :return if invalid: None
+    """
+    if not isinstance(row, dict):
+        return None
+
+    if any(
+        not isinstance(row.get(field), (str, type(None)))
+        for field in TEXT_PIZZA_FIELDS
+    ):
+        return None
+
+    ingredient_names = row.get('ingredients') or []
+    if not isinstance(ingredient_names, list) or any(
+        not isinstance(name, str) for name in ingredient_names
+    ):
+        return None
+
+    try:
+        cleaned = {}
+        for field, form_field in PIZZA_FORM_FIELDS.items():
+            value = form_field.clean(row.get(field))
+
+            # Leave out blank optional columns, so their defaults are used
+            if value not in ('', None):
+                cleaned[field] = value
+
+        cleaned['crust'] = CRUST_FORM_FIELD.clean(row.get('crust'))
+        cleaned['ingredients'] = sorted({
+            INGREDIENT_FORM_FIELD.clean(name.strip().title())
+            for name in ingredient_names if name.strip()
+        })
+    except ValidationError:
+        return None
+
+    if cleaned['state'] not in STATE_CODES:
+        return None
+
+    return cleaned
+
+
+def import_pizzas(rows, upsert: bool = False, batch_size: int = BATCH_SIZE):
+    """
+    Saves many Pizzas, a batch at a time, in a single transaction
+
+    Crusts and Ingredients are matched by name, and created when they do not
+    exist yet. Pizzas are matched by name as well. Existing ones are left
+    alone, or overwritten along with their Ingredients when upserting.
+
+    :param rows: An iterable of dictionaries, see clean_pizza_row
+    :param upsert: Whether to overwrite Pizzas that already exist
+    :param batch_size: How many Pizzas to write at a time
+    :return:
+        A dictionary in the format of
+        {'created': int, 'updated': int, 'skipped': int, 'invalid': int}
+    """
+    counts = {'created': 0, 'updated': 0, 'skipped': 0, 'invalid': 0}
+    crusts = NameLookup(Crust, 'type')
+    ingredients = NameLookup(Ingredient, 'name')
+
+    with transaction.atomic():
+        batch = {}
+        for row in rows:
+            cleaned = clean_pizza_row(row)
+            if cleaned is None:
+                counts['invalid'] += 1
+                continue
+
+            # A later row with the same name replaces an earlier one
+            batch[cleaned['name']] = cleaned
+
+            if len(batch) >= batch_size:
+                save_pizza_batch(batch, crusts, ingredients, upsert, counts)
+                batch = {}
+
+        save_pizza_batch(batch, crusts, ingredients, upsert, counts)
+
+    # Drop every cached listing and leaderboard once, rather than once per
+    # Pizza
+    bump_catalog_version()
+    bump_leaderboard_version()
+
+    return counts
+
+
+def save_pizza_batch(batch: dict, crusts: NameLookup,
+                     ingredients: NameLookup, upsert: bool, counts: dict):
+    """
+    Writes a batch of cleaned Pizza rows to the database
+
+    :param batch: A dictionary in the format of {pizza name: cleaned row}
+    :param crusts: The NameLookup for Crusts
+    :param ingredients: The NameLookup for Ingredients
+    :param upsert: Whether to overwrite Pizzas that already exist
+    :param counts: The counts from import_pizzas, updated in place
+    """
+    if not batch:
+        return
+
+    crust_pks = crusts.resolve({row['crust'] for row in batch.values()})
+    ingredient_pks = ingredients.resolve({
+        name for row in batch.values() for name in row['ingredients']
+    })
+
+    existing = dict(
+        Pizza.objects.filter(name__in=list(batch)).values_list('name', 'pk')
+    )
+    new_rows = [row for name, row in batch.items() if name not in existing]
+
+    # Overwrite or skip the Pizzas that already exist
+    rows_by_pk = {}
+    if upsert:
+        rows_by_pk = {existing[name]: batch[name] for name in existing}
+    else:
+        counts['skipped'] += len(existing)
+
+    # Rows missing an optional column leave it as it is, so Pizzas are
+    # updated together with the others that have the same columns
+    pizzas_by_fields = defaultdict(list)
+    now = timezone.now()
+    for pk, row in rows_by_pk.items():
+        fields = tuple(field for field in PIZZA_FIELDS if field in row)
+        pizzas_by_fields[fields].append(Pizza(
+            pk=pk,
+            crust_id=crust_pks[row['crust']],
+            updated_at=now,
+            **{field: row[field] for field in fields}
+        ))
+
+    for fields, pizzas in pizzas_by_fields.items():
+        Pizza.objects.bulk_update(
+            pizzas, ['crust', 'updated_at', *fields], batch_size=BATCH_SIZE
+        )
+
+    # The listings are dropped once the import is done
+    for pk in rows_by_pk:
+        bump_pizza_version(pk, catalog=False)
+
+    Pizza.ingredients.through.objects.filter(
+        pizza_id__in=list(rows_by_pk)
+    ).delete()
+    counts['updated'] += len(rows_by_pk)
+
+    Pizza.objects.bulk_create(
+        Pizza(
+            crust_id=crust_pks[row['crust']],
+            **{field: row[field] for field in PIZZA_FIELDS if field in row}
+        )
+        for row in new_rows
+    )
+    counts['created'] += len(new_rows)
+
+    # Not every database hands back the new primary keys, so look them up
+    new_pks = Pizza.objects.filter(
+        name__in=[row['name'] for row in new_rows]
+    ).values_list('pk', 'name')
+    rows_by_pk.update((pk, batch[name]) for pk, name in new_pks)
+
+    add_ingredients_in_bulk({
+        pk: [ingredient_pks[name] for name in row['ingredients']]
+        for pk, row in rows_by_pk.items()
+    })
+
+    # Everything the search needs is already in the rows
+    index_documents(rows_by_pk, {
+        pk: (
+            row['name'], row['summary'], row['city'],
+            ' '.join(row['ingredients'])
+        )
+        for pk, row in rows_by_pk.items()
+    })
+
+
+def add_ingredients_in_bulk(ingredients_by_pizza: dict):
+    """
+    Adds Ingredients to Pizzas with a bulk insert into the through table
+
+    The rows are inserted with plain SQL, because building a model instance
+    for every row costs more than the insert itself.
+
+    :param ingredients_by_pizza:
+        A dictionary in the format of {pizza_id: [ingredient_id, ...]}
+    """
+    through = Pizza.ingredients.through
+    quote_name = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote_name(through._meta.db_table)} '
+            f'({quote_name("pizza_id")}, {quote_name("ingredient_id")}) '
+            f'VALUES (%s, %s)',
+            [
+                (pizza_id, ingredient_id)
+                for pizza_id, ingredient_ids in ingredients_by_pizza.items()
+                for ingredient_id in ingredient_ids
+            ]
+        )
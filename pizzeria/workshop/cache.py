@@ -0,0 +1,206 @@
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+
+# Cache keys used to cache responses
+CATALOG_VERSION_KEY = 'workshop:version:catalog'
+PIZZA_VERSION_KEY = 'workshop:version:pizza:{pk}'
+RESPONSE_KEY = 'workshop:response:{version}:{user}:{path}'
+
+# Cache key marking every leaderboard built before it as stale
+LEADERBOARD_VERSION_KEY = 'workshop:version:leaderboards'
+
+# Cache key marking every in-memory search index built before it as stale
+SEARCH_VERSION_KEY = 'workshop:version:search'
+
+# Cache keys used to cache the Crust and Ingredient choices in PizzaForm
+CHOICES_KEY = 'workshop:choices:{version}:{model}'
+CHOICES_VERSION_KEY = 'workshop:version:choices'
+
+
+def bump_catalog_version():
+    """Changes the catalog version, so every cached Pizza listing is stale"""
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def bump_choices_version():
+    """Changes the choices version, so every cached choice list is stale"""
+    bump_version(CHOICES_VERSION_KEY)
+
+
+def bump_leaderboard_version():
+    """Changes the leaderboard version, so every process rebuilds its boards"""
+    bump_version(LEADERBOARD_VERSION_KEY)
+
+
+def bump_search_version():
+    """Changes the search version, so every in-memory search index is stale"""
+    bump_version(SEARCH_VERSION_KEY)
+
+
+def bump_pizza_version(pk: int, catalog: bool = True):
+    """
+    Changes a Pizza's version, so its cached page is stale
+
+    Almost any change to a Pizza also changes the listings, so the catalog
+    version changes as well unless told otherwise.
+
+    :param pk: Primary key for a Pizza object
+    :param catalog: Whether the listings are stale too
+    """
+    bump_version(PIZZA_VERSION_KEY.format(pk=pk))
+    if catalog:
+        bump_catalog_version()
+
+
+def bump_pizza_versions(pks):
+    """
+    Changes the versions of many Pizzas at once, leaving the catalog alone
+
+    :param pks: An iterable of Pizza primary keys
+    """
+    version = time.time_ns()
+    cache.set_many(
+        {PIZZA_VERSION_KEY.format(pk=pk): version for pk in pks},
+        timeout=None
+    )
+
+
+def bump_version(key: str):
+    """
+    Changes the version number stored under a cache key
+
+    Versions are the time of the last change in nanoseconds, so they also
+    tell when something last changed. If the cache throws a version away,
+    the new one can never match a response cached under an old one.
+
+    :param key: The cache key holding the version
+    """
+    cache.set(key, time.time_ns(), timeout=None)
+
+
+def cache_response(version_func):
+    """
+    Caches a view's response until the version it depends on changes
+
+    Responses are stored under the version, the user and the full path, so a
+    signal bumping the version is all it takes to stop serving them. Logged
+    out users share one copy, logged in users get their own because of the
+    navbar. Requests with messages waiting to be shown skip the cache.
+
+    :param version_func:
+        Called with the view's keyword arguments, returns the version number
+        the response depends on
+    :return: A view decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or has_messages_waiting(request):
+                return view(request, *args, **kwargs)
+
+            key = RESPONSE_KEY.format(
+                version=version_func(**kwargs),
+                user=request.user.pk or 'anonymous',
+                path=request.get_full_path()
+            )
+
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+
+                # Only keep plain pages that do not set cookies
+                if (response.status_code == 200 and
+                        not response.streaming and not response.cookies):
+                    cache.set(
+                        key,
+                        response,
+                        timeout=settings.WORKSHOP_RESPONSE_CACHE_TIMEOUT
+                    )
+
+            return response
+        return wrapper
+    return decorator
+
+
+def get_cached_choices(model, field_name: str):
+    """
+    Lists the choices for picking a Crust or Ingredient, from the cache
+
+    The list is built once for each choices version, so a form does not
+    have to load every Crust and Ingredient each time it is shown. It also
+    expires after WORKSHOP_RESPONSE_CACHE_TIMEOUT, so processes that do not
+    share a cache pick up changes made by the others.
+
+    :param model: Crust or Ingredient
+    :param field_name: The model field shown for each choice
+    :return: A list of (primary key, label) tuples
+    """
+    key = CHOICES_KEY.format(
+        version=get_version(CHOICES_VERSION_KEY),
+        model=model._meta.label_lower
+    )
+
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(
+            model.objects.order_by('pk').values_list('pk', field_name)
+        )
+        cache.set(
+            key, choices, timeout=settings.WORKSHOP_RESPONSE_CACHE_TIMEOUT
+        )
+
+    return choices
+
+
+def get_catalog_version(**kwargs):
+    """
+    Looks up the catalog version, which changes whenever anything is saved
+
+    :return: The catalog version number
+    """
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def get_pizza_version(pk: int, **kwargs):
+    """
+    Looks up a Pizza's version, which changes whenever the Pizza changes
+
+    :param pk: Primary key for a Pizza object
+    :return: The Pizza's version number
+    """
+    return get_version(PIZZA_VERSION_KEY.format(pk=pk))
+
+
+def get_version(key: str):
+    """
+    Looks up the version number stored under a cache key
+
+    :param key: The cache key holding the version
+    :return: The version number
+    """
+    return cache.get_or_set(key, time.time_ns, timeout=None)
+
+
+def has_messages_waiting(request):
+    """
+    Checks if the request has messages that still need to be shown
+
+    :param request: Standard Django request object
+    :return: boolean
+    """
+    return bool(len(messages.get_messages(request)))
+
+
+def version_to_datetime(version: int):
+    """
+    Turns a version number back into the time it was created
+
+    :param version: A version number from get_version
+    :return: A timezone aware datetime
+    """
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
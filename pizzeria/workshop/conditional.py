@@ -0,0 +1,112 @@
+"""
+Functions used with Django's condition decorator, so browsers and proxies can
+be told '304 Not Modified' without rendering the page.
+
+They return None when the request has messages waiting, because those have
+to be shown on a freshly rendered page.
+"""
+
+from .cache import (
+    get_catalog_version, get_pizza_version, has_messages_waiting,
+    version_to_datetime
+)
+from .models import Pizza
+from .votes import merge_pending_votes
+
+
+def create_catalog_etag(request, **kwargs):
+    """
+    Creates the ETag for a Pizza listing from the catalog version
+
+    The catalog version changes on any write, so no database query is
+    needed. Logged in users get their own ETag because of the navbar.
+
+    :param request: Standard Django request object
+    :return: A quoted ETag string, or None
+    """
+    if has_messages_waiting(request):
+        return None
+
+    user = request.user.pk or 'anonymous'
+
+    return f'"catalog-{get_catalog_version()}-{user}"'
+
+
+def create_pizza_etag(request, pk: int):
+    """
+    Creates the ETag for a Pizza's page from its update time and votes
+
+    :param request: Standard Django request object
+    :param pk: Primary key for a Pizza object
+    :return: A quoted ETag string, or None
+    """
+    validators = get_pizza_validators(request, pk)
+
+    return validators and validators['etag']
+
+
+def get_catalog_last_modified(request, **kwargs):
+    """
+    Finds when anything in the Pizza catalog last changed
+
+    :param request: Standard Django request object
+    :return: A timezone aware datetime, or None
+    """
+    if has_messages_waiting(request):
+        return None
+
+    return version_to_datetime(get_catalog_version())
+
+
+def get_pizza_last_modified(request, pk: int):
+    """
+    Finds when a Pizza, or the votes on it, last changed
+
+    :param request: Standard Django request object
+    :param pk: Primary key for a Pizza object
+    :return: A timezone aware datetime, or None
+    """
+    validators = get_pizza_validators(request, pk)
+
+    return validators and validators['last_modified']
+
+
+def get_pizza_validators(request, pk: int):
+    """
+    Looks up what a Pizza page's ETag and Last-Modified are made from
+
+    Only the columns needed are fetched. The result is kept on the request,
+    so the ETag and Last-Modified share a single query.
+
+    :param request: Standard Django request object
+    :param pk: Primary key for a Pizza object
+    :return:
+        A dictionary with 'etag' and 'last_modified' keys, or None if the
+        Pizza does not exist or there are messages waiting
+    """
+    if hasattr(request, 'pizza_validators'):
+        return request.pizza_validators
+
+    request.pizza_validators = None
+    pizza = Pizza.objects.only('updated_at', 'likes', 'dislikes').filter(
+        pk=pk
+    ).first()
+
+    if pizza is not None and not has_messages_waiting(request):
+        merge_pending_votes([pizza])
+        user = request.user.pk or 'anonymous'
+        updated_at = pizza.updated_at.timestamp()
+
+        # Votes do not move updated_at, but they do bump the Pizza's version
+        request.pizza_validators = {
+            'etag': (
+                f'"pizza-{pk}-{updated_at}-{pizza.likes}-{pizza.dislikes}'
+                f'-{user}"'
+            ),
+            'last_modified': max(
+                pizza.updated_at,
+                version_to_datetime(get_pizza_version(pk))
+            ),
+        }
+
+    return request.pizza_validators
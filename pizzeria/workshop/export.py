@@ -0,0 +1,165 @@
+"""
+Streams the Pizza, Crust and Ingredient tables out as CSV or JSON Lines, for
+analytics that need the whole catalog.
+
+Rows are read with .iterator(), which uses a server-side cursor where the
+database has one, and written out one at a time. Memory use stays the same
+however big the tables get.
+"""
+import csv
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
+
+from pizzeria.async_views import stream_content
+
+from .models import Crust, Ingredient, Pizza
+
+# How many rows are fetched from the database at a time
+CHUNK_SIZE = 2000
+
+# The content type sent with each export format
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# The columns written for each table
+EXPORT_COLUMNS = {
+    'pizzas': [
+        'id', 'name', 'summary', 'city', 'state', 'crust', 'ingredients',
+        'likes', 'dislikes', 'time_created', 'updated_at'
+    ],
+    'crusts': ['id', 'type'],
+    'ingredients': ['id', 'name'],
+}
+
+
+class EchoBuffer:
+    """A file-like object that hands back whatever is written to it"""
+
+    def write(self, value: str):
+        """
+        Returns the value instead of storing it, so csv.writer can be used
+        to format rows one at a time
+
+        :param value: A formatted CSV row
+        :return: The same value
+        """
+        return value
+
+
+""" Views """
+
+
+@login_required
+def download_catalog(request, table: str):
+    """
+    Streams a whole table to the user as a file
+
+    :param request: Standard Django request object
+    :param table: One of the EXPORT_COLUMNS keys
+    :return if valid: A streamed CSV or JSON Lines file
+    :return if the table or ?format= is unknown: HTTP 404
+    """
+    export_format = request.GET.get('format', 'csv')
+    if table not in EXPORT_COLUMNS or export_format not in EXPORT_FORMATS:
+        raise Http404('The export requested can not be found.')
+
+    response = StreamingHttpResponse(
+        stream_content(request, export_table(table, export_format)),
+        content_type=EXPORT_FORMATS[export_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{table}.{export_format}"'
+    )
+
+    return response
+
+
+""" Functions """
+
+
+def export_table(table: str, export_format: str):
+    """
+    Writes out every row of a table, one line at a time
+
+    :param table: One of the EXPORT_COLUMNS keys
+    :param export_format: One of the EXPORT_FORMATS keys
+    :return: A generator of lines of text
+    """
+    columns = EXPORT_COLUMNS[table]
+    rows = iterate_rows(table)
+
+    if export_format == 'csv':
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(columns)
+
+        for row in rows:
+            if table == 'pizzas':
+                row['ingredients'] = ', '.join(row['ingredients'])
+            yield writer.writerow(row[column] for column in columns)
+    else:
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def iterate_pizza_rows():
+    """
+    Reads every Pizza along with its Crust type and Ingredient names
+
+    Pizzas and their Ingredients are read side by side, both ordered by the
+    Pizza's id, so each Pizza's Ingredients are found without holding more
+    than one Pizza's worth in memory.
+
+    :return: A generator of dictionaries, ordered by id
+    """
+    columns = [
+        column for column in EXPORT_COLUMNS['pizzas']
+        if column != 'ingredients'
+    ]
+    lookups = [
+        'crust__type' if column == 'crust' else column for column in columns
+    ]
+    pizzas = Pizza.objects.order_by('id').values_list(*lookups).iterator(
+        chunk_size=CHUNK_SIZE
+    )
+
+    ingredients = Pizza.ingredients.through.objects.order_by(
+        'pizza_id'
+    ).values_list('pizza_id', 'ingredient__name').iterator(
+        chunk_size=CHUNK_SIZE
+    )
+    ingredient = next(ingredients, None)
+
+    for pizza in pizzas:
+        values = dict(zip(columns, pizza))
+
+        # Skip past the Ingredients of any Pizza deleted while reading
+        names = []
+        while ingredient is not None and ingredient[0] <= values['id']:
+            if ingredient[0] == values['id']:
+                names.append(ingredient[1])
+            ingredient = next(ingredients, None)
+        values['ingredients'] = sorted(names)
+
+        yield {column: values[column] for column in EXPORT_COLUMNS['pizzas']}
+
+
+def iterate_rows(table: str):
+    """
+    Reads every row of a table
+
+    :param table: One of the EXPORT_COLUMNS keys
+    :return: A generator of dictionaries, ordered by id
+    """
+    if table == 'pizzas':
+        return iterate_pizza_rows()
+
+    model = Crust if table == 'crusts' else Ingredient
+
+    return model.objects.order_by('id').values(
+        *EXPORT_COLUMNS[table]
+    ).iterator(chunk_size=CHUNK_SIZE)
@@ -1,6 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.urls import reverse, reverse_lazy
 
 from . import models
+from .cache import get_cached_choices
 
 STATES = [
     ('AL', 'AL'), ('AK', 'AK'), ('AZ', 'AZ'), ('AR', 'AR'), ('CA', 'CA'),
@@ -25,6 +28,14 @@ class IngredientForm(forms.ModelForm):
         model = models.Ingredient
         fields = ['name']
 
+        # Suggest the Ingredients that already exist while the name is typed
+        widgets = {'name': forms.TextInput(attrs={
+            'autocomplete': 'off',
+            'data-autocomplete-url': reverse_lazy(
+                'workshop:api_ingredient_autocomplete'
+            ),
+        })}
+
     def clean_name(self):
         """Over-ride the value for name and title case it"""
         name = self.cleaned_data['name']
@@ -42,3 +53,66 @@ class PizzaForm(forms.ModelForm):
         # Over-ride the State field to be a state selector
         widgets = {'state': forms.Select(choices=STATES)}
 
+    def __init__(self, *args, **kwargs):
+        """
+        Fills in the Crust and Ingredient choices from the cache
+
+        The choices are only looked up if the form is shown, and submitted
+        choices are still checked against the database. With
+        WORKSHOP_INGREDIENT_AUTOCOMPLETE on, only the Ingredients already
+        picked are listed and the rest are found through the autocomplete
+        endpoint.
+        """
+        super().__init__(*args, **kwargs)
+
+        self.fields['crust'].choices = self.get_crust_choices
+
+        ingredients = self.fields['ingredients']
+        if settings.WORKSHOP_INGREDIENT_AUTOCOMPLETE:
+            ingredients.choices = self.get_picked_ingredients
+            ingredients.widget.attrs['data-autocomplete-url'] = reverse(
+                'workshop:api_ingredient_autocomplete'
+            )
+        else:
+            ingredients.choices = self.get_ingredient_choices
+
+    def get_crust_choices(self):
+        """
+        Lists every Crust, after the empty choice if there is one
+
+        :return: A list of (primary key, type) tuples
+        """
+        choices = get_cached_choices(models.Crust, 'type')
+
+        empty_label = self.fields['crust'].empty_label
+        if empty_label is not None:
+            choices = [('', empty_label)] + choices
+
+        return choices
+
+    def get_ingredient_choices(self):
+        """
+        Lists every Ingredient
+
+        :return: A list of (primary key, name) tuples
+        """
+        return get_cached_choices(models.Ingredient, 'name')
+
+    def get_picked_ingredients(self):
+        """
+        Lists the Ingredients picked so far, from the data or the Pizza
+
+        :return: A list of (primary key, name) tuples
+        """
+        picked = [
+            pk for pk in self['ingredients'].value() or []
+            if str(pk).isdigit()
+        ]
+        if not picked:
+            return []
+
+        return list(
+            models.Ingredient.objects.filter(pk__in=picked).order_by(
+                'pk'
+            ).values_list('pk', 'name')
+        )
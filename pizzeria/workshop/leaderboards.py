@@ -0,0 +1,248 @@
+"""
+Leaderboards of the top Pizzas, overall and within each state and Crust.
+
+Each board keeps its Pizzas in memory in ranked order, so it is sent without
+sorting the Pizza table. A board is filled from the database the first time
+it is asked for. After that the vote code and the receivers in signals.py
+move Pizzas up and down the boards as their votes change.
+
+Each process only sees the votes it counted itself. Boards are rebuilt once
+they are WORKSHOP_LEADERBOARD_MAX_AGE seconds old, or straight away once the
+rebuild_leaderboards command has marked them as stale.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db.models import F
+
+from .cache import LEADERBOARD_VERSION_KEY, get_version
+from .models import Pizza
+
+# How each metric is worked out, by the database and from a Pizza's row
+METRICS = {
+    'likes': (F('likes'), lambda row: row['likes']),
+    'score': (
+        F('likes') - F('dislikes'), lambda row: row['likes'] - row['dislikes']
+    ),
+}
+
+# The Pizza fields a board can be limited to
+SCOPE_FIELDS = ['state', 'crust_id']
+
+# The Pizza columns held for each Pizza on a board
+LEADERBOARD_FIELDS = ['id', 'name', 'state', 'crust_id', 'likes', 'dislikes']
+
+# Extra Pizzas held past the end of each board, so a Pizza dropping off can
+# be replaced without going back to the database
+SPARE_ENTRIES = 50
+
+
+class Leaderboard:
+    """
+    The top Pizzas by one metric, best first
+
+    Every Pizza left off the board ranks below the last one on it. When a
+    Pizza on the board drops below the last one, it is taken off, as a Pizza
+    left off may now rank above it. The board is rebuilt once it no longer
+    holds WORKSHOP_LEADERBOARD_SIZE Pizzas.
+    """
+
+    def __init__(self, metric: str, scope_field: str = None, scope=None):
+        """
+        Creates an empty board, it is filled in by build
+
+        :param metric: A key of METRICS
+        :param scope_field: One of SCOPE_FIELDS, or None for every Pizza
+        :param scope: The value the scope field has to have
+        """
+        self.metric = metric
+        self.scope_field = scope_field
+        self.scope = scope
+
+        # (-metric value, -pizza_id) for every Pizza on the board, in order.
+        # Ties go to the newest Pizza, as they do on the homepage.
+        self.keys = []
+
+        # {pizza_id: the Pizza's LEADERBOARD_FIELDS}
+        self.rows = {}
+
+        # Whether every Pizza in the scope is on the board
+        self.complete = False
+
+        self.built_at = None
+        self.version = None
+
+    @property
+    def capacity(self):
+        """The most Pizzas the board holds"""
+        return settings.WORKSHOP_LEADERBOARD_SIZE + SPARE_ENTRIES
+
+    def build(self, version: int):
+        """
+        Fills the board from the database
+
+        :param version: The leaderboard version the board is built for
+        """
+        expression, _ = METRICS[self.metric]
+        pizzas = Pizza.objects.annotate(
+            metric_value=expression
+        ).order_by('-metric_value', '-id')
+
+        if self.scope_field is not None:
+            pizzas = pizzas.filter(**{self.scope_field: self.scope})
+
+        rows = list(pizzas.values(*LEADERBOARD_FIELDS)[:self.capacity])
+
+        self.keys = [self.get_key(row) for row in rows]
+        self.rows = {row['id']: row for row in rows}
+        self.complete = len(rows) < self.capacity
+        self.built_at = time.monotonic()
+        self.version = version
+
+    def get_key(self, row: dict):
+        """
+        Works out where a Pizza goes on the board
+
+        :param row: A dictionary of the Pizza's LEADERBOARD_FIELDS
+        :return: A tuple that sorts the best Pizza first
+        """
+        _, get_value = METRICS[self.metric]
+        return -get_value(row), -row['id']
+
+    def get_top(self, limit: int):
+        """
+        Lists the best Pizzas on the board
+
+        :param limit: The most Pizzas to list
+        :return: A list of dictionaries of LEADERBOARD_FIELDS, best first
+        """
+        return [self.rows[-pk] for _, pk in self.keys[:limit]]
+
+    def is_stale(self, version: int):
+        """
+        Checks if the board has to be built again before it is used
+
+        :param version: The current leaderboard version
+        :return: boolean
+        """
+        if self.built_at is None or self.version != version:
+            return True
+
+        age = time.monotonic() - self.built_at
+        if age >= settings.WORKSHOP_LEADERBOARD_MAX_AGE:
+            return True
+
+        return (not self.complete and
+                len(self.keys) < settings.WORKSHOP_LEADERBOARD_SIZE)
+
+    def remove(self, pk: int):
+        """
+        Takes a Pizza off the board
+
+        :param pk: Primary key for a Pizza object
+        """
+        row = self.rows.pop(pk, None)
+        if row is not None:
+            del self.keys[bisect_left(self.keys, self.get_key(row))]
+
+    def update(self, row: dict):
+        """
+        Moves a Pizza to its place on the board for its latest counts
+
+        :param row: A dictionary of the Pizza's LEADERBOARD_FIELDS
+        """
+        self.remove(row['id'])
+
+        if (self.scope_field is not None and
+                row[self.scope_field] != self.scope):
+            return
+
+        # Below the last Pizza, a Pizza left off the board may rank higher
+        key = self.get_key(row)
+        if not self.complete and (not self.keys or key > self.keys[-1]):
+            return
+
+        insort(self.keys, key)
+        self.rows[row['id']] = row
+
+        if len(self.keys) > self.capacity:
+            _, pk = self.keys.pop()
+            del self.rows[-pk]
+            self.complete = False
+
+
+class LeaderboardSet:
+    """Every board this process has been asked for"""
+
+    def __init__(self):
+        """Creates an empty set, boards are added as they are asked for"""
+        self.lock = threading.RLock()
+
+        # {(metric, scope field, scope): Leaderboard}
+        self.boards = {}
+
+    def get_top(self, metric: str, scope_field: str = None, scope=None,
+                limit: int = None):
+        """
+        Lists the best Pizzas on a board, building it first if needed
+
+        :param metric: A key of METRICS
+        :param scope_field: One of SCOPE_FIELDS, or None for every Pizza
+        :param scope: The value the scope field has to have
+        :param limit:
+            The most Pizzas to list, WORKSHOP_LEADERBOARD_SIZE when None
+        :return: A list of dictionaries of LEADERBOARD_FIELDS, best first
+        """
+        if limit is None:
+            limit = settings.WORKSHOP_LEADERBOARD_SIZE
+
+        version = get_version(LEADERBOARD_VERSION_KEY)
+
+        with self.lock:
+            key = (metric, scope_field, scope)
+            board = self.boards.get(key)
+            if board is None:
+                board = self.boards[key] = Leaderboard(*key)
+
+            if board.is_stale(version):
+                board.build(version)
+
+            return board.get_top(limit)
+
+    def update(self, rows: list, removed_pks):
+        """
+        Moves Pizzas on every board built so far
+
+        :param rows:
+            Dictionaries of LEADERBOARD_FIELDS for the Pizzas that changed
+        :param removed_pks: An iterable of ids of Pizzas that were deleted
+        """
+        with self.lock:
+            for board in self.boards.values():
+                for pk in removed_pks:
+                    board.remove(pk)
+                for row in rows:
+                    board.update(row)
+
+
+# The boards for this process
+leaderboards = LeaderboardSet()
+
+
+def update_leaderboards(pizza_ids):
+    """
+    Moves Pizzas whose votes or details changed on the boards built so far
+
+    :param pizza_ids: An iterable of Pizza ids
+    """
+    if not leaderboards.boards:
+        return
+
+    pizza_ids = set(pizza_ids)
+    rows = list(
+        Pizza.objects.filter(pk__in=pizza_ids).values(*LEADERBOARD_FIELDS)
+    )
+
+    leaderboards.update(rows, pizza_ids.difference(row['id'] for row in rows))
@@ -0,0 +1,468 @@
+"""
+Sends vote counts to open pages as they change, so a vote does not have to
+reload the homepage.
+
+Votes cast through vote_pizza answer with just the new counts, and every
+vote is published to a broker. Each open homepage or Pizza page listens on
+vote_stream, a Server-Sent Events stream of the counts for the Pizzas it
+shows. WORKSHOP_LIVE_BROKER picks the broker, 'memory' to pass events
+between the threads of this process, or 'cache' to pass them through a
+cache that several processes can share, such as Redis or Memcached.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
+
+from pizzeria.query_budget import query_budget
+
+from .models import Pizza
+from .votes import merge_pending_votes, record_vote
+
+# Cache keys used by CacheBroker
+EVENT_COUNT_KEY = 'workshop:live:events'
+EVENT_KEY = 'workshop:live:events:{number}'
+
+# How long, in milliseconds, a browser waits before opening a closed stream
+RECONNECT_DELAY = 3000
+
+
+class MemoryBroker:
+    """Passes events between the threads and event loops of this process"""
+
+    # Events a slow listener can fall behind by before new ones are dropped.
+    # Every event holds the full counts, so a dropped one is fixed by the next.
+    MAX_QUEUED_EVENTS = 100
+
+    def __init__(self):
+        """Starts with no one listening"""
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+
+    def publish(self, event: dict):
+        """
+        Sends an event to everyone listening
+
+        :param event: A dictionary that can be sent as JSON
+        """
+        with self.lock:
+            listening = list(self.subscriptions)
+
+        for subscription in listening:
+            subscription.put(event)
+
+    def subscribe(self):
+        """
+        Starts listening for events
+
+        :return: A MemorySubscription, which must be closed when done
+        """
+        subscription = MemorySubscription(self)
+        with self.lock:
+            self.subscriptions.add(subscription)
+
+        return subscription
+
+
+class MemorySubscription:
+    """
+    Receives the events published to a MemoryBroker
+
+    Events can be waited for from a thread with get, or from an event loop
+    with aget, which holds no thread while it waits.
+    """
+
+    def __init__(self, broker: MemoryBroker):
+        """
+        :param broker: The broker listened to
+        """
+        self.broker = broker
+        self.events = queue.Queue(broker.MAX_QUEUED_EVENTS)
+
+        # Set by aget, so put can wake the event loop waiting on it
+        self.loop = None
+        self.arrived = None
+
+    def put(self, event: dict):
+        """
+        Hands an event over, dropping it if too many are waiting
+
+        :param event: A dictionary that can be sent as JSON
+        """
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            return
+
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.arrived.set)
+            except RuntimeError:
+                # The event loop has closed, so no one is waiting
+                pass
+
+    def get(self, timeout: float):
+        """
+        Waits for the next event
+
+        :param timeout: The most seconds to wait
+        :return: The event, or None if none came in time
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout: float):
+        """
+        Waits for the next event without holding a thread
+
+        :param timeout: The most seconds to wait
+        :return: The event, or None if none came in time
+        """
+        if self.loop is None:
+            self.arrived = asyncio.Event()
+            self.loop = asyncio.get_running_loop()
+
+        deadline = time.monotonic() + timeout
+        while True:
+            # Clearing first means an event put after the check still wakes
+            # the wait below
+            self.arrived.clear()
+            try:
+                return self.events.get_nowait()
+            except queue.Empty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            try:
+                await asyncio.wait_for(self.arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    def close(self):
+        """Stops listening"""
+        with self.broker.lock:
+            self.broker.subscriptions.discard(self)
+
+
+class CacheBroker:
+    """
+    Passes events through a cache, so every process sharing it gets them
+
+    Each event is kept under an increasing number for a minute, and
+    listeners poll for numbers they have not seen yet.
+    """
+
+    # How long, in seconds, an event is kept for listeners to pick up
+    EVENT_TIMEOUT = 60
+
+    # How often, in seconds, listeners check for new events
+    POLL_INTERVAL = 0.25
+
+    def __init__(self):
+        """Uses the cache named by WORKSHOP_LIVE_BROKER_CACHE"""
+        self.cache = caches[settings.WORKSHOP_LIVE_BROKER_CACHE]
+
+    def publish(self, event: dict):
+        """
+        Sends an event to everyone listening
+
+        :param event: A dictionary that can be sent as JSON
+        """
+        self.cache.add(EVENT_COUNT_KEY, 0, timeout=None)
+        number = self.cache.incr(EVENT_COUNT_KEY)
+        self.cache.set(
+            EVENT_KEY.format(number=number), event, self.EVENT_TIMEOUT
+        )
+
+    def subscribe(self):
+        """
+        Starts listening for events published from now on
+
+        :return: A CacheSubscription
+        """
+        return CacheSubscription(self, self.cache.get(EVENT_COUNT_KEY, 0))
+
+
+class CacheSubscription:
+    """Receives the events published to a CacheBroker"""
+
+    def __init__(self, broker: CacheBroker, last_number: int):
+        """
+        :param broker: The broker listened to
+        :param last_number: The number of the last event already seen
+        """
+        self.broker = broker
+        self.last_number = last_number
+        self.events = []
+
+    def get(self, timeout: float):
+        """
+        Waits for the next event
+
+        :param timeout: The most seconds to wait
+        :return: The event, or None if none came in time
+        """
+        cache = self.broker.cache
+        deadline = time.monotonic() + timeout
+
+        while not self.events:
+            number = cache.get(EVENT_COUNT_KEY, 0)
+
+            # The count was lost from the cache and started again
+            if number < self.last_number:
+                self.last_number = number
+
+            if number > self.last_number:
+                keys = [
+                    EVENT_KEY.format(number=event_number)
+                    for event_number in range(self.last_number + 1, number + 1)
+                ]
+                found = cache.get_many(keys)
+                self.events = [found[key] for key in keys if key in found]
+                self.last_number = number
+            elif time.monotonic() >= deadline:
+                return None
+            else:
+                time.sleep(
+                    min(self.broker.POLL_INTERVAL, deadline - time.monotonic())
+                )
+
+        return self.events.pop(0)
+
+    async def aget(self, timeout: float):
+        """
+        Waits for the next event, only using a thread to check the cache
+
+        :param timeout: The most seconds to wait
+        :return: The event, or None if none came in time
+        """
+        deadline = time.monotonic() + timeout
+        check = sync_to_async(self.get, thread_sensitive=False)
+
+        while True:
+            event = await check(0)
+            remaining = deadline - time.monotonic()
+            if event is not None or remaining <= 0:
+                return event
+
+            await asyncio.sleep(min(self.broker.POLL_INTERVAL, remaining))
+
+    def close(self):
+        """Stops listening, which needs nothing for a cache"""
+
+
+# Every broker WORKSHOP_LIVE_BROKER can name
+BROKERS = {'memory': MemoryBroker, 'cache': CacheBroker}
+
+# The brokers made so far in this process, by name
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+""" Views """
+
+
+@require_GET
+@ensure_csrf_cookie
+def vote_stream(request):
+    """
+    Streams the vote counts of some Pizzas as Server-Sent Events
+
+    The Pizzas are given as one or more 'pizza' parameters, or left out to
+    get every Pizza's counts. Each event is named 'votes' and holds the
+    Pizza's id, likes and dislikes. The stream ends after
+    WORKSHOP_LIVE_STREAM_TIMEOUT seconds and the browser opens it again, so
+    a WSGI worker thread is never held forever. Under ASGI the stream waits
+    on the event loop and holds no thread at all.
+
+    The homepage and Pizza pages are cached without cookies, so the CSRF
+    cookie needed to vote through vote_pizza is set here instead.
+
+    :param request: Standard Django request object
+    :return if valid: A text/event-stream response
+    :return if a Pizza id is not a number: HTTP 400 with a JSON error
+    """
+    try:
+        pizza_ids = {int(pk) for pk in request.GET.getlist('pizza')}
+    except ValueError:
+        return JsonResponse(
+            {'error': 'Pizza ids must be numbers.'}, status=400
+        )
+
+    if isinstance(request, ASGIRequest):
+        events = astream_vote_events(get_broker(), pizza_ids)
+    else:
+        events = stream_vote_events(get_broker(), pizza_ids)
+
+    response = StreamingHttpResponse(
+        events, content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+
+    # Stops proxies such as nginx from holding events back
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+@query_budget(8)
+@require_POST
+def vote_pizza(request, pk: int):
+    """
+    Likes or dislikes a Pizza and answers with its new counts
+
+    The vote is given as 'vote', either 'like' or 'dislike'. The new counts
+    are also sent to every page listening on vote_stream.
+
+    :param request: Standard Django request object
+    :param pk: The PK value of a Pizza Object
+    :return if successful: A JSON object of the Pizza's id, likes and dislikes
+    :return if not logged in: HTTP 403 with a JSON error
+    :return if the vote is not 'like' or 'dislike': HTTP 400 with a JSON error
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'error': 'You must be logged in to vote.'}, status=403
+        )
+
+    vote = request.POST.get('vote')
+    if vote not in ['like', 'dislike']:
+        return JsonResponse(
+            {'error': "The vote must be 'like' or 'dislike'."}, status=400
+        )
+
+    pizza = get_object_or_404(Pizza.objects.only('pk'), pk=pk)
+    record_vote(pizza, liked=vote == 'like', user_id=request.user.pk)
+
+    return JsonResponse(publish_vote_counts(pizza.pk))
+
+
+""" Functions """
+
+
+async def astream_vote_events(broker, pizza_ids: set):
+    """
+    Writes the events published to a broker in the Server-Sent Events
+    format, waiting for them on the event loop
+
+    :param broker: From get_broker
+    :param pizza_ids: The ids of the Pizzas to send, or empty for all
+    :return: An async generator of strings
+    """
+    deadline = time.monotonic() + settings.WORKSHOP_LIVE_STREAM_TIMEOUT
+
+    # Listen before the first line, so no vote is missed once the browser
+    # sees the stream has started
+    subscription = broker.subscribe()
+
+    try:
+        yield f'retry: {RECONNECT_DELAY}\n\n'
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            event = await subscription.aget(
+                min(settings.WORKSHOP_LIVE_HEARTBEAT, remaining)
+            )
+            if event is None:
+                yield ': keep-alive\n\n'
+            elif not pizza_ids or event['id'] in pizza_ids:
+                yield format_vote_event(event)
+    finally:
+        subscription.close()
+
+
+def format_vote_event(event: dict):
+    """
+    Writes a vote event in the Server-Sent Events format
+
+    :param event: A dictionary of a Pizza's id, likes and dislikes
+    :return: A string
+    """
+    return f'event: votes\ndata: {json.dumps(event)}\n\n'
+
+
+def get_broker():
+    """
+    Finds the broker named by WORKSHOP_LIVE_BROKER
+
+    :return: The same broker object every time for the same name
+    """
+    name = settings.WORKSHOP_LIVE_BROKER
+
+    with _brokers_lock:
+        if name not in _brokers:
+            _brokers[name] = BROKERS[name]()
+
+        return _brokers[name]
+
+
+def publish_vote_counts(pizza_id: int):
+    """
+    Sends a Pizza's current vote counts to every page listening
+
+    :param pizza_id: The id of the Pizza that was voted on
+    :return: The event sent, in the format of {'id', 'likes', 'dislikes'}
+    """
+    pizza = Pizza.objects.only('likes', 'dislikes').get(pk=pizza_id)
+    merge_pending_votes([pizza])
+
+    event = {'id': pizza.pk, 'likes': pizza.likes, 'dislikes': pizza.dislikes}
+    get_broker().publish(event)
+
+    return event
+
+
+def stream_vote_events(broker, pizza_ids: set):
+    """
+    Writes the events published to a broker in the Server-Sent Events format
+
+    The broker is only listened to once the stream is read, and always
+    stopped in the end, so a response that is never sent holds nothing.
+
+    A comment is written when nothing has happened for
+    WORKSHOP_LIVE_HEARTBEAT seconds, so idle connections are not closed.
+
+    :param broker: From get_broker
+    :param pizza_ids: The ids of the Pizzas to send, or empty for all
+    :return: A generator of strings
+    """
+    deadline = time.monotonic() + settings.WORKSHOP_LIVE_STREAM_TIMEOUT
+
+    # Listen before the first line, so no vote is missed once the browser
+    # sees the stream has started
+    subscription = broker.subscribe()
+
+    try:
+        yield f'retry: {RECONNECT_DELAY}\n\n'
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            event = subscription.get(
+                min(settings.WORKSHOP_LIVE_HEARTBEAT, remaining)
+            )
+            if event is None:
+                yield ': keep-alive\n\n'
+            elif not pizza_ids or event['id'] in pizza_ids:
+                yield format_vote_event(event)
+    finally:
+        subscription.close()
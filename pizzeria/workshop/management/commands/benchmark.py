@@ -0,0 +1,105 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from workshop.benchmark import find_regressions, run_benchmarks
+
+
+class Command(BaseCommand):
+    """Times the site's pages at several catalog sizes"""
+
+    help = (
+        'Times the homepage, every sort, view_pizza, like_pizza, '
+        'dislike_pizza, create_pizza and login_user through the test client, '
+        'against a throwaway test database filled by generate_pizzas. '
+        'Reports p50/p95/p99 latency, requests per second and query counts, '
+        'and can fail when a run is slower than an earlier one.'
+    )
+
+    def add_arguments(self, parser):
+        """Adds the options for what to measure and where to save it"""
+        parser.add_argument(
+            '--sizes',
+            default='100,1000,10000',
+            help='Comma separated numbers of Pizzas to measure at. Defaults '
+                 'to 100,1000,10000.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='How many requests to time for each page and size. '
+                 'Defaults to 100.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seeds the catalog and the Pizzas picked. Defaults to 0.',
+        )
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Keep the cache between requests, instead of rendering '
+                 'every page.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Save the results to this JSON file.',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='A JSON file from an earlier run to compare against.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='How much slower, as a fraction, a p95 latency can get '
+                 'before the comparison fails. Defaults to 0.25.',
+        )
+
+    def handle(self, *args, **options):
+        """Runs the benchmarks in a test database and checks the results"""
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be comma separated numbers.')
+
+        # Never touch the real database
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            results = run_benchmarks(
+                sizes,
+                requests=options['requests'],
+                seed=options['seed'],
+                warm_cache=options['warm_cache'],
+                log=self.stdout.write
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = find_regressions(
+                    json.load(baseline), results, options['threshold']
+                )
+
+            if regressions:
+                raise CommandError(
+                    'Regressions found:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('No regressions found.'))
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from workshop.models import Pizza
+from workshop.pagination import (
+    PIZZAS_PER_PAGE, create_keyset_queryset, encode_cursor
+)
+from workshop.views import SORTED_BY_OPTIONS, create_homepage_queryset
+
+# Bits of EXPLAIN output showing the database sorts every row itself, for
+# SQLite, MySQL and PostgreSQL
+FULL_SORT_MARKERS = ['TEMP B-TREE FOR ORDER BY', 'Using filesort', 'Sort Key:']
+
+
+class Command(BaseCommand):
+    """Prints the query plan for every way the homepage can be sorted"""
+
+    help = (
+        'Prints the EXPLAIN output for the first page and a later page of '
+        'every homepage sort, to check each one is read from an index.'
+    )
+
+    def add_arguments(self, parser):
+        """Adds the --check option"""
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail if any plan sorts the whole table instead of using an '
+                 'index.',
+        )
+
+    def handle(self, *args, **options):
+        """Explains the homepage queries and optionally checks the plans"""
+        # A made up Pizza to create a cursor from, so this works even when
+        # the table is empty
+        cursor_pizza = Pizza(
+            pk=1, time_created=timezone.now(), state='TN', likes=0, dislikes=0
+        )
+
+        full_sorts = []
+        for sorted_by in SORTED_BY_OPTIONS:
+            field = Pizza._meta.get_field(sorted_by.lstrip('-'))
+            cursors = [
+                ('first page', None),
+                ('after a cursor', encode_cursor(cursor_pizza, field)),
+            ]
+
+            for page, cursor in cursors:
+                queryset = create_keyset_queryset(
+                    create_homepage_queryset(), sorted_by, cursor
+                )
+                plan = queryset[:PIZZAS_PER_PAGE + 1].explain()
+
+                heading = f'Sorted by {sorted_by} ({page})'
+                self.stdout.write(self.style.MIGRATE_HEADING(heading))
+                self.stdout.write(plan + '\n')
+
+                if any(marker in plan for marker in FULL_SORT_MARKERS):
+                    full_sorts.append(f'{sorted_by} ({page})')
+
+        if options['check'] and full_sorts:
+            raise CommandError(
+                'These queries sort the whole table: ' + ', '.join(full_sorts)
+            )
@@ -0,0 +1,102 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from workshop.export import EXPORT_COLUMNS, EXPORT_FORMATS, export_table
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    """Streams a table of the Pizza catalog out as CSV or JSON Lines"""
+
+    help = (
+        'Writes every Pizza, Crust or Ingredient as CSV or JSON Lines, '
+        'reading the table in chunks so memory use stays the same whatever '
+        'its size. Use --stats to benchmark the export.'
+    )
+
+    def add_arguments(self, parser):
+        """Adds the table argument and the export options"""
+        parser.add_argument('table', choices=sorted(EXPORT_COLUMNS))
+        parser.add_argument(
+            '--format',
+            choices=sorted(EXPORT_FORMATS),
+            default='csv',
+            dest='export_format',
+            help='The file format to write. Defaults to csv.',
+        )
+        parser.add_argument(
+            '--output',
+            help='The file to write to. Defaults to standard output.',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print the rows written, rows per second and peak memory '
+                 'use to standard error when done.',
+        )
+
+    def handle(self, *args, **options):
+        """Writes the export and optionally reports how fast it was"""
+        table = options['table']
+        lines = export_table(table, options['export_format'])
+
+        started_at = time.perf_counter()
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                rows = self.write_lines(lines, output.write)
+        else:
+            rows = self.write_lines(
+                lines, lambda line: self.stdout.write(line, ending='')
+            )
+        elapsed = time.perf_counter() - started_at
+
+        if options['stats']:
+            # Leave out the CSV header
+            if options['export_format'] == 'csv':
+                rows -= 1
+
+            self.stderr.write(
+                f'Exported {rows} {table} in {elapsed:.2f}s '
+                f'({rows / max(elapsed, 1e-9):.0f} rows/sec), '
+                f'peak RSS {self.get_peak_rss()}'
+            )
+
+    @staticmethod
+    def get_peak_rss():
+        """
+        Looks up the most memory this process has used
+
+        :return: A string like '52.3 MB', or 'unknown'
+        """
+        if resource is None:
+            return 'unknown'
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # Linux reports kilobytes, macOS reports bytes
+        if sys.platform != 'darwin':
+            peak *= 1024
+
+        return f'{peak / 1024 / 1024:.1f} MB'
+
+    @staticmethod
+    def write_lines(lines, write):
+        """
+        Writes lines of text as they are made
+
+        :param lines: An iterable of strings, each ending in a newline
+        :param write: Called with each line to write it
+        :return: The number of lines written
+        """
+        count = 0
+        for line in lines:
+            write(line)
+            count += 1
+
+        return count
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from workshop.votes import (
+    flush_vote_buffer, is_vote_buffer_shared, sync_vote_shards
+)
+
+
+class Command(BaseCommand):
+    """Writes every buffered and sharded vote to the database"""
+
+    help = (
+        'Writes the votes held in the vote buffer and the vote shards to the '
+        'Pizzas. The command runs in its own process, so it only reaches '
+        'the votes the site buffered when WORKSHOP_VOTE_BUFFER_CACHE is a '
+        'cache shared by every process, such as Memcached or Redis. Run it '
+        'then when shutting the site down so no buffered votes are lost.'
+    )
+
+    def handle(self, *args, **options):
+        """Flushes the votes and reports how much was written"""
+        if settings.WORKSHOP_VOTE_BUFFERING and not is_vote_buffer_shared():
+            self.stderr.write(self.style.WARNING(
+                'WORKSHOP_VOTE_BUFFER_CACHE is kept in each process, so the '
+                'votes buffered by the site cannot be reached from here. Use '
+                'a shared cache, such as Memcached or Redis, for it.'
+            ))
+
+        updated = flush_vote_buffer()
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed buffered votes for {updated} Pizzas.')
+        )
+
+        updated = sync_vote_shards()
+        self.stdout.write(
+            self.style.SUCCESS(f'Synced vote shards for {updated} Pizzas.')
+        )
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from workshop.synthetic import generate_catalog
+
+
+class Command(BaseCommand):
+    """Fills the database with made up Pizzas for scale testing"""
+
+    help = (
+        'Creates made up Crusts, Ingredients and Pizzas with bulk inserts. '
+        'The same --seed always creates the same data, so it can be used as '
+        'the fixture for performance tests and benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        """Adds the options for how much data to create"""
+        parser.add_argument(
+            '--pizzas',
+            type=int,
+            default=10000,
+            help='How many Pizzas to create. Defaults to 10000.',
+        )
+        parser.add_argument(
+            '--crusts',
+            type=int,
+            default=20,
+            help='How many Crusts to create. Defaults to 20.',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=200,
+            help='How many Ingredients to create. Defaults to 200.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seeds the random numbers. Defaults to 0.',
+        )
+        parser.add_argument(
+            '--vote-skew',
+            type=float,
+            default=1.2,
+            help='How unevenly votes are spread, lower is more uneven. '
+                 'Defaults to 1.2.',
+        )
+
+    def handle(self, *args, **options):
+        """Creates the data and reports how long it took"""
+        started_at = time.perf_counter()
+        counts = generate_catalog(
+            pizzas=options['pizzas'],
+            crusts=options['crusts'],
+            ingredients=options['ingredients'],
+            seed=options['seed'],
+            vote_skew=options['vote_skew']
+        )
+        elapsed = time.perf_counter() - started_at
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['created']} Pizzas and skipped "
+            f"{counts['skipped']} that already existed in {elapsed:.2f}s."
+        ))
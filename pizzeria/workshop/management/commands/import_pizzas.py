@@ -0,0 +1,128 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workshop.bulk import BATCH_SIZE, import_pizzas
+
+
+class Command(BaseCommand):
+    """Loads Pizzas from a CSV or JSON Lines file in batches"""
+
+    help = (
+        'Loads Pizzas from a CSV or JSON Lines file, such as one written by '
+        'export_catalog. Crusts and Ingredients are matched by name and '
+        'created when missing. Pizzas that already exist are skipped unless '
+        '--upsert is given.'
+    )
+
+    def add_arguments(self, parser):
+        """Adds the file argument and the import options"""
+        parser.add_argument(
+            'path', help="The file to read, or '-' for standard input."
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            dest='import_format',
+            help="The file's format. Worked out from its extension when not "
+                 "given.",
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Overwrite Pizzas that already exist, matched by name.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'How many Pizzas to write at a time. Defaults to '
+                 f'{BATCH_SIZE}.',
+        )
+
+    def handle(self, *args, **options):
+        """Imports the file and reports what was done"""
+        path = options['path']
+        import_format = options['import_format'] or path.rpartition('.')[2]
+        if import_format not in ('csv', 'jsonl'):
+            raise CommandError(
+                'Unknown file format, use --format to give one.'
+            )
+
+        started_at = time.perf_counter()
+        try:
+            if path == '-':
+                counts = self.import_file(sys.stdin, import_format, options)
+            else:
+                with open(path, newline='') as file:
+                    counts = self.import_file(file, import_format, options)
+        except (OSError, ValueError, csv.Error) as error:
+            # The import runs in one transaction, so nothing was saved
+            raise CommandError(f'Could not import {path}: {error}')
+        elapsed = time.perf_counter() - started_at
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['created']}, updated {counts['updated']} and "
+            f"skipped {counts['skipped']} Pizzas in {elapsed:.2f}s."
+        ))
+        if counts['invalid']:
+            self.stderr.write(
+                f"Ignored {counts['invalid']} rows that were missing a name, "
+                f"summary, city, state or crust, or held a value a Pizza "
+                f"cannot have."
+            )
+
+    @staticmethod
+    def import_file(file, import_format: str, options: dict):
+        """
+        Reads the rows from an open file and imports them
+
+        :param file: An open text file
+        :param import_format: Either 'csv' or 'jsonl'
+        :param options: The command's options
+        :return: The counts returned by import_pizzas
+        """
+        if import_format == 'csv':
+            rows = csv.DictReader(file)
+        else:
+            rows = (read_json_line(line) for line in file if line.strip())
+
+        return import_pizzas(
+            (read_ingredients(row) for row in rows),
+            upsert=options['upsert'],
+            batch_size=options['batch_size']
+        )
+
+
+def read_json_line(line: str):
+    """
+    Reads one row of a JSON Lines file
+
+    :param line: A line of the file
+    :return if valid JSON: What the line holds, which may not be an object
+    :return if not: None, so the row is counted as invalid
+    """
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def read_ingredients(row):
+    """
+    Turns a row's Ingredients into a list of names
+
+    CSV files hold them as a single comma separated string.
+
+    :param row:
+        A dictionary read from the file, or anything else a JSON Lines file
+        held, which import_pizzas counts as invalid
+    :return: The same row
+    """
+    if isinstance(row, dict) and isinstance(row.get('ingredients'), str):
+        row['ingredients'] = row['ingredients'].split(',')
+
+    return row
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from workshop.cache import bump_leaderboard_version
+
+
+class Command(BaseCommand):
+    """Marks every leaderboard as stale, so they are built again"""
+
+    help = (
+        'Marks every leaderboard as stale. Each process sharing the default '
+        'cache builds its boards again from the database the next time they '
+        'are asked for. Run this after changing votes outside the site.'
+    )
+
+    def handle(self, *args, **options):
+        """Bumps the leaderboard version"""
+        bump_leaderboard_version()
+        self.stdout.write(
+            self.style.SUCCESS('Marked every leaderboard for a rebuild.')
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from workshop.trending import recompute_trending
+
+
+class Command(BaseCommand):
+    """Works out every Pizza's trending score again"""
+
+    help = (
+        'Saves a fresh trending score to every Pizza, so older votes count '
+        'for less. Run this regularly, or leave it running with --interval.'
+    )
+
+    def add_arguments(self, parser):
+        """Adds the --interval option"""
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep running, recomputing the scores every INTERVAL '
+                 'seconds.',
+        )
+
+    def handle(self, *args, **options):
+        """Recomputes the scores, once or every interval"""
+        while True:
+            updated = recompute_trending()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Updated the trending score of {updated} Pizzas.'
+                )
+            )
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
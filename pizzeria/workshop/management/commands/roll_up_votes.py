@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from workshop.votes import roll_up_vote_events
+
+
+class Command(BaseCommand):
+    """Adds the logged vote events to the hourly and daily totals"""
+
+    help = (
+        'Moves the vote event files into the vote log, then adds every '
+        'event not yet counted to the hourly and daily vote totals. Run this '
+        'regularly, or leave it running with --interval.'
+    )
+
+    def add_arguments(self, parser):
+        """Adds the --interval option"""
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep running, rolling up new events every INTERVAL '
+                 'seconds.',
+        )
+
+    def handle(self, *args, **options):
+        """Rolls up the events, once or every interval"""
+        while True:
+            rolled_up = roll_up_vote_events()
+            self.stdout.write(
+                self.style.SUCCESS(f'Rolled up {rolled_up} vote events.')
+            )
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
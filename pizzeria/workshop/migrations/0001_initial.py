@@ -36,7 +36,7 @@ class Migration(migrations.Migration):
                 ('name', models.CharField(max_length=40, unique=True)),
                 ('summary', models.CharField(max_length=200)),
                 ('time_created', models.DateTimeField(auto_now=True)),
-                ('crust', models.ForeignKey(on_delete='cascade', to='workshop.Crust')),
+                ('crust', models.ForeignKey(on_delete=models.CASCADE, to='workshop.Crust')),
                 ('ingredients', models.ManyToManyField(to='workshop.Ingredient')),
             ],
         ),
@@ -0,0 +1,40 @@
+# Generated by Django 2.1.2 on 2026-10-18 08:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0004_auto_20181031_1616'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PizzaVoteShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pizza',
+            index=models.Index(fields=['-likes', '-id'], name='workshop_pizza_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pizza',
+            index=models.Index(fields=['-dislikes', '-id'], name='workshop_pizza_dislikes_idx'),
+        ),
+        migrations.AddField(
+            model_name='pizzavoteshard',
+            name='pizza',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_shards', to='workshop.Pizza'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pizzavoteshard',
+            unique_together={('pizza', 'shard')},
+        ),
+    ]
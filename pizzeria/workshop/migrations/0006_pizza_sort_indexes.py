@@ -0,0 +1,21 @@
+# Generated by Django 2.1.2 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0005_pizza_vote_shards'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pizza',
+            index=models.Index(fields=['-time_created', '-id'], name='workshop_pizza_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pizza',
+            index=models.Index(fields=['state', 'id'], name='workshop_pizza_state_idx'),
+        ),
+    ]
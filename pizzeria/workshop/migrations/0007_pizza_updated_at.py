@@ -0,0 +1,20 @@
+# Generated by Django 2.1.2 on 2026-10-18 09:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0006_pizza_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pizza',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
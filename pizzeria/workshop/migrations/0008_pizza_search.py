@@ -0,0 +1,62 @@
+# Generated by Django 2.1.2 on 2026-10-18 09:30
+
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    """
+    Creates the FTS5 table used to search Pizzas and fills it
+
+    This is only done on SQLite builds with FTS5, anywhere else the search
+    falls back to an in-memory index.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = [row[0] for row in cursor.fetchall()]
+    if 'ENABLE_FTS5' not in options:
+        return
+
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE workshop_pizza_search '
+        'USING fts5(name, summary, city, ingredients)'
+    )
+
+    # Add the Pizzas that already exist
+    pizza = apps.get_model('workshop', 'Pizza')
+    rows = []
+    for item in pizza.objects.prefetch_related('ingredients'):
+        ingredients = ' '.join(
+            ingredient.name for ingredient in item.ingredients.all()
+        )
+        rows.append(
+            (item.pk, item.name, item.summary, item.city, ingredients)
+        )
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO workshop_pizza_search '
+            '(rowid, name, summary, city, ingredients) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            rows
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    """Drops the FTS5 table used to search Pizzas"""
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS workshop_pizza_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0007_pizza_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table)
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.1.2 on 2026-10-18 10:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes the Pizza/Ingredient through table by Ingredient first
+
+    The table already has a unique index on (pizza_id, ingredient_id). This
+    one lets the Pizzas with an Ingredient be read straight off an index,
+    which the homepage's Ingredient filter relies on.
+    """
+
+    dependencies = [
+        ('workshop', '0008_pizza_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            ['CREATE INDEX workshop_pizza_ingredients_ingredient_pizza_idx '
+             'ON workshop_pizza_ingredients (ingredient_id, pizza_id)'],
+            ['DROP INDEX workshop_pizza_ingredients_ingredient_pizza_idx']
+        )
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0009_pizza_ingredients_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PizzaVoteWindow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pizza',
+            name='trending',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='pizza',
+            index=models.Index(fields=['-trending', '-id'], name='workshop_pizza_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='pizzavotewindow',
+            name='pizza',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_windows', to='workshop.pizza'),
+        ),
+        migrations.AddIndex(
+            model_name='pizzavotewindow',
+            index=models.Index(fields=['hour'], name='workshop_vote_window_hour_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pizzavotewindow',
+            unique_together={('pizza', 'hour')},
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0010_pizza_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('pizza_id', models.IntegerField()),
+                ('user_id', models.IntegerField(null=True)),
+                ('liked', models.BooleanField()),
+                ('time', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteRollupCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PizzaVoteDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+                ('pizza', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_days', to='workshop.pizza')),
+            ],
+            options={
+                'unique_together': {('pizza', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0011_vote_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedVoteEventFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('imported_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -41,14 +41,39 @@ class Pizza(models.Model):
     likes = models.IntegerField(blank=True, default=0)
     dislikes = models.IntegerField(blank=True, default=0)
 
+    # Recent votes, worth less the older they are. See workshop/trending.py
+    trending = models.FloatField(default=0, editable=False)
+
     # Pizza properties
-    crust = models.ForeignKey('Crust', on_delete='cascade')
+    crust = models.ForeignKey('Crust', on_delete=models.CASCADE)
     ingredients = models.ManyToManyField('Ingredient')
     name = models.CharField(max_length=40, unique=True)
 
     # Miscellaneous
     summary = models.CharField(max_length=200)
     time_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Indexes backing the homepage sort orders, with id as a tiebreaker"""
+        indexes = [
+            models.Index(
+                fields=['-time_created', '-id'],
+                name='workshop_pizza_created_idx'
+            ),
+            models.Index(
+                fields=['state', 'id'], name='workshop_pizza_state_idx'
+            ),
+            models.Index(
+                fields=['-likes', '-id'], name='workshop_pizza_likes_idx'
+            ),
+            models.Index(
+                fields=['-dislikes', '-id'], name='workshop_pizza_dislikes_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-id'], name='workshop_pizza_trending_idx'
+            ),
+        ]
 
     def get_absolute_url(self):
         """Determines where a Pizza object's 'homepage' is"""
@@ -61,3 +86,163 @@ class Pizza(models.Model):
         :return: The Pizza's name attribute
         """
         return self.name
+
+
+class PizzaVoteShard(models.Model):
+    """
+    One of several rows sharing the recent votes for a Pizza
+
+    Votes are spread over the shards so people voting at the same time do
+    not all wait on the same row. The shards are regularly added into the
+    Pizza's own likes and dislikes, which are used for listing and sorting.
+    """
+
+    pizza = models.ForeignKey(
+        'Pizza', on_delete=models.CASCADE, related_name='vote_shards'
+    )
+    shard = models.PositiveSmallIntegerField()
+
+    # Media status
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+
+    class Meta:
+        """A Pizza only has one row for each shard number"""
+        unique_together = ('pizza', 'shard')
+
+    def __str__(self):
+        """
+        Defines how a PizzaVoteShard object is displayed
+
+        :return: The Pizza's name followed by the shard number
+        """
+        return f'{self.pizza} #{self.shard}'
+
+
+class PizzaVoteDay(models.Model):
+    """
+    The votes a Pizza got during one day, rolled up from VoteEvent rows
+
+    See workshop/votes.py.
+    """
+
+    pizza = models.ForeignKey(
+        'Pizza', on_delete=models.CASCADE, related_name='vote_days'
+    )
+    day = models.DateField()
+
+    # Media status
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+
+    class Meta:
+        """A Pizza has one row for each day"""
+        unique_together = ('pizza', 'day')
+
+    def __str__(self):
+        """
+        Defines how a PizzaVoteDay object is displayed
+
+        :return: The Pizza's name followed by the day
+        """
+        return f'{self.pizza} {self.day:%Y-%m-%d}'
+
+
+class PizzaVoteWindow(models.Model):
+    """
+    The votes a Pizza got during one hour, rolled up from VoteEvent rows
+
+    Pizzas are ranked by how many votes they got lately, with older hours
+    counting for less. See workshop/trending.py and workshop/votes.py.
+    """
+
+    pizza = models.ForeignKey(
+        'Pizza', on_delete=models.CASCADE, related_name='vote_windows'
+    )
+    hour = models.DateTimeField()
+
+    # Media status
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+
+    class Meta:
+        """A Pizza has one row for each hour, and hours are read in order"""
+        unique_together = ('pizza', 'hour')
+        indexes = [
+            models.Index(fields=['hour'], name='workshop_vote_window_hour_idx')
+        ]
+
+    def __str__(self):
+        """
+        Defines how a PizzaVoteWindow object is displayed
+
+        :return: The Pizza's name followed by the hour
+        """
+        return f'{self.pizza} {self.hour:%Y-%m-%d %H:00}'
+
+
+class VoteEvent(models.Model):
+    """
+    A single like or dislike, as it was cast
+
+    Rows are only ever added, in batches from the vote event files, and are
+    never changed. Pizza and User are plain ids rather than foreign keys, so
+    the history is kept when either is deleted and adding a row does not
+    check other tables.
+    """
+
+    # The log grows with every vote, so it may outgrow a 32 bit id
+    id = models.BigAutoField(primary_key=True)
+
+    pizza_id = models.IntegerField()
+    user_id = models.IntegerField(null=True)
+    liked = models.BooleanField()
+    time = models.DateTimeField()
+
+    def __str__(self):
+        """
+        Defines how a VoteEvent object is displayed
+
+        :return: The vote, Pizza id and time
+        """
+        vote = 'Like' if self.liked else 'Dislike'
+        return f'{vote} of Pizza {self.pizza_id} at {self.time:%Y-%m-%d %H:%M}'
+
+
+class ImportedVoteEventFile(models.Model):
+    """
+    A vote event file whose events have been added to VoteEvent
+
+    It is saved in the same transaction as the events, so a file is never
+    imported twice, even when the import stops before deleting it.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    imported_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """
+        Defines how an ImportedVoteEventFile object is displayed
+
+        :return: The file's name
+        """
+        return self.name
+
+
+class VoteRollupCheckpoint(models.Model):
+    """
+    How far through the VoteEvent rows the rollups have got
+
+    There is only ever one row. It is updated in the same transaction as the
+    rollups, so no VoteEvent is counted twice.
+    """
+
+    last_event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        """
+        Defines how a VoteRollupCheckpoint object is displayed
+
+        :return: The id of the last VoteEvent rolled up
+        """
+        return f'Rolled up to VoteEvent {self.last_event_id}'
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+# How many Pizzas are shown on a single page of the homepage
+PIZZAS_PER_PAGE = 20
+
+# The largest integer the database can store, a signed 64 bit number
+MAX_DATABASE_INT = 2 ** 63 - 1
+
+
+def create_next_page_url(request, cursor: str, parameter: str = 'cursor'):
+    """
+    Creates a relative URL pointing at the page after the current one
+
+    Any other query parameters in the request are kept as they are.
+
+    :param request: Standard Django request object
+    :param cursor: The cursor returned by paginate_by_keyset
+    :param parameter: The query parameter the cursor goes in
+    :return if there is a next page: A string like '?cursor={cursor}'
+    :return if on the last page: None
+    """
+    if cursor is None:
+        return None
+
+    query = request.GET.copy()
+    query[parameter] = cursor
+
+    return f'?{query.urlencode()}'
+
+
+def decode_cursor_or_404(cursor: str, field):
+    """
+    Turns a cursor back into the sort value and id it was created from
+
+    :param cursor: A cursor created by encode_cursor
+    :param field: The model field the queryset is sorted by
+    :return if valid: A tuple of (sort value, id)
+    :return if invalid: HTTP 404
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        value, pk = field.to_python(value), int(pk)
+    except (binascii.Error, TypeError, ValueError, ValidationError):
+        raise Http404('The page requested can not be found.')
+
+    # Numbers too big for the database would fail the query instead
+    for number in [value, pk]:
+        if isinstance(number, int) and abs(number) > MAX_DATABASE_INT:
+            raise Http404('The page requested can not be found.')
+
+    return value, pk
+
+
+def encode_cursor(obj, field):
+    """
+    Creates an opaque cursor pointing just past an object
+
+    :param obj: The last model object on a page
+    :param field: The model field the queryset is sorted by
+    :return: A URL safe string holding the object's sort value and id
+    """
+    data = json.dumps([field.value_to_string(obj), obj.pk])
+
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def create_keyset_queryset(queryset, sorted_by: str, cursor: str = None):
+    """
+    Sorts a queryset and skips to the objects after the cursor
+
+    Rather than using OFFSET, the queryset starts right after the
+    (sort value, id) pair held in the cursor. The database can then seek
+    straight to the page using an index, so a deep page costs the same as the
+    first one.
+
+    :param queryset: The queryset to sort
+    :param sorted_by:
+        How the queryset is sorted. This should already have been checked by
+        validate_sorted_by_string_or_404
+    :param cursor: The cursor for the page wanted, or None for the first page
+    :return: The sorted and filtered queryset
+    """
+    field_name = sorted_by.lstrip('-')
+    field = queryset.model._meta.get_field(field_name)
+    descending = sorted_by.startswith('-')
+
+    # The id breaks ties between objects with the same sort value
+    queryset = queryset.order_by(sorted_by, '-id' if descending else 'id')
+
+    if cursor:
+        value, pk = decode_cursor_or_404(cursor, field)
+
+        # Written so the database can range scan an index on the sort value
+        # instead of checking the OR against every row
+        if descending:
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__lte': value}),
+                Q(**{f'{field_name}__lt': value}) | Q(id__lt=pk)
+            )
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__gte': value}),
+                Q(**{f'{field_name}__gt': value}) | Q(id__gt=pk)
+            )
+
+    return queryset
+
+
+def paginate_by_keyset(queryset, sorted_by: str, cursor: str = None,
+                       per_page: int = PIZZAS_PER_PAGE):
+    """
+    Grabs a single page of a queryset, picking up where the cursor left off
+
+    :param queryset: The queryset to paginate
+    :param sorted_by:
+        How the queryset is sorted. This should already have been checked by
+        validate_sorted_by_string_or_404
+    :param cursor: The cursor for the page wanted, or None for the first page
+    :param per_page: The most objects a page can hold
+    :return:
+        A tuple of (list of objects on the page, cursor for the next page).
+        The cursor is None on the last page.
+    """
+    queryset = create_keyset_queryset(queryset, sorted_by, cursor)
+
+    # Grab one extra object to find out if there is a next page
+    objects = list(queryset[:per_page + 1])
+
+    next_cursor = None
+    if len(objects) > per_page:
+        objects = objects[:per_page]
+        next_cursor = encode_cursor(
+            objects[-1], queryset.model._meta.get_field(sorted_by.lstrip('-'))
+        )
+
+    return objects, next_cursor
@@ -0,0 +1,361 @@
+"""
+Full-text search over each Pizza's name, summary, city and Ingredients.
+
+On SQLite the text lives in an FTS5 table, created by the
+0008_pizza_search migration. Anywhere else, or when WORKSHOP_SEARCH_BACKEND
+is 'memory', an inverted index is kept in memory instead. Both are kept up
+to date by the receivers in signals.py, the FTS5 table in the same
+transaction as the change and the in-memory index once it is committed.
+
+Each process has its own in-memory index. A committed change moves the
+search version on, so the other processes build theirs again. A change
+committed elsewhere while this process applies its own may be missed that
+way, so the index is also built again once it is
+WORKSHOP_SEARCH_INDEX_MAX_AGE seconds old.
+"""
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .cache import SEARCH_VERSION_KEY, bump_search_version, get_version
+from .models import Pizza
+
+# The SQLite FTS5 table holding the search text, keyed by the Pizza's id
+SEARCH_TABLE = 'workshop_pizza_search'
+
+# How many results are shown on a single page
+RESULTS_PER_PAGE = 20
+
+# How many Pizzas have their search text gathered and written at a time
+INDEX_BATCH_SIZE = 500
+
+
+class InMemorySearchIndex:
+    """An inverted index from each word to the Pizzas containing it"""
+
+    def __init__(self):
+        """Creates an empty index, it is filled in on the first search"""
+        self.built = False
+        self.built_at = None
+        self.lock = threading.RLock()
+
+        # The search version the index holds the Pizzas of
+        self.version = None
+
+        # {term: {pizza_id: how many times the term shows up}}
+        self.postings = defaultdict(dict)
+
+        # {pizza_id: the Pizza's terms}, used to take a Pizza back out
+        self.documents = {}
+
+        # Every term in order, to find the terms starting with a prefix
+        self.terms = []
+
+    def build(self, version: int):
+        """
+        Fills the index from the database
+
+        :param version: The search version the index is built for
+        """
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+            self.terms.clear()
+
+            for pk, document in get_search_documents().items():
+                self.add(pk, ' '.join(document))
+
+            self.built = True
+            self.built_at = time.monotonic()
+            self.version = version
+
+    def is_stale(self, version: int):
+        """
+        Checks if the index has to be built again before it is used
+
+        :param version: The current search version
+        :return: boolean
+        """
+        if not self.built or self.version != version:
+            return True
+
+        age = time.monotonic() - self.built_at
+        return age >= settings.WORKSHOP_SEARCH_INDEX_MAX_AGE
+
+    def add(self, pk: int, text: str):
+        """
+        Adds a Pizza's text to the index, replacing any older text
+
+        :param pk: Primary key for a Pizza object
+        :param text: All of the Pizza's searchable text
+        """
+        with self.lock:
+            self.remove(pk)
+
+            counts = defaultdict(int)
+            for term in tokenize(text):
+                counts[term] += 1
+
+            for term, count in counts.items():
+                if term not in self.postings:
+                    insort(self.terms, term)
+                self.postings[term][pk] = count
+
+            self.documents[pk] = list(counts)
+
+    def remove(self, pk: int):
+        """
+        Takes a Pizza out of the index
+
+        :param pk: Primary key for a Pizza object
+        """
+        with self.lock:
+            for term in self.documents.pop(pk, []):
+                pizzas = self.postings[term]
+                pizzas.pop(pk, None)
+
+                if not pizzas:
+                    del self.postings[term]
+                    del self.terms[bisect_left(self.terms, term)]
+
+    def search(self, query: str):
+        """
+        Finds the Pizzas containing every word of the query
+
+        Each word also matches longer words starting with it. Results are
+        ranked by TF-IDF, so rarer words count for more.
+
+        :param query: The text the user searched for
+        :return: A list of Pizza ids, best match first
+        """
+        version = get_version(SEARCH_VERSION_KEY)
+
+        with self.lock:
+            if self.is_stale(version):
+                self.build(version)
+
+            scores = None
+            for word in tokenize(query):
+                word_scores = defaultdict(float)
+
+                # Walk every term starting with the word
+                position = bisect_left(self.terms, word)
+                while (position < len(self.terms) and
+                       self.terms[position].startswith(word)):
+                    pizzas = self.postings[self.terms[position]]
+                    idf = math.log(1 + len(self.documents) / len(pizzas))
+
+                    for pk, count in pizzas.items():
+                        word_scores[pk] += count * idf
+                    position += 1
+
+                # Only keep the Pizzas matching all of the words so far
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {
+                        pk: score + word_scores[pk]
+                        for pk, score in scores.items()
+                        if pk in word_scores
+                    }
+
+            if not scores:
+                return []
+
+            return sorted(scores, key=lambda pk: (-scores[pk], pk))
+
+
+# The in-memory index for this process
+memory_index = InMemorySearchIndex()
+
+
+def get_search_backend():
+    """
+    Works out which search backend to use
+
+    :return: Either 'fts5' or 'memory'
+    """
+    backend = settings.WORKSHOP_SEARCH_BACKEND
+
+    if backend == 'auto':
+        backend = 'fts5' if has_search_table() else 'memory'
+
+    return backend
+
+
+@lru_cache(maxsize=None)
+def has_search_table():
+    """
+    Checks once whether the FTS5 search table was created
+
+    :return: boolean
+    """
+    return (
+        connection.vendor == 'sqlite' and
+        SEARCH_TABLE in connection.introspection.table_names()
+    )
+
+
+def get_search_documents(pks=None):
+    """
+    Gathers the searchable text for Pizzas
+
+    :param pks: An iterable of Pizza primary keys, or None for every Pizza
+    :return:
+        A dictionary in the format of
+        {pizza_id: (name, summary, city, ingredient names)}
+    """
+    pizzas = Pizza.objects.all()
+    ingredients = Pizza.ingredients.through.objects.all()
+    if pks is not None:
+        pks = list(pks)
+        pizzas = pizzas.filter(pk__in=pks)
+        ingredients = ingredients.filter(pizza_id__in=pks)
+
+    # Read plain rows, building Pizza objects would take far longer
+    rows = list(pizzas.values_list('pk', 'name', 'summary', 'city'))
+    if not rows:
+        return {}
+
+    ingredient_names = defaultdict(list)
+    for pizza_id, name in ingredients.values_list(
+            'pizza_id', 'ingredient__name'):
+        ingredient_names[pizza_id].append(name)
+
+    return {
+        pk: (name, summary, city, ' '.join(ingredient_names[pk]))
+        for pk, name, summary, city in rows
+    }
+
+
+def index_pizzas(pks):
+    """
+    Brings the search text for some Pizzas up to date
+
+    Pizzas that no longer exist are taken out of the index. The Pizzas are
+    done INDEX_BATCH_SIZE at a time, so a Crust or Ingredient used by many
+    of them never loads all of their text at once.
+
+    :param pks: An iterable of Pizza primary keys
+    """
+    pks = list(pks)
+    for start in range(0, len(pks), INDEX_BATCH_SIZE):
+        batch = pks[start:start + INDEX_BATCH_SIZE]
+        with transaction.atomic(savepoint=False):
+            index_documents(batch, get_search_documents(batch))
+
+
+def index_documents(pks, documents: dict):
+    """
+    Replaces the search text for some Pizzas with text already gathered
+
+    :param pks: An iterable of Pizza primary keys to replace the text of
+    :param documents:
+        The new text, from get_search_documents. Pizzas left out of it are
+        taken out of the index.
+    """
+    pks = list(pks)
+
+    if get_search_backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in pks]
+            )
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} '
+                f'(rowid, name, summary, city, ingredients) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                [(pk,) + document for pk, document in documents.items()]
+            )
+
+    # Without an index of its own, this process only has to tell the others
+    if memory_index.built:
+        transaction.on_commit(lambda: update_memory_index(pks, documents))
+    else:
+        transaction.on_commit(bump_search_version)
+
+
+def update_memory_index(pks, documents: dict):
+    """
+    Applies committed search text changes to the in-memory index
+
+    The search version moves on, so other processes build their index again.
+    This process's index is only changed if it has been built, and takes on
+    the new version, as it already holds the changes.
+
+    :param pks: An iterable of Pizza primary keys to replace the text of
+    :param documents:
+        The new text, from get_search_documents. Pizzas left out of it are
+        taken out of the index.
+    """
+    bump_search_version()
+
+    with memory_index.lock:
+        if not memory_index.built:
+            return
+
+        for pk in pks:
+            if pk in documents:
+                memory_index.add(pk, ' '.join(documents[pk]))
+            else:
+                memory_index.remove(pk)
+
+        memory_index.version = get_version(SEARCH_VERSION_KEY)
+
+
+def search_pizzas(query: str, page: int = 1,
+                  per_page: int = RESULTS_PER_PAGE):
+    """
+    Finds the Pizzas matching a search, best match first
+
+    Every word of the query has to match the start of a word in the Pizza's
+    name, summary, city or Ingredients.
+
+    :param query: The text the user searched for
+    :param page: Which page of results to return, starting at 1
+    :param per_page: The most Pizzas a page can hold
+    :return:
+        A tuple of (list of Pizza ids on the page, whether there is a next
+        page)
+    """
+    words = tokenize(query)
+    if not words:
+        return [], False
+
+    start = (page - 1) * per_page
+
+    if get_search_backend() == 'fts5':
+        # Quote each word so user input can not use the FTS5 query syntax,
+        # and let it match as a prefix
+        match = ' '.join(f'"{word}"*' for word in words)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank '
+                f'LIMIT %s OFFSET %s',
+                [match, per_page + 1, start]
+            )
+            pks = [row[0] for row in cursor.fetchall()]
+    else:
+        pks = memory_index.search(query)[start:start + per_page + 1]
+
+    return pks[:per_page], len(pks) > per_page
+
+
+def tokenize(text: str):
+    """
+    Splits text into lower case words
+
+    :param text: Any text
+    :return: A list of words
+    """
+    return re.findall(r'\w+', text.lower())
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .autocomplete import update_ingredient_index
+from .cache import (
+    bump_catalog_version, bump_choices_version, bump_pizza_version,
+    bump_pizza_versions
+)
+from .leaderboards import update_leaderboards
+from .models import Crust, Ingredient, Pizza
+from .search import index_pizzas
+
+
+@receiver(post_save, sender=Pizza)
+@receiver(post_delete, sender=Pizza)
+def pizza_changed(sender, instance, **kwargs):
+    """
+    Updates the cached pages, search text and leaderboard places of a saved
+    or deleted Pizza
+    """
+    bump_pizza_version(instance.pk)
+    index_pizzas([instance.pk])
+    update_leaderboards([instance.pk])
+
+
+@receiver(m2m_changed, sender=Pizza.ingredients.through)
+def pizza_ingredients_changed(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Updates the Pizzas whose Ingredients changed"""
+    # Clearing an Ingredient's Pizzas does not say which Pizzas they were
+    if action == 'pre_clear' and reverse:
+        remember_pizzas(sender, instance)
+
+    if not action.startswith('post_'):
+        return
+
+    # The change can come from either side of the relation
+    if not reverse:
+        touch_pizzas([instance.pk])
+    else:
+        touch_pizzas(pk_set or get_affected_pizza_pks(instance))
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Crust)
+@receiver(post_delete, sender=Crust)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def topping_changed(sender, instance, **kwargs):
+    """
+    Updates the Pizzas using a Crust or Ingredient that changed, and the
+    choices PizzaForm offers
+    """
+    touch_pizzas(get_affected_pizza_pks(instance))
+    bump_catalog_version()
+    bump_choices_version()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, **kwargs):
+    """
+    Adds a new or renamed Ingredient to the autocomplete index, once it is
+    committed
+    """
+    added = [(instance.pk, instance.name)]
+    transaction.on_commit(lambda: update_ingredient_index(added=added))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    """
+    Takes a deleted Ingredient out of the autocomplete index, once the delete
+    is committed
+    """
+    removed = [instance.pk]
+    transaction.on_commit(lambda: update_ingredient_index(removed=removed))
+
+
+@receiver(pre_delete, sender=Crust)
+@receiver(pre_delete, sender=Ingredient)
+def remember_pizzas(sender, instance, **kwargs):
+    """Notes which Pizzas use a Crust or Ingredient before it goes away"""
+    instance.affected_pizza_pks = list(
+        instance.pizza_set.values_list('pk', flat=True)
+    )
+
+
+def get_affected_pizza_pks(instance):
+    """
+    Finds the Pizzas using a Crust or Ingredient
+
+    :param instance: A Crust or Ingredient object
+    :return: An iterable of Pizza primary keys
+    """
+    if hasattr(instance, 'affected_pizza_pks'):
+        return instance.affected_pizza_pks
+
+    return instance.pizza_set.values_list('pk', flat=True)
+
+
+def touch_pizzas(pks):
+    """
+    Marks Pizzas as updated when something they show changed
+
+    This moves their updated_at forward, which the cached Pizza cards are
+    keyed on, and stops serving their cached pages. The caller changes the
+    catalog version once for the listings. Their search text is brought up
+    to date once the change is committed, so a Crust or Ingredient used by
+    many Pizzas is saved without waiting on it.
+
+    :param pks: An iterable of Pizza primary keys
+    """
+    pks = list(pks)
+    if not pks:
+        return
+
+    Pizza.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+    bump_pizza_versions(pks)
+    transaction.on_commit(lambda: index_pizzas(pks))
@@ -0,0 +1,141 @@
+"""
+Makes up realistic looking Crusts, Ingredients and Pizzas, for seeing how the
+workshop behaves with far more data than anyone would type in.
+
+The same seed always makes the same data, so benchmarks run against it can
+be compared with each other.
+"""
+import random
+
+from .bulk import NameLookup, import_pizzas
+from .forms import STATES
+from .models import Crust, Ingredient
+
+# Words the made up names are put together from
+CRUST_STYLES = [
+    'Thin', 'Thick', 'Stuffed', 'Deep Dish', 'Hand Tossed', 'Flatbread',
+    'Sourdough', 'Whole Wheat', 'Gluten Free', 'Cauliflower', 'Pan'
+]
+INGREDIENT_WORDS = [
+    'Basil', 'Mozzarella', 'Pepperoni', 'Mushroom', 'Onion', 'Sausage',
+    'Bacon', 'Olive', 'Pepper', 'Pineapple', 'Spinach', 'Tomato', 'Garlic',
+    'Ham', 'Anchovy', 'Chicken', 'Jalapeno', 'Ricotta', 'Feta', 'Artichoke'
+]
+INGREDIENT_STYLES = [
+    'Fresh', 'Roasted', 'Smoked', 'Spicy', 'Sweet', 'Grilled', 'Pickled',
+    'Aged', 'Shaved', 'Crispy'
+]
+PIZZA_WORDS = [
+    'Supreme', 'Classic', 'Garden', 'Inferno', 'Royale', 'Rustic',
+    'Deluxe', 'Harvest', 'Coastal', 'Midnight', 'Sunrise', 'Heritage'
+]
+
+# How many Ingredients a made up Pizza has, at the least and the most
+MIN_INGREDIENTS = 1
+MAX_INGREDIENTS = 6
+
+# Keeps the long tail of votes from growing past what people could cast
+MAX_LIKES = 1000000
+
+
+def generate_catalog(pizzas: int, crusts: int = 20, ingredients: int = 200,
+                     seed: int = 0, vote_skew: float = 1.2):
+    """
+    Saves a made up catalog to the database using bulk inserts
+
+    Running it again skips the Pizzas already there, so the catalog can be
+    grown a step at a time.
+
+    :param pizzas: How many Pizzas to make
+    :param crusts: How many Crusts to make
+    :param ingredients: How many Ingredients to make
+    :param seed: Seeds the random numbers, so the data can be made again
+    :param vote_skew:
+        How unevenly votes are spread. Lower numbers give a few Pizzas far
+        more votes than the rest.
+    :return: The counts returned by import_pizzas
+    """
+    rng = random.Random(seed)
+
+    crust_names = generate_names(crusts, CRUST_STYLES, ['Crust'])
+    ingredient_names = generate_names(
+        ingredients, INGREDIENT_STYLES, INGREDIENT_WORDS
+    )
+
+    # Create every Crust and Ingredient, even the ones no Pizza ends up with
+    NameLookup(Crust, 'type').resolve(crust_names)
+    NameLookup(Ingredient, 'name').resolve(ingredient_names)
+
+    return import_pizzas(
+        generate_pizza_rows(
+            rng, pizzas, crust_names, ingredient_names, vote_skew
+        )
+    )
+
+
+def generate_names(count: int, styles: list, words: list):
+    """
+    Puts together unique names, simple ones first
+
+    :param count: How many names to make
+    :param styles: Words that go in front
+    :param words: Words that go at the end
+    :return: A list of names like ['Basil', 'Fresh Basil', 'Fresh Basil 2']
+    """
+    names = list(words)
+    names += [f'{style} {word}' for style in styles for word in words]
+
+    number = 2
+    while len(names) < count:
+        names += [f'{name} {number}' for name in names[:count - len(names)]]
+        number += 1
+
+    return names[:count]
+
+
+def generate_pizza_rows(rng: random.Random, count: int, crust_names: list,
+                        ingredient_names: list, vote_skew: float):
+    """
+    Makes up Pizza rows for import_pizzas
+
+    A few Ingredients turn up on most Pizzas while the rest are rare, and
+    votes follow a long tail, like they would on a real site.
+
+    :param rng: The random number generator to use
+    :param count: How many rows to make
+    :param crust_names: The Crust types to pick from
+    :param ingredient_names: The Ingredient names to pick from
+    :param vote_skew: The Pareto shape of the votes, see generate_catalog
+    :return: A generator of dictionaries
+    """
+    # Earlier Ingredients are picked far more often than later ones
+    ingredient_weights = [
+        1 / rank for rank in range(1, len(ingredient_names) + 1)
+    ]
+    states = [state for state, _ in STATES]
+
+    for number in range(count):
+        picked = rng.choices(
+            ingredient_names,
+            weights=ingredient_weights,
+            k=rng.randint(MIN_INGREDIENTS, MAX_INGREDIENTS)
+        )
+
+        crust = rng.choice(crust_names)
+
+        # Most Pizzas get a handful of votes, a few get a huge amount
+        likes = min(int(rng.paretovariate(vote_skew)) - 1, MAX_LIKES)
+        dislikes = int(likes * rng.random() * 0.3)
+
+        yield {
+            # Names only depend on the number, so a later run with more
+            # Pizzas skips the ones already made
+            'name': f'{PIZZA_WORDS[number % len(PIZZA_WORDS)]} {number}',
+            'summary': f'A {picked[0].lower()} pizza on a {crust.lower()}.',
+            'city': f'City {rng.randrange(500)}',
+            'state': rng.choice(states),
+            'crust': crust,
+            'ingredients': picked,
+            'likes': likes,
+            'dislikes': dislikes,
+        }
@@ -1,10 +1,51 @@
+import base64
+import csv
+import json
+import os
+import random
+import shutil
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-
+from django.utils import timezone
+
+from . import api
+from .autocomplete import ingredient_index
+from .benchmark import find_regressions, get_percentile, run_benchmarks
+from .bulk import clean_pizza_row
+from .cache import (
+    bump_catalog_version, bump_choices_version, bump_search_version,
+    get_catalog_version, get_pizza_version
+)
+from .export import export_table
 from .forms import IngredientForm, PizzaForm
-from .models import Crust, Ingredient, Pizza
+from .leaderboards import leaderboards
+from .live import get_broker
+from .models import (
+    Crust, ImportedVoteEventFile, Ingredient, Pizza, PizzaVoteDay,
+    PizzaVoteShard, PizzaVoteWindow, VoteEvent
+)
+from .search import memory_index, search_pizzas
+from .synthetic import generate_pizza_rows
+from .trending import recompute_trending
+from .views import SORTED_BY_OPTIONS
+from .votes import (
+    SHARDS_SYNCED_KEY, flush_vote_buffer, get_hour, get_vote_buffer_cache,
+    import_vote_events, record_vote, roll_up_vote_events, sync_vote_shards
+)
 
 
 class WorkShopModelTests(TestCase):
@@ -119,12 +160,56 @@ class WorkShopFormTests(TestCase):
         form = PizzaForm(data=data)
         self.assertFalse(form.is_valid())
 
+    def test_pizzaform_choices_are_cached(self):
+        """Ensures the choice lists are cached until an Ingredient changes"""
+        caches['default'].clear()
+
+        with CaptureQueriesContext(connection) as first_form:
+            str(PizzaForm())
+        with CaptureQueriesContext(connection) as second_form:
+            html = str(PizzaForm())
+
+        self.assertEqual(2, len(first_form.captured_queries))
+        self.assertEqual(0, len(second_form.captured_queries))
+        self.assertIn('Thin', html)
+
+        ModelCreator.create_ingredient_object()
+        self.assertIn('Onion', str(PizzaForm()))
+
+    @override_settings(WORKSHOP_INGREDIENT_AUTOCOMPLETE=True)
+    def test_pizzaform_autocomplete(self):
+        """Ensures only the picked Ingredients are listed in the page"""
+        pizza = ModelCreator.create_pizza_object()
+        pizza.ingredients.add(ModelCreator.create_ingredient_object())
+        other = Ingredient.objects.create(name='Green Bell Peppers')
+
+        html = str(PizzaForm(instance=pizza))
+        self.assertIn('Onion', html)
+        self.assertNotIn('Green Bell Peppers', html)
+        self.assertIn(
+            reverse('workshop:api_ingredient_autocomplete'), html
+        )
+
+        # Ingredients that were not listed can still be picked
+        data = {
+            'city': 'Knoxville',
+            'state': 'TN',
+            'crust': pizza.crust.pk,
+            'name': pizza.name,
+            'summary': pizza.summary,
+            'ingredients': [other.pk]
+        }
+        form = PizzaForm(data=data, instance=pizza)
+        self.assertTrue(form.is_valid())
+        self.assertIn('Green Bell Peppers', str(form))
+
 
 class WorkShopViewTests(TestCase):
     """Tests for the WorkShop app"""
 
     def setUp(self):
         """Creates a User for testing"""
+        caches['default'].clear()
 
         self.test_user = User.objects.create_user(
             email='test@test.com',
@@ -165,6 +250,156 @@ class WorkShopViewTests(TestCase):
         self.assertContains(resp, '5')
         self.assertContains(resp, 'Testing this pizza')
 
+    def test_homepage_query_count_is_constant(self):
+        """Ensures the homepage queries do not grow with the Pizza count"""
+        urls = [
+            reverse('workshop:homepage'),
+            reverse('workshop:homepage_sorted', kwargs={'sorted_by': 'state'}),
+        ]
+
+        for url in urls:
+            # Both visits should be rendered from scratch
+            caches['default'].clear()
+            with CaptureQueriesContext(connection) as few_pizzas:
+                self.client.get(url)
+
+            # Add more Pizzas, each with their own Ingredients
+            ModelCreator.create_pizza_objects(10, prefix=url)
+
+            caches['default'].clear()
+            with CaptureQueriesContext(connection) as many_pizzas:
+                resp = self.client.get(url)
+
+            self.assertContains(resp, 'Pineapple, Sausage')
+            self.assertEqual(
+                len(few_pizzas.captured_queries),
+                len(many_pizzas.captured_queries)
+            )
+
+    def test_homepage_sorted_pages(self):
+        """Ensures every Pizza shows up once when walking the sorted pages"""
+        ModelCreator.create_pizza_objects(45)
+
+        # Give the Pizzas some matching likes to test the id tiebreaker
+        Pizza.objects.filter(id__lt=20).update(likes=7, trending=1.5)
+
+        for sorted_by in SORTED_BY_OPTIONS:
+            url = reverse(
+                'workshop:homepage_sorted', kwargs={'sorted_by': sorted_by}
+            )
+            names = []
+
+            # Keep following the Next Page link until we run out of pages
+            while url:
+                resp = self.client.get(url)
+                names += [pizza.name for pizza in resp.context['pizzas']]
+                next_page_url = resp.context['next_page_url']
+                url = next_page_url and url.split('?')[0] + next_page_url
+
+            expected = Pizza.objects.order_by(sorted_by, 'id')
+            if sorted_by.startswith('-'):
+                expected = Pizza.objects.order_by(sorted_by, '-id')
+
+            self.assertEqual(
+                list(expected.values_list('name', flat=True)), names
+            )
+
+    def test_homepage_paginated(self):
+        """Ensures the homepage only shows a page of Pizzas at a time"""
+        ModelCreator.create_pizza_objects(25)
+
+        resp = self.client.get(reverse('workshop:homepage'))
+
+        self.assertEqual(20, len(resp.context['pizzas']))
+        self.assertContains(resp, 'Next Page')
+
+        # The newest Pizzas should be on the first page
+        self.assertContains(resp, 'Pizza 24')
+        self.assertNotContains(resp, 'Test Pizza')
+
+    def test_homepage_bad_cursor(self):
+        """Ensures that a garbled cursor raises 404"""
+        resp = self.client.get(
+            reverse('workshop:homepage'), data={'cursor': 'not-a-cursor'}
+        )
+
+        self.assertEqual(404, resp.status_code)
+
+    def test_homepage_cursor_out_of_range(self):
+        """Ensures numbers too big for the database in a cursor raise 404"""
+        url = reverse(
+            'workshop:homepage_sorted', kwargs={'sorted_by': '-likes'}
+        )
+
+        for value, pk in [(1, 10 ** 30), (-10 ** 30, 1)]:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([value, pk]).encode()
+            ).decode()
+            resp = self.client.get(url, data={'cursor': cursor})
+
+            self.assertEqual(404, resp.status_code)
+
+    def test_homepage_sorts_use_indexes(self):
+        """Ensures no homepage sort makes the database sort every row"""
+        out = StringIO()
+        call_command('explain_sorts', check=True, stdout=out)
+
+        indexes = [
+            'workshop_pizza_created_idx', 'workshop_pizza_state_idx',
+            'workshop_pizza_likes_idx', 'workshop_pizza_dislikes_idx'
+        ]
+        for index in indexes:
+            self.assertIn(index, out.getvalue())
+
+    def test_homepage_ingredient_filter(self):
+        """Ensures only Pizzas with every Ingredient asked for are shown"""
+        pizzas = ModelCreator.create_pizza_objects(3)
+        pizzas[0].ingredients.add(self.ingredient)
+
+        url = reverse('workshop:homepage')
+        filters = [
+            (['onion'], ['Pizza 2', 'Pizza 1', 'Pizza 0']),
+            (['Onion', 'Pineapple'], ['Pizza 0']),
+            (['Pineapple', 'Sausage'], ['Test Pizza']),
+            (['Onion', 'Not An Ingredient'], []),
+        ]
+        for ingredient_names, expected in filters:
+            resp = self.client.get(url, data={'ingredient': ingredient_names})
+
+            self.assertEqual(
+                expected, [pizza.name for pizza in resp.context['pizzas']]
+            )
+
+    def test_homepage_ingredient_filter_pages(self):
+        """Ensures the Ingredient filter is kept when walking sorted pages"""
+        ModelCreator.create_pizza_objects(25)
+
+        url = reverse(
+            'workshop:homepage_sorted', kwargs={'sorted_by': 'state'}
+        )
+        resp = self.client.get(url, data={'ingredient': 'Onion'})
+
+        self.assertEqual(20, len(resp.context['pizzas']))
+        self.assertIn('ingredient=Onion', resp.context['next_page_url'])
+
+        resp = self.client.get(url + resp.context['next_page_url'])
+        self.assertEqual(5, len(resp.context['pizzas']))
+        self.assertNotIn('Test Pizza', resp.context['pizzas'])
+
+    def test_ingredient_filter_uses_index(self):
+        """Ensures the Ingredient filter reads Pizzas off the index"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN QUERY PLAN ' + str(
+                    Pizza.ingredients.through.objects.filter(
+                        ingredient_id__in=[1, 2]
+                    ).values('pizza_id').query
+                )
+            )
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+
+        self.assertIn('workshop_pizza_ingredients_ingredient_pizza_idx', plan)
+
     def test_dislike_pizza(self):
         """Ensures that a pizza can be disliked"""
 
@@ -285,6 +520,43 @@ class WorkShopViewTests(TestCase):
         # The user should have been redirect to the homepage
         self.assertRedirects(resp, reverse('workshop:homepage'))
 
+    def test_update_pizza(self):
+        """Checks if a user can update a pizza within its query budget"""
+
+        self.client.login(username='test_user', password='test_password')
+        url = reverse('workshop:update_pizza', kwargs={'pk': self.pizza.pk})
+
+        resp = self.client.get(url)
+        self.assertContains(resp, 'Update Pizza')
+
+        resp = self.client.post(url, data={
+            'name': 'Updated Pizza',
+            'city': 'Olive',
+            'state': 'NY',
+            'crust': self.crust.pk,
+            'ingredients': [self.ingredient.pk],
+            'summary': 'Updated this pizza'
+        })
+
+        self.pizza.refresh_from_db()
+        self.assertEqual('Updated Pizza', self.pizza.name)
+        self.assertRedirects(
+            resp,
+            reverse('workshop:view_pizza', kwargs={'pk': self.pizza.pk})
+        )
+
+    async def test_async_pages(self):
+        """Ensures the Pizza pages can be served under ASGI"""
+        urls = [
+            reverse('workshop:homepage'),
+            reverse('workshop:homepage_sorted', kwargs={'sorted_by': 'state'}),
+            reverse('workshop:view_pizza', kwargs={'pk': self.pizza.pk}),
+        ]
+
+        for url in urls:
+            resp = await self.async_client.get(url)
+            self.assertContains(resp, 'Pineapple, Sausage')
+
     def test_view_pizza_get(self):
         """Checks how the page looks for a user"""
 
@@ -301,6 +573,1467 @@ class WorkShopViewTests(TestCase):
         self.assertContains(resp, 'Dislikes: 0')
 
 
+class WorkShopCacheTests(TestCase):
+    """Ensures cached pages are served until what they show changes"""
+
+    def setUp(self):
+        """Creates a Pizza for testing with an empty cache"""
+        caches['default'].clear()
+
+        self.pizza = ModelCreator.create_pizza_object()
+        self.pizza.ingredients.add(ModelCreator.create_ingredient_object())
+
+        self.homepage_url = reverse('workshop:homepage')
+        self.view_pizza_url = reverse(
+            'workshop:view_pizza', kwargs={'pk': self.pizza.pk}
+        )
+
+    def test_cached_pages_skip_the_database(self):
+        """Ensures a second visit is served without rendering the page"""
+        # The Pizza page still looks up its ETag, which takes one query
+        for url, queries in [(self.homepage_url, 0), (self.view_pizza_url, 1)]:
+            self.client.get(url)
+
+            with self.assertNumQueries(queries):
+                resp = self.client.get(url)
+
+            self.assertContains(resp, 'Test Pizza')
+
+    def test_saving_a_pizza_clears_its_pages(self):
+        """Ensures a saved Pizza is shown with its new information"""
+        self.client.get(self.homepage_url)
+        self.client.get(self.view_pizza_url)
+
+        self.pizza.summary = 'A brand new summary'
+        self.pizza.save()
+
+        for url in [self.homepage_url, self.view_pizza_url]:
+            self.assertContains(self.client.get(url), 'A brand new summary')
+
+    def test_changing_ingredients_clears_pages(self):
+        """Ensures Ingredient changes are shown on the cached pages"""
+        self.client.get(self.homepage_url)
+        self.client.get(self.view_pizza_url)
+
+        # Rename the Pizza's Ingredient, then add a new one
+        onion = Ingredient.objects.get(name='Onion')
+        onion.name = 'Red Onion'
+        onion.save()
+        self.assertContains(self.client.get(self.view_pizza_url), 'Red Onion')
+
+        self.pizza.ingredients.add(Ingredient.objects.create(name='Basil'))
+        for url in [self.homepage_url, self.view_pizza_url]:
+            self.assertContains(self.client.get(url), 'Red Onion, Basil')
+
+    def test_ingredient_save_queries_are_constant(self):
+        """
+        Ensures saving an Ingredient does not query once for each Pizza
+        using it, and the catalog version only changes once
+        """
+        onion = Ingredient.objects.get(name='Onion')
+
+        def save_onion():
+            """Saves the Onion, returning its queries and catalog bumps"""
+            with mock.patch(
+                    'workshop.signals.bump_catalog_version') as bump:
+                with CaptureQueriesContext(connection) as queries:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        onion.save()
+
+            return len(queries.captured_queries), bump.call_count
+
+        one_pizza = save_onion()
+        ModelCreator.create_pizza_objects(30)
+        self.assertEqual(one_pizza, save_onion())
+        self.assertEqual(1, one_pizza[1])
+
+    def test_voting_clears_pages(self):
+        """Ensures a vote is shown on the cached Pizza page"""
+        self.client.get(self.view_pizza_url)
+
+        record_vote(self.pizza, liked=True)
+
+        self.assertContains(self.client.get(self.view_pizza_url), 'Likes: 1')
+
+
+class WorkShopConditionalGetTests(TestCase):
+    """Ensures pages answer 304 Not Modified when nothing has changed"""
+
+    def setUp(self):
+        """Creates a Pizza for testing with an empty cache"""
+        caches['default'].clear()
+
+        self.pizza = ModelCreator.create_pizza_object()
+        self.urls = [
+            reverse('workshop:homepage'),
+            reverse('workshop:homepage_sorted', kwargs={'sorted_by': 'state'}),
+            reverse('workshop:view_pizza', kwargs={'pk': self.pizza.pk}),
+        ]
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Ensures a repeated request with the ETag gets a 304"""
+        for url in self.urls:
+            resp = self.client.get(url)
+            self.assertTrue(resp.has_header('Last-Modified'))
+
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+            self.assertEqual(304, resp.status_code)
+
+    def test_vote_changes_etag(self):
+        """Ensures a vote gives every page a new ETag"""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+
+        record_vote(self.pizza, liked=True)
+
+        for url, etag in zip(self.urls, etags):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(200, resp.status_code)
+
+    def test_last_modified_moves_with_votes(self):
+        """Ensures a vote on a Pizza moves its page's Last-Modified"""
+        url = reverse('workshop:view_pizza', kwargs={'pk': self.pizza.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+
+        # Last-Modified only counts whole seconds
+        time.sleep(1)
+        record_vote(self.pizza, liked=False)
+
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(200, resp.status_code)
+        self.assertContains(resp, 'Dislikes: 1')
+
+
+class WorkShopFragmentCacheTests(TestCase):
+    """Ensures the cached Pizza cards are kept up to date"""
+
+    def setUp(self):
+        """Creates a Pizza for testing with an empty cache"""
+        caches['default'].clear()
+
+        self.pizza = ModelCreator.create_pizza_object()
+        self.pizza.ingredients.add(ModelCreator.create_ingredient_object())
+
+    def get_homepage_without_cached_pages(self):
+        """Gets the homepage, only keeping the cached fragments"""
+        bump_catalog_version()
+        return self.client.get(reverse('workshop:homepage'))
+
+    def test_pizza_card_is_cached(self):
+        """Ensures the card is reused while the Pizza is unchanged"""
+        self.get_homepage_without_cached_pages()
+
+        # Change the summary behind the model's back, so updated_at stays
+        Pizza.objects.filter(pk=self.pizza.pk).update(summary='Sneaky summary')
+
+        resp = self.get_homepage_without_cached_pages()
+        self.assertNotContains(resp, 'Sneaky summary')
+        self.assertContains(resp, 'Testing this pizza')
+
+    def test_votes_are_shown_with_a_cached_card(self):
+        """Ensures a vote updates the count without changing updated_at"""
+        self.get_homepage_without_cached_pages()
+        updated_at = Pizza.objects.get(pk=self.pizza.pk).updated_at
+
+        record_vote(self.pizza, liked=False)
+
+        resp = self.get_homepage_without_cached_pages()
+        self.assertContains(resp, '1 &#10060')
+        self.assertEqual(
+            updated_at, Pizza.objects.get(pk=self.pizza.pk).updated_at
+        )
+
+    def test_renamed_ingredient_updates_card(self):
+        """Ensures renaming an Ingredient moves its Pizzas' updated_at"""
+        self.get_homepage_without_cached_pages()
+
+        onion = Ingredient.objects.get(name='Onion')
+        onion.name = 'Red Onion'
+        onion.save()
+
+        resp = self.get_homepage_without_cached_pages()
+        self.assertContains(resp, 'Red Onion')
+
+
+class WorkShopSearchTests(TestCase):
+    """Ensures Pizzas can be searched with both search backends"""
+
+    def setUp(self):
+        """Creates some Pizzas for testing and forgets the in-memory index"""
+        memory_index.built = False
+
+        self.pizza = ModelCreator.create_pizza_object()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pizza.ingredients.add(
+                Ingredient.objects.create(name='Pineapple')
+            )
+
+    def assertSearchFinds(self, query: str, names: list, page: int = 1):
+        """
+        Searches with each backend and checks the Pizzas found
+
+        :param query: The text to search for
+        :param names: The names of the Pizzas that should be found, in order
+        :param page: The page of results to check
+        """
+        for backend in ['fts5', 'memory']:
+            caches['default'].clear()
+
+            with self.settings(WORKSHOP_SEARCH_BACKEND=backend):
+                resp = self.client.get(
+                    reverse('workshop:search'), data={'q': query, 'page': page}
+                )
+
+            self.assertEqual(
+                names, [pizza.name for pizza in resp.context['pizzas']],
+                f'Searching {query!r} with {backend}'
+            )
+
+    def test_search_fields(self):
+        """Ensures the name, summary, city and Ingredients are searched"""
+        for query in ['test', 'testing this', 'knoxville', 'PINEAPPLE']:
+            self.assertSearchFinds(query, ['Test Pizza'])
+
+        self.assertSearchFinds('pineapple anchovies', [])
+
+    def test_search_prefixes_and_ranking(self):
+        """Ensures words match as prefixes and better matches come first"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Pizza.objects.create(
+                city='Zucchini', state='NY', crust=self.pizza.crust,
+                name='Zucchini Zucchini', summary='Zucchinis from Zucchini'
+            )
+            Pizza.objects.create(
+                city='Albany', state='NY', crust=self.pizza.crust,
+                name='Simple Zucchini', summary='Just one topping'
+            )
+
+        self.assertSearchFinds(
+            'zucc', ['Zucchini Zucchini', 'Simple Zucchini']
+        )
+
+    def test_search_stays_up_to_date(self):
+        """Ensures changes to Pizzas and Ingredients show up in searches"""
+        self.assertSearchFinds('pineapple', ['Test Pizza'])
+
+        pineapple = Ingredient.objects.get(name='Pineapple')
+        pineapple.name = 'Mango'
+        with self.captureOnCommitCallbacks(execute=True):
+            pineapple.save()
+        self.assertSearchFinds('pineapple', [])
+        self.assertSearchFinds('mango', ['Test Pizza'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pizza.delete()
+        self.assertSearchFinds('mango', [])
+
+    def test_memory_index_follows_commits(self):
+        """
+        Ensures the in-memory index leaves out Pizzas that are rolled back,
+        and is built again once another process changes a Pizza
+        """
+        self.assertSearchFinds('pineapple', ['Test Pizza'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.pizza.summary = 'Phantom'
+                    self.pizza.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+
+        self.assertSearchFinds('phantom', [])
+
+        # Another process changes the Pizza and the search version
+        Pizza.objects.filter(pk=self.pizza.pk).update(summary='Elsewhere')
+        bump_search_version()
+
+        with self.settings(WORKSHOP_SEARCH_BACKEND='memory'):
+            self.assertEqual([self.pizza.pk], search_pizzas('elsewhere')[0])
+
+    def test_search_pages(self):
+        """Ensures search results are split into pages"""
+        with self.captureOnCommitCallbacks(execute=True):
+            ModelCreator.create_pizza_objects(25)
+        names = [f'Pizza {number}' for number in range(25)]
+
+        self.assertSearchFinds('pizza topping', names[:20])
+        self.assertSearchFinds('pizza topping', names[20:], page=2)
+
+    def test_search_odd_queries(self):
+        """Ensures FTS5 syntax in a search is treated as plain text"""
+        for query in ['"', 'test*', 'NOT OR AND', '']:
+            resp = self.client.get(reverse('workshop:search'), {'q': query})
+            self.assertEqual(200, resp.status_code)
+
+        for page in ['zero', '0', '\u00b2', '9' * 30]:
+            resp = self.client.get(
+                reverse('workshop:search'), {'q': 'pizza', 'page': page}
+            )
+            self.assertEqual(404, resp.status_code)
+
+
+class WorkShopApiTests(TestCase):
+    """Tests for the JSON API"""
+
+    def setUp(self):
+        """Creates a Pizza with two Ingredients for testing"""
+        self.pizza = ModelCreator.create_pizza_object()
+        self.pizza.ingredients.add(
+            Ingredient.objects.create(name='Pineapple'),
+            Ingredient.objects.create(name='Sausage')
+        )
+
+    def get_pizza_list(self, **params):
+        """
+        Reads the whole streamed Pizza list
+
+        :param params: The query parameters to send
+        :return: The decoded list of Pizzas
+        """
+        resp = self.client.get(reverse('workshop:api_pizza_list'), params)
+
+        self.assertTrue(resp.streaming)
+        return json.loads(b''.join(resp.streaming_content))
+
+    def test_pizza_detail(self):
+        """Ensures a Pizza is sent with every field"""
+        resp = self.client.get(
+            reverse('workshop:api_pizza_detail', args=(self.pizza.pk,))
+        )
+        data = resp.json()
+
+        self.assertEqual(api.API_FIELDS, list(data))
+        self.assertEqual('Test Pizza', data['name'])
+        self.assertEqual('Extra Thick', data['crust'])
+        self.assertEqual(['Pineapple', 'Sausage'], data['ingredients'])
+
+    def test_pizza_detail_sparse_fields(self):
+        """Ensures only the fields asked for are sent or loaded"""
+        url = reverse('workshop:api_pizza_detail', args=(self.pizza.pk,))
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, {'fields': 'name,likes'})
+
+        self.assertEqual({'name': 'Test Pizza', 'likes': 0}, resp.json())
+
+        # No Crust join and no Ingredient prefetch
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('workshop_crust', sql)
+        self.assertNotIn('workshop_ingredient', sql)
+
+    def test_pizza_detail_errors(self):
+        """Ensures missing Pizzas and unknown fields are JSON errors"""
+        resp = self.client.get(reverse('workshop:api_pizza_detail', args=(0,)))
+        self.assertEqual(404, resp.status_code)
+        self.assertIn('error', resp.json())
+
+        resp = self.client.get(
+            reverse('workshop:api_pizza_detail', args=(self.pizza.pk,)),
+            {'fields': 'name,password'}
+        )
+        self.assertEqual(400, resp.status_code)
+
+    def test_pizza_list_streams_every_pizza(self):
+        """Ensures the list holds every Pizza, read a chunk at a time"""
+        ModelCreator.create_pizza_objects(7)
+
+        with mock.patch.object(api, 'CHUNK_SIZE', 3), \
+                CaptureQueriesContext(connection) as queries:
+            pizzas = self.get_pizza_list(fields='id,name,ingredients')
+
+        self.assertEqual(
+            list(
+                Pizza.objects.order_by('-time_created', '-id').values_list(
+                    'name', flat=True
+                )
+            ),
+            [pizza['name'] for pizza in pizzas]
+        )
+        self.assertEqual(['id', 'name', 'ingredients'], list(pizzas[0]))
+
+        # A Pizza query and an Ingredient query for each chunk
+        chunks = -(-len(pizzas) // 3)
+        self.assertEqual(chunks * 2, len(queries.captured_queries))
+
+    def test_pizza_list_sorted_and_filtered(self):
+        """Ensures the list can be sorted and filtered like the homepage"""
+        pizzas = ModelCreator.create_pizza_objects(3)
+        Pizza.objects.filter(pk=pizzas[1].pk).update(likes=10)
+
+        pizzas = self.get_pizza_list(
+            fields='name', sorted_by='-likes', ingredient='Onion'
+        )
+        self.assertEqual(
+            ['Pizza 1', 'Pizza 2', 'Pizza 0'],
+            [pizza['name'] for pizza in pizzas]
+        )
+
+        resp = self.client.get(
+            reverse('workshop:api_pizza_list'), {'sorted_by': 'password'}
+        )
+        self.assertEqual(400, resp.status_code)
+
+    def test_ingredient_autocomplete(self):
+        """Ensures Ingredients are found by prefix, a page at a time"""
+        ingredient_index.built = False
+        ModelCreator.create_pizza_objects(3)
+        url = reverse('workshop:api_ingredient_autocomplete')
+
+        with mock.patch.object(api, 'AUTOCOMPLETE_PAGE_SIZE', 2):
+            page = self.client.get(url, {'q': 'pizza t'}).json()
+            self.assertEqual(
+                ['Pizza Topping 0', 'Pizza Topping 1'],
+                [ingredient['name'] for ingredient in page['results']]
+            )
+
+            page = self.client.get(url + page['next']).json()
+            self.assertEqual(
+                ['Pizza Topping 2'],
+                [ingredient['name'] for ingredient in page['results']]
+            )
+            self.assertIsNone(page['next'])
+
+    def test_ingredient_autocomplete_from_memory(self):
+        """
+        Ensures the autocomplete answers from memory, ignoring case, and
+        follows Ingredients being saved and deleted
+        """
+        ingredient_index.built = False
+        url = reverse('workshop:api_ingredient_autocomplete')
+
+        def find(prefix: str):
+            """Gets the names of the Ingredients starting with a prefix"""
+            with CaptureQueriesContext(connection) as queries:
+                page = self.client.get(url, {'q': prefix}).json()
+
+            self.assertEqual(0, len(queries))
+            return [ingredient['name'] for ingredient in page['results']]
+
+        pepper = Ingredient.objects.create(name='Test Green Pepper')
+        Ingredient.objects.create(name='Test Garlic')
+        self.client.get(url)
+
+        self.assertEqual(['Test Garlic', 'Test Green Pepper'], find('test g'))
+        self.assertEqual(['Test Green Pepper'], find('TEST GREEN p'))
+
+        pepper.name = 'Test Red Pepper'
+        with self.captureOnCommitCallbacks(execute=True):
+            pepper.save()
+        self.assertEqual(['Test Garlic'], find('test g'))
+        self.assertEqual(['Test Red Pepper'], find('test red'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pepper.delete()
+        self.assertEqual([], find('test red'))
+
+    def test_ingredient_index_follows_commits(self):
+        """
+        Ensures the autocomplete leaves out Ingredients that are rolled back,
+        and rebuilds its index once another process changes an Ingredient
+        """
+        url = reverse('workshop:api_ingredient_autocomplete')
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Ingredient.objects.create(name='Test Phantom')
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+
+        resp = self.client.get(url, {'q': 'test ph'})
+        self.assertEqual([], resp.json()['results'])
+
+        # Another process adds an Ingredient and changes the version
+        Ingredient.objects.bulk_create([Ingredient(name='Test Olive')])
+        bump_choices_version()
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, {'q': 'test ol'})
+
+        self.assertEqual(1, len(queries))
+        self.assertEqual(
+            ['Test Olive'],
+            [ingredient['name'] for ingredient in resp.json()['results']]
+        )
+
+
+class WorkShopLeaderboardTests(TestCase):
+    """Tests for the Pizza leaderboards"""
+
+    def setUp(self):
+        """Creates some Pizzas for testing and forgets the built boards"""
+        leaderboards.boards.clear()
+        Pizza.objects.all().delete()
+        self.pizzas = ModelCreator.create_pizza_objects(4)
+        self.url = reverse(
+            'workshop:api_leaderboard', kwargs={'metric': 'score'}
+        )
+
+    def get_names(self, data: dict = None):
+        """
+        Gets the names on the score leaderboard, checking no query was run
+
+        :param data: Query parameters for the leaderboard
+        :return: A list of Pizza names, best first
+        """
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(self.url, data)
+
+        self.assertEqual(0, len(queries))
+        return [row['name'] for row in resp.json()['results']]
+
+    def test_leaderboard_follows_votes(self):
+        """Ensures Pizzas move up and down the board as votes come in"""
+        for pizza, (likes, dislikes) in zip(self.pizzas, [(1, 0), (5, 2)]):
+            Pizza.objects.filter(pk=pizza.pk).update(
+                likes=likes, dislikes=dislikes
+            )
+
+        # Building the board is the only query
+        self.client.get(self.url)
+        self.assertEqual(
+            ['Pizza 1', 'Pizza 0', 'Pizza 3', 'Pizza 2'], self.get_names()
+        )
+
+        for _ in range(3):
+            record_vote(self.pizzas[1], liked=False)
+        record_vote(self.pizzas[2], liked=True)
+        self.assertEqual(
+            ['Pizza 2', 'Pizza 0', 'Pizza 3', 'Pizza 1'], self.get_names()
+        )
+
+        self.pizzas[3].delete()
+        self.assertEqual(
+            ['Pizza 2', 'Pizza 0', 'Pizza 1'], self.get_names({'limit': 3})
+        )
+
+    def test_leaderboard_drops_pizzas_it_can_not_place(self):
+        """
+        Ensures a Pizza falling off the end of a full board is only ranked
+        again once the board is rebuilt
+        """
+        with mock.patch('workshop.leaderboards.SPARE_ENTRIES', 0), \
+                self.settings(WORKSHOP_LEADERBOARD_SIZE=2):
+            self.client.get(self.url)
+            self.assertEqual(['Pizza 3', 'Pizza 2'], self.get_names())
+
+            record_vote(self.pizzas[3], liked=False)
+            record_vote(self.pizzas[0], liked=True)
+
+            # Pizza 3 could be below Pizzas left off, so the board is built
+            # again when it is next asked for
+            resp = self.client.get(self.url)
+            self.assertEqual(
+                ['Pizza 0', 'Pizza 2'],
+                [row['name'] for row in resp.json()['results']]
+            )
+
+    def test_leaderboard_scopes(self):
+        """Ensures boards can be limited to a state or Crust"""
+        Pizza.objects.filter(pk=self.pizzas[0].pk).update(state='NY')
+        self.client.get(self.url, {'state': 'NY'})
+
+        self.pizzas[1].state = 'NY'
+        self.pizzas[1].save()
+        self.assertEqual(
+            ['Pizza 1', 'Pizza 0'], self.get_names({'state': 'NY'})
+        )
+
+        crust = self.pizzas[0].crust_id
+        resp = self.client.get(self.url, {'crust': crust})
+        self.assertEqual(4, len(resp.json()['results']))
+
+        for data in [{'state': 'XX'}, {'crust': 'thin'}, {'crust': '\u00b2'},
+                     {'state': 'NY', 'crust': crust}, {'limit': 0}]:
+            resp = self.client.get(self.url, data)
+            self.assertEqual(400, resp.status_code)
+
+        resp = self.client.get(
+            reverse('workshop:api_leaderboard', kwargs={'metric': 'name'})
+        )
+        self.assertEqual(404, resp.status_code)
+
+    def test_rebuild_leaderboards(self):
+        """Ensures the rebuild command makes boards read the database again"""
+        self.client.get(self.url)
+        Pizza.objects.filter(pk=self.pizzas[0].pk).update(likes=10)
+
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        resp = self.client.get(self.url)
+        self.assertEqual('Pizza 0', resp.json()['results'][0]['name'])
+
+
+class WorkShopTrendingTests(TestCase):
+    """Tests for the trending sort"""
+
+    def setUp(self):
+        """Creates some Pizzas for testing, the oldest first"""
+        get_vote_buffer_cache().clear()
+        shutil.rmtree(settings.WORKSHOP_VOTE_EVENT_DIR, ignore_errors=True)
+        Pizza.objects.all().delete()
+        self.pizzas = ModelCreator.create_pizza_objects(3)
+
+        now = timezone.now()
+        for age, pizza in zip([30, 20, 10], self.pizzas):
+            Pizza.objects.filter(pk=pizza.pk).update(
+                time_created=now - timedelta(days=age)
+            )
+
+    def get_trending_names(self):
+        """
+        Gets the names of the Pizzas on the trending page
+
+        :return: A list of Pizza names, in the order shown
+        """
+        resp = self.client.get(reverse(
+            'workshop:homepage_sorted', kwargs={'sorted_by': '-trending'}
+        ))
+        return [pizza.name for pizza in resp.context['pizzas']]
+
+    def test_recent_votes_trend_higher(self):
+        """
+        Ensures recent votes outrank older ones, and scores only change when
+        they are recomputed
+        """
+        hour = get_hour(timezone.now())
+        PizzaVoteWindow.objects.create(
+            pizza=self.pizzas[0], hour=hour - timedelta(hours=96), likes=10
+        )
+        PizzaVoteWindow.objects.create(
+            pizza=self.pizzas[1], hour=hour - timedelta(hours=2), likes=3
+        )
+
+        self.assertEqual(2, recompute_trending())
+        self.assertEqual(
+            ['Pizza 1', 'Pizza 0', 'Pizza 2'], self.get_trending_names()
+        )
+
+        for _ in range(5):
+            record_vote(self.pizzas[2], liked=True)
+        self.assertEqual(
+            ['Pizza 1', 'Pizza 0', 'Pizza 2'], self.get_trending_names()
+        )
+
+        call_command('recompute_trending', stdout=StringIO())
+        self.assertEqual(
+            ['Pizza 2', 'Pizza 1', 'Pizza 0'], self.get_trending_names()
+        )
+
+    def test_old_votes_stop_counting(self):
+        """Ensures hours past the horizon are dropped and scores go to 0"""
+        hour = get_hour(timezone.now())
+        PizzaVoteWindow.objects.create(
+            pizza=self.pizzas[0], hour=hour - timedelta(hours=2), likes=3
+        )
+        recompute_trending()
+
+        with self.settings(WORKSHOP_TRENDING_HORIZON=1):
+            self.assertEqual(1, recompute_trending())
+
+        self.assertFalse(PizzaVoteWindow.objects.exists())
+        self.assertFalse(Pizza.objects.exclude(trending=0).exists())
+
+
+class WorkShopVoteEventTests(TestCase):
+    """Tests for the vote log and its rollups"""
+
+    def setUp(self):
+        """
+        Creates a Pizza for testing and empties the vote buffer cache and
+        the vote event files
+        """
+        get_vote_buffer_cache().clear()
+        shutil.rmtree(settings.WORKSHOP_VOTE_EVENT_DIR, ignore_errors=True)
+        self.pizza = ModelCreator.create_pizza_object()
+
+    def test_events_are_imported_in_batches(self):
+        """
+        Ensures votes are written to a file rather than the database, and
+        each one is imported once
+        """
+        with CaptureQueriesContext(connection) as queries:
+            record_vote(self.pizza, liked=True, user_id=7)
+        self.assertFalse(any(
+            'workshop_voteevent' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+        record_vote(self.pizza, liked=False)
+        self.assertFalse(VoteEvent.objects.exists())
+
+        self.assertEqual(2, import_vote_events())
+        self.assertEqual(0, import_vote_events())
+
+        # The writer starts a new file once an import has claimed its last
+        record_vote(self.pizza, liked=True)
+        self.assertEqual(1, import_vote_events())
+
+        self.assertEqual(
+            [(self.pizza.pk, 7, True), (self.pizza.pk, None, False),
+             (self.pizza.pk, None, True)],
+            list(VoteEvent.objects.order_by('id').values_list(
+                'pizza_id', 'user_id', 'liked'
+            ))
+        )
+
+    def test_claimed_files_are_imported_once(self):
+        """
+        Ensures a file left behind by an import that stopped part way is
+        imported, unless its events were already saved
+        """
+        directory = settings.WORKSHOP_VOTE_EVENT_DIR
+        os.makedirs(directory)
+        for name in ['saved', 'unsaved']:
+            path = os.path.join(directory, name + '.importing')
+            with open(path, 'w') as event_file:
+                event_file.write(f'{self.pizza.pk},,1,1700000000.5\n')
+                event_file.write(f'{self.pizza.pk},3,')
+
+        ImportedVoteEventFile.objects.create(name='saved')
+
+        self.assertEqual(1, import_vote_events())
+        self.assertEqual([], os.listdir(directory))
+        self.assertTrue(
+            ImportedVoteEventFile.objects.filter(name='unsaved').exists()
+        )
+
+    def test_like_pizza_logs_the_user(self):
+        """Ensures the vote views log who voted"""
+        user = User.objects.create_user(username='voter', password='pass')
+        self.client.force_login(user)
+
+        self.client.get(
+            reverse('workshop:like_pizza', kwargs={'pk': self.pizza.pk})
+        )
+        import_vote_events()
+
+        event = VoteEvent.objects.get()
+        self.assertEqual(
+            (self.pizza.pk, user.pk), (event.pizza_id, event.user_id)
+        )
+
+    def test_events_are_rolled_up_once(self):
+        """Ensures each event is counted in its hour and day exactly once"""
+        for liked in [True, True, False]:
+            record_vote(self.pizza, liked)
+
+        other_pizza = ModelCreator.create_pizza_objects(1)[0]
+        record_vote(other_pizza, liked=True)
+        other_pizza.delete()
+
+        self.assertEqual(4, roll_up_vote_events())
+        self.assertEqual(0, roll_up_vote_events())
+
+        now = timezone.now()
+        hour = PizzaVoteWindow.objects.get()
+        self.assertEqual(
+            (self.pizza.pk, get_hour(now), 2, 1),
+            (hour.pizza_id, hour.hour, hour.likes, hour.dislikes)
+        )
+        day = PizzaVoteDay.objects.get()
+        self.assertEqual(
+            (self.pizza.pk, now.date(), 2, 1),
+            (day.pizza_id, day.day, day.likes, day.dislikes)
+        )
+
+        # Later events are added to the same rows
+        record_vote(self.pizza, liked=True)
+        call_command('roll_up_votes', stdout=StringIO())
+        self.assertEqual(3, PizzaVoteDay.objects.get().likes)
+
+    def test_pizza_votes(self):
+        """Ensures a Pizza's vote history is sent from the rollups"""
+        record_vote(self.pizza, liked=True)
+        roll_up_vote_events()
+        url = reverse('workshop:api_pizza_votes', kwargs={'pk': self.pizza.pk})
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url).json()
+        self.assertEqual(2, len(queries))
+        self.assertEqual('day', data['period'])
+        self.assertEqual(
+            [{'start': timezone.now().date().isoformat(), 'likes': 1,
+              'dislikes': 0}],
+            data['results']
+        )
+
+        data = self.client.get(url, {'period': 'hour'}).json()
+        self.assertEqual(1, data['results'][0]['likes'])
+
+        resp = self.client.get(url, {'period': 'week'})
+        self.assertEqual(400, resp.status_code)
+
+
+class WorkShopExportTests(TestCase):
+    """Tests for exporting the catalog"""
+
+    def setUp(self):
+        """Creates some Pizzas for testing"""
+        self.pizzas = ModelCreator.create_pizza_objects(3)
+
+    def test_export_pizzas_csv(self):
+        """Ensures every Pizza is written with its Crust and Ingredients"""
+        out = StringIO()
+        call_command('export_catalog', 'pizzas', stdout=out)
+
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        exported = {row['name']: row for row in rows}
+
+        self.assertEqual(Pizza.objects.count(), len(rows))
+        self.assertEqual('Extra Thick', exported['Pizza 1']['crust'])
+        self.assertEqual(
+            'Onion, Pizza Topping 1', exported['Pizza 1']['ingredients']
+        )
+
+    def test_export_jsonl_stats(self):
+        """Ensures JSON Lines can be written with speed and memory stats"""
+        out = StringIO()
+        err = StringIO()
+        call_command(
+            'export_catalog', 'ingredients', export_format='jsonl',
+            stats=True, stdout=out, stderr=err
+        )
+
+        lines = out.getvalue().splitlines()
+        names = [json.loads(line)['name'] for line in lines]
+        self.assertIn('Pizza Topping 2', names)
+        self.assertIn('rows/sec', err.getvalue())
+        self.assertIn('peak RSS', err.getvalue())
+
+    def test_export_query_count_is_constant(self):
+        """Ensures the export does not query once per Pizza"""
+        with CaptureQueriesContext(connection) as few_pizzas:
+            list(export_table('pizzas', 'jsonl'))
+
+        ModelCreator.create_pizza_objects(10, prefix='More')
+
+        with CaptureQueriesContext(connection) as many_pizzas:
+            list(export_table('pizzas', 'jsonl'))
+
+        self.assertEqual(
+            len(few_pizzas.captured_queries),
+            len(many_pizzas.captured_queries)
+        )
+
+    def test_download_catalog(self):
+        """Ensures only logged in users can download the catalog"""
+        url = reverse('workshop:download_catalog', args=('crusts',))
+
+        resp = self.client.get(url)
+        self.assertEqual(302, resp.status_code)
+
+        user = User.objects.create_user(username='test_user', password='pw')
+        self.client.force_login(user)
+
+        resp = self.client.get(url)
+        self.assertIn('crusts.csv', resp['Content-Disposition'])
+        self.assertIn(
+            'Extra Thick', b''.join(resp.streaming_content).decode()
+        )
+
+        resp = self.client.get(url, {'format': 'xml'})
+        self.assertEqual(404, resp.status_code)
+
+    async def test_download_catalog_async(self):
+        """Ensures the download is still streamed when served under ASGI"""
+        user = await sync_to_async(User.objects.create_user)(
+            username='test_user', password='pw'
+        )
+        await sync_to_async(self.async_client.force_login)(user)
+
+        resp = await self.async_client.get(
+            reverse('workshop:download_catalog', args=('pizzas',)),
+            {'format': 'jsonl'}
+        )
+
+        self.assertTrue(resp.is_async)
+        lines = [line async for line in resp.streaming_content]
+        self.assertEqual(await Pizza.objects.acount(), len(lines))
+
+
+class WorkShopImportTests(TestCase):
+    """Tests for importing Pizzas in bulk"""
+
+    def import_pizzas(self, text: str, import_format: str = 'csv', **options):
+        """
+        Runs import_pizzas with the text as its input file
+
+        :param text: The file's contents
+        :param import_format: Either 'csv' or 'jsonl'
+        :param options: Any other options for the command
+        :return: What the command wrote to standard output
+        """
+        out = StringIO()
+        with mock.patch('sys.stdin', StringIO(text)):
+            call_command(
+                'import_pizzas', '-', import_format=import_format,
+                stdout=out, stderr=StringIO(), **options
+            )
+
+        return out.getvalue()
+
+    def create_csv(self, count: int, summary: str = 'Imported'):
+        """
+        Creates a CSV file of Pizzas for testing
+
+        :param count: How many Pizzas to write
+        :param summary: The summary every Pizza gets
+        :return: The CSV text
+        """
+        lines = ['name,summary,city,state,crust,ingredients,likes']
+        lines += [
+            f'Import {number},{summary},Knoxville,TN,Thin,'
+            f'"onion, fresh basil",{number}'
+            for number in range(count)
+        ]
+
+        return '\n'.join(lines)
+
+    def test_import_csv(self):
+        """Ensures Pizzas are created along with their Crust and Ingredients"""
+        ModelCreator.create_ingredient_object()
+
+        out = self.import_pizzas(self.create_csv(3))
+        self.assertIn('Created 3', out)
+
+        pizza = Pizza.objects.get(name='Import 2')
+        self.assertEqual('Thin', pizza.crust.type)
+        self.assertEqual(2, pizza.likes)
+
+        # Ingredient names are title cased and matched to existing ones
+        self.assertEqual(
+            ['Fresh Basil', 'Onion'],
+            sorted(str(ingredient) for ingredient in pizza.ingredients.all())
+        )
+        self.assertEqual(1, Ingredient.objects.filter(name='Onion').count())
+
+        # The imported Pizzas can be found by the search
+        self.assertIn(pizza.pk, search_pizzas('basil import')[0])
+
+    def test_import_query_count_is_constant(self):
+        """Ensures the import does not query once per Pizza"""
+        # Create the Crust and Ingredients up front, so both imports match
+        Crust.objects.get_or_create(type='Thin')
+        Ingredient.objects.get_or_create(name='Fresh Basil')
+        ModelCreator.create_ingredient_object()
+
+        with CaptureQueriesContext(connection) as few_pizzas:
+            self.import_pizzas(self.create_csv(5))
+
+        Pizza.objects.filter(name__startswith='Import').delete()
+
+        with CaptureQueriesContext(connection) as many_pizzas:
+            self.import_pizzas(self.create_csv(50))
+
+        self.assertEqual(
+            len(few_pizzas.captured_queries),
+            len(many_pizzas.captured_queries)
+        )
+
+    def test_import_skips_or_upserts_existing(self):
+        """Ensures existing Pizzas are only overwritten when upserting"""
+        self.import_pizzas(self.create_csv(2))
+
+        out = self.import_pizzas(self.create_csv(3, summary='Changed'))
+        self.assertIn('Created 1, updated 0 and skipped 2', out)
+        self.assertEqual(
+            'Imported', Pizza.objects.get(name='Import 0').summary
+        )
+
+        out = self.import_pizzas(
+            self.create_csv(3, summary='Changed'), upsert=True
+        )
+        self.assertIn('Created 0, updated 3 and skipped 0', out)
+        self.assertEqual('Changed', Pizza.objects.get(name='Import 0').summary)
+        self.assertEqual(
+            2, Pizza.objects.get(name='Import 0').ingredients.count()
+        )
+
+    def test_upsert_query_count_is_constant(self):
+        """Ensures upserting does not update once per Pizza"""
+        self.import_pizzas(self.create_csv(50))
+
+        with CaptureQueriesContext(connection) as few_pizzas:
+            self.import_pizzas(self.create_csv(5), upsert=True)
+
+        with CaptureQueriesContext(connection) as many_pizzas:
+            self.import_pizzas(self.create_csv(50), upsert=True)
+
+        self.assertEqual(
+            len(few_pizzas.captured_queries),
+            len(many_pizzas.captured_queries)
+        )
+        self.assertEqual(49, Pizza.objects.get(name='Import 49').likes)
+
+    def test_import_jsonl(self):
+        """Ensures JSON Lines files can be imported, ignoring bad rows"""
+        rows = [
+            {
+                'name': 'Json Pizza', 'summary': 'From JSON', 'city': 'Austin',
+                'state': 'TX', 'crust': 'Thin', 'ingredients': ['Olives']
+            },
+            {'name': 'No Crust', 'summary': 'Missing', 'city': 'Austin'},
+        ]
+        self.import_pizzas(
+            '\n'.join(json.dumps(row) for row in rows), import_format='jsonl'
+        )
+
+        self.assertTrue(Pizza.objects.filter(name='Json Pizza').exists())
+        self.assertFalse(Pizza.objects.filter(name='No Crust').exists())
+
+
+    def test_import_ignores_invalid_rows(self):
+        """Ensures rows PizzaForm would turn down are ignored, not raised"""
+        valid = {
+            'name': 'Valid Pizza', 'summary': 'Fine', 'city': 'Austin',
+            'state': 'TX', 'crust': 'Thin', 'ingredients': ['Olives'],
+            'likes': '3',
+        }
+        invalid_rows = [
+            {**valid, 'name': 'N' * 41},
+            {**valid, 'city': 'C' * 51},
+            {**valid, 'summary': 'S' * 201},
+            {**valid, 'crust': 'C' * 31},
+            {**valid, 'ingredients': ['I' * 41]},
+            {**valid, 'state': 'XX'},
+            {**valid, 'likes': 'many'},
+            {**valid, 'dislikes': 1.5},
+            {**valid, 'name': 42},
+            {**valid, 'ingredients': [None]},
+            {**valid, 'ingredients': 7},
+            {**valid, 'name': '   '},
+            ['Not', 'an', 'object'],
+        ]
+        lines = [json.dumps(row) for row in [valid, *invalid_rows]]
+        lines.append('{not json')
+
+        out = StringIO()
+        err = StringIO()
+        with mock.patch('sys.stdin', StringIO('\n'.join(lines))):
+            call_command(
+                'import_pizzas', '-', import_format='jsonl', stdout=out,
+                stderr=err
+            )
+
+        self.assertIn('Created 1', out.getvalue())
+        self.assertIn(f'Ignored {len(invalid_rows) + 1} rows', err.getvalue())
+        self.assertEqual(3, Pizza.objects.get(name='Valid Pizza').likes)
+
+        # Text is stripped the same as PizzaForm strips it
+        self.assertEqual(
+            {'name': 'Padded', 'summary': 'Fine', 'city': 'Austin',
+             'state': 'TX', 'crust': 'Thin', 'ingredients': ['Olives']},
+            clean_pizza_row({**valid, 'name': ' Padded ', 'likes': ''})
+        )
+
+
+class WorkShopSyntheticDataTests(TestCase):
+    """Tests for making up data for scale testing"""
+
+    def generate_rows(self, seed: int, count: int = 100):
+        """
+        Makes up some Pizza rows for testing
+
+        :param seed: Seeds the random numbers
+        :param count: How many rows to make
+        :return: A list of dictionaries
+        """
+        return list(generate_pizza_rows(
+            random.Random(seed), count, ['Thin Crust', 'Pan Crust'],
+            ['Basil', 'Onion', 'Fresh Basil'], vote_skew=1.2
+        ))
+
+    def test_generate_pizzas_command(self):
+        """Ensures the data is created once and skipped after that"""
+        number_of_pizzas = Pizza.objects.count()
+
+        out = StringIO()
+        call_command(
+            'generate_pizzas', pizzas=50, crusts=3, ingredients=30,
+            stdout=out
+        )
+        self.assertIn('Created 50', out.getvalue())
+        self.assertEqual(number_of_pizzas + 50, Pizza.objects.count())
+        self.assertTrue(Ingredient.objects.filter(name='Fresh Basil').exists())
+        self.assertTrue(Crust.objects.filter(type='Thick Crust').exists())
+
+        call_command('generate_pizzas', pizzas=50, stdout=out)
+        self.assertIn('skipped 50', out.getvalue())
+
+    def test_generated_rows_are_deterministic(self):
+        """Ensures the same seed always makes the same data"""
+        self.assertEqual(self.generate_rows(7), self.generate_rows(7))
+        self.assertNotEqual(self.generate_rows(7), self.generate_rows(8))
+
+    def test_generated_votes_are_skewed(self):
+        """Ensures a few Pizzas get a large share of the votes"""
+        likes = sorted(
+            (row['likes'] for row in self.generate_rows(0, count=2000)),
+            reverse=True
+        )
+
+        # The top 1% of Pizzas should hold over a quarter of the likes
+        self.assertGreater(sum(likes[:20]), sum(likes) / 4)
+
+
+class WorkShopBenchmarkTests(TestCase):
+    """Tests for the benchmark harness"""
+
+    def test_run_benchmarks(self):
+        """Ensures every path is measured at every size"""
+        results = run_benchmarks([5, 10], requests=2, warmup=0)
+
+        self.assertEqual(['5', '10'], list(results['sizes']))
+        for paths in results['sizes'].values():
+            self.assertIn('login_user', paths)
+            self.assertIn('homepage_sorted:-likes', paths)
+            self.assertEqual(
+                {'p50_ms', 'p95_ms', 'p99_ms', 'requests_per_sec', 'queries'},
+                set(paths['view_pizza'])
+            )
+
+        # create_pizza really did create Pizzas
+        self.assertTrue(
+            Pizza.objects.filter(name__startswith='Benchmark').exists()
+        )
+
+    def test_get_percentile(self):
+        """Ensures percentiles are found by the nearest rank"""
+        values = list(range(1, 101))
+
+        self.assertEqual(50, get_percentile(values, 50))
+        self.assertEqual(99, get_percentile(values, 99))
+        self.assertEqual(5, get_percentile([5], 95))
+
+    def test_find_regressions(self):
+        """Ensures slower pages and extra queries are reported"""
+        stats = {'p95_ms': 10.0, 'queries': 4}
+        baseline = {'sizes': {'100': {'homepage': stats}}}
+
+        slower = {'sizes': {'100': {'homepage': dict(stats, p95_ms=12.0)}}}
+        self.assertEqual([], find_regressions(baseline, slower, 0.25))
+        self.assertEqual(1, len(find_regressions(baseline, slower, 0.1)))
+
+        more_queries = {'sizes': {'100': {'homepage': dict(stats, queries=5)}}}
+        self.assertIn(
+            '4 to 5 queries',
+            find_regressions(baseline, more_queries, 0.25)[0]
+        )
+
+
+@override_settings(WORKSHOP_LIVE_HEARTBEAT=1)
+class WorkShopLiveVoteTests(TestCase):
+    """Ensures votes can be cast in the background and streamed to pages"""
+
+    def setUp(self):
+        """Creates a User and Pizza for testing"""
+        caches['default'].clear()
+
+        User.objects.create_user(
+            username='test_user', password='test_password'
+        )
+        self.client.login(username='test_user', password='test_password')
+
+        self.pizza = ModelCreator.create_pizza_object()
+        self.vote_url = reverse(
+            'workshop:vote_pizza', kwargs={'pk': self.pizza.pk}
+        )
+
+    def test_vote_pizza(self):
+        """Ensures a vote answers with just the new counts"""
+        resp = self.client.post(self.vote_url, {'vote': 'like'})
+        self.assertEqual(
+            {'id': self.pizza.pk, 'likes': 1, 'dislikes': 0}, resp.json()
+        )
+
+        resp = self.client.post(self.vote_url, {'vote': 'dislike'})
+        self.assertEqual(1, resp.json()['dislikes'])
+
+        resp = self.client.post(self.vote_url, {'vote': 'love'})
+        self.assertEqual(400, resp.status_code)
+
+        self.client.logout()
+        resp = self.client.post(self.vote_url, {'vote': 'like'})
+        self.assertEqual(403, resp.status_code)
+
+        self.pizza.refresh_from_db()
+        self.assertEqual(1, self.pizza.likes)
+
+    @override_settings(WORKSHOP_LIVE_STREAM_TIMEOUT=3)
+    def test_vote_stream(self):
+        """Ensures votes on the Pizzas listened for are streamed"""
+        other_pizza = ModelCreator.create_pizza_objects(1)[0]
+
+        resp = self.client.get(
+            reverse('workshop:vote_stream'), {'pizza': self.pizza.pk}
+        )
+        self.assertEqual('text/event-stream', resp['Content-Type'])
+        self.assertIn('csrftoken', resp.cookies)
+
+        events = iter(resp.streaming_content)
+        self.assertEqual(b'retry: 3000\n\n', next(events))
+
+        # Votes through the page links are streamed as well
+        self.client.get(
+            reverse('workshop:like_pizza', kwargs={'pk': other_pizza.pk})
+        )
+        self.client.post(self.vote_url, {'vote': 'dislike'})
+
+        event = next(events).decode()
+        self.assertTrue(event.startswith('event: votes\n'))
+        self.assertEqual(
+            {'id': self.pizza.pk, 'likes': 0, 'dislikes': 1},
+            json.loads(event.split('data: ')[1])
+        )
+
+        # Nothing else happens, so the stream keeps the connection alive
+        self.assertEqual(b': keep-alive\n\n', next(events))
+
+        # The stream ends on its own, so the browser opens it again
+        self.assertEqual({b': keep-alive\n\n'}, set(events))
+
+    @override_settings(WORKSHOP_LIVE_STREAM_TIMEOUT=0)
+    def test_vote_stream_subscribes_when_read(self):
+        """Ensures a stream only listens while it is being read"""
+        broker = get_broker()
+
+        resp = self.client.get(reverse('workshop:vote_stream'))
+        self.assertFalse(broker.subscriptions)
+
+        events = iter(resp.streaming_content)
+        next(events)
+        self.assertEqual(1, len(broker.subscriptions))
+
+        self.assertEqual([], list(events))
+        self.assertFalse(broker.subscriptions)
+
+    async def test_async_vote_stream(self):
+        """Ensures the stream waits on the event loop under ASGI"""
+        resp = await self.async_client.get(
+            reverse('workshop:vote_stream'), {'pizza': self.pizza.pk}
+        )
+        self.assertTrue(resp.is_async)
+
+        events = resp.streaming_content
+        self.assertEqual(b'retry: 3000\n\n', await anext(events))
+
+        # Published from another thread, like a vote would be
+        event = {'id': self.pizza.pk, 'likes': 2, 'dislikes': 0}
+        await sync_to_async(get_broker().publish, thread_sensitive=False)(
+            event
+        )
+
+        self.assertEqual(
+            f'event: votes\ndata: {json.dumps(event)}\n\n'.encode(),
+            await anext(events)
+        )
+        self.assertEqual(b': keep-alive\n\n', await anext(events))
+        await events.aclose()
+
+    @override_settings(WORKSHOP_LIVE_BROKER='cache')
+    def test_cache_broker(self):
+        """Ensures the cache broker passes on events in order"""
+        broker = get_broker()
+        broker.publish({'id': 0})
+
+        subscription = broker.subscribe()
+        broker.publish({'id': 1})
+        broker.publish({'id': 2})
+
+        self.assertEqual({'id': 1}, subscription.get(1))
+        self.assertEqual({'id': 2}, subscription.get(1))
+        self.assertIsNone(subscription.get(0))
+
+
+class WorkShopVoteTests(TransactionTestCase):
+    """Ensures votes are counted correctly when cast at the same time"""
+
+    def test_concurrent_votes_are_exact(self):
+        """Fires votes from many threads and checks none were lost"""
+        pizza = ModelCreator.create_pizza_object()
+
+        def cast_votes(liked: bool):
+            """Casts 25 votes from a thread with its own connection"""
+            try:
+                for _ in range(25):
+                    record_vote(pizza, liked)
+            finally:
+                connection.close()
+
+        # Half of the threads like the Pizza and the other half dislike it
+        threads = [
+            threading.Thread(target=cast_votes, args=(number % 2 == 0,))
+            for number in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Move any sharded votes into the Pizza
+        sync_vote_shards()
+
+        pizza.refresh_from_db()
+        self.assertEqual(100, pizza.likes)
+        self.assertEqual(100, pizza.dislikes)
+
+    @override_settings(WORKSHOP_VOTE_STORAGE='sharded')
+    def test_concurrent_sharded_votes_are_exact(self):
+        """Fires votes at the vote shards from many threads"""
+        self.test_concurrent_votes_are_exact()
+
+
+@override_settings(
+    WORKSHOP_VOTE_BUFFERING=True,
+    WORKSHOP_VOTE_BUFFER_FLUSH_INTERVAL=3600,
+    WORKSHOP_VOTE_BUFFER_FLUSH_SIZE=10
+)
+class WorkShopVoteBufferTests(TestCase):
+    """Ensures the vote buffer holds votes and writes them in batches"""
+
+    def setUp(self):
+        """Creates a User and Pizza for testing with an empty vote buffer"""
+        get_vote_buffer_cache().clear()
+
+        User.objects.create_user(
+            username='test_user', password='test_password'
+        )
+        self.client.login(username='test_user', password='test_password')
+
+        self.pizza = ModelCreator.create_pizza_object()
+
+    def test_buffered_vote_is_shown(self):
+        """Ensures a buffered vote is shown before it reaches the database"""
+        self.client.get(
+            reverse('workshop:like_pizza', kwargs={'pk': self.pizza.pk})
+        )
+
+        # The database has not been written to yet
+        self.pizza.refresh_from_db()
+        self.assertEqual(0, self.pizza.likes)
+
+        resp = self.client.get(
+            reverse('workshop:view_pizza', kwargs={'pk': self.pizza.pk})
+        )
+        self.assertContains(resp, 'Likes: 1')
+
+    def test_buffered_vote_keeps_cached_listings(self):
+        """
+        Ensures a buffered vote only drops the Pizza's own cached page,
+        and the listings are dropped once the vote is flushed
+        """
+        catalog_version = get_catalog_version()
+        pizza_version = get_pizza_version(self.pizza.pk)
+
+        record_vote(self.pizza, liked=True)
+        self.assertEqual(catalog_version, get_catalog_version())
+        self.assertNotEqual(pizza_version, get_pizza_version(self.pizza.pk))
+
+        flush_vote_buffer()
+        self.assertNotEqual(catalog_version, get_catalog_version())
+
+    def test_flush_vote_buffer(self):
+        """Ensures flushing writes the votes and empties the buffer"""
+        for _ in range(3):
+            record_vote(self.pizza, liked=True)
+        record_vote(self.pizza, liked=False)
+
+        self.assertEqual(1, flush_vote_buffer())
+
+        self.pizza.refresh_from_db()
+        self.assertEqual(3, self.pizza.likes)
+        self.assertEqual(1, self.pizza.dislikes)
+
+        # Nothing is left in the buffer to be flushed again
+        self.assertEqual(0, flush_vote_buffer())
+
+    def test_buffer_flushes_when_full(self):
+        """Ensures the buffer writes to the database once it is full"""
+        other_pizza = ModelCreator.create_pizza_objects(1)[0]
+
+        # One vote short of the WORKSHOP_VOTE_BUFFER_FLUSH_SIZE of 10
+        for _ in range(9):
+            record_vote(self.pizza, liked=True)
+        self.pizza.refresh_from_db()
+        self.assertEqual(0, self.pizza.likes)
+
+        record_vote(other_pizza, liked=False)
+
+        self.pizza.refresh_from_db()
+        other_pizza.refresh_from_db()
+        self.assertEqual(9, self.pizza.likes)
+        self.assertEqual(1, other_pizza.dislikes)
+
+    def test_flush_votes_command(self):
+        """Ensures the flush_votes command writes the buffered votes"""
+        record_vote(self.pizza, liked=False)
+
+        err = StringIO()
+        call_command('flush_votes', stdout=StringIO(), stderr=err)
+
+        self.pizza.refresh_from_db()
+        self.assertEqual(1, self.pizza.dislikes)
+
+        # The votes cache is a LocMemCache, which other processes cannot see
+        self.assertIn('kept in each process', err.getvalue())
+
+
+@override_settings(
+    WORKSHOP_VOTE_STORAGE='sharded',
+    WORKSHOP_VOTE_SHARD_COUNT=4,
+    WORKSHOP_VOTE_SHARD_SYNC_INTERVAL=3600
+)
+class WorkShopVoteShardTests(TestCase):
+    """Ensures votes can be spread over PizzaVoteShard rows"""
+
+    def setUp(self):
+        """Creates a Pizza for testing and holds off the automatic sync"""
+        caches['default'].set(SHARDS_SYNCED_KEY, True)
+
+        self.pizza = ModelCreator.create_pizza_object()
+
+    def test_sharded_votes_are_shown(self):
+        """Ensures votes go to the shards and are added up when shown"""
+        for _ in range(20):
+            record_vote(self.pizza, liked=True)
+        record_vote(self.pizza, liked=False)
+
+        # The votes should have been spread over more than one shard
+        self.assertGreater(self.pizza.vote_shards.count(), 1)
+        self.pizza.refresh_from_db()
+        self.assertEqual(0, self.pizza.likes)
+
+        resp = self.client.get(
+            reverse('workshop:view_pizza', kwargs={'pk': self.pizza.pk})
+        )
+        self.assertContains(resp, 'Likes: 20')
+        self.assertContains(resp, 'Dislikes: 1')
+
+    def test_sync_vote_shards(self):
+        """Ensures syncing moves the shard totals into the Pizza"""
+        for _ in range(5):
+            record_vote(self.pizza, liked=False)
+
+        self.assertEqual(1, sync_vote_shards())
+
+        self.pizza.refresh_from_db()
+        self.assertEqual(5, self.pizza.dislikes)
+        self.assertFalse(
+            PizzaVoteShard.objects.exclude(likes=0, dislikes=0).exists()
+        )
+
+    def test_sorting_by_votes_uses_an_index(self):
+        """Ensures the cached totals on Pizza can be sorted by an index"""
+        for sorted_by, index in [('-likes', 'workshop_pizza_likes_idx'),
+                                 ('-dislikes', 'workshop_pizza_dislikes_idx'),
+                                 ('-trending', 'workshop_pizza_trending_idx')]:
+            plan = Pizza.objects.order_by(sorted_by, '-id').explain()
+            self.assertIn(index, plan)
+
+
 class ModelCreator:
     """A class designed to produce model Objects for testing"""
 
@@ -327,3 +2060,31 @@ class ModelCreator:
             name='Test Pizza',
             summary='Testing this pizza',
         )[0]
+
+    @staticmethod
+    def create_pizza_objects(count: int, prefix: str = 'Pizza'):
+        """
+        Creates many Pizza objects, each with two Ingredients, for testing
+
+        :param count: How many Pizza objects to create
+        :param prefix: Used to keep the Pizza and Ingredient names unique
+        :return: A list of the created Pizza objects
+        """
+        crust = ModelCreator.create_crust_object()
+
+        pizzas = []
+        for number in range(count):
+            pizza = Pizza.objects.create(
+                city='Knoxville',
+                state='TN',
+                crust=crust,
+                name=f'{prefix} {number}',
+                summary='Testing many pizzas',
+            )
+            pizza.ingredients.add(
+                Ingredient.objects.create(name=f'{prefix} Topping {number}'),
+                ModelCreator.create_ingredient_object(),
+            )
+            pizzas.append(pizza)
+
+        return pizzas
@@ -0,0 +1,111 @@
+"""
+Ranks Pizzas by their recent votes, with older votes counting for less.
+
+Every vote is logged as a VoteEvent and rolled up into the PizzaVoteWindow
+row for its hour, see votes.py. recompute_trending rolls up the latest
+events, then adds up each Pizza's hours, halving their weight every
+WORKSHOP_TRENDING_HALF_LIFE hours, and saves the total in Pizza.trending.
+The homepage sorts on that indexed column, so pages never work out the
+decay themselves. A new Pizza counts as NEW_PIZZA_VOTES likes in the hour
+it was created, so it has a chance to be seen.
+
+The scores only move when they are recomputed, so run the
+recompute_trending command regularly, from cron or with its --interval
+option.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Pizza, PizzaVoteWindow
+from .votes import get_hour, roll_up_vote_events
+
+# How many likes a newly created Pizza starts out with
+NEW_PIZZA_VOTES = 1
+
+# How many Pizzas have their score saved at a time
+BATCH_SIZE = 500
+
+# How many decimal places of each score are kept, so tiny changes do not
+# need saving
+SCORE_PRECISION = 4
+
+
+def compute_trending_scores(now):
+    """
+    Works out the trending score of every Pizza with recent activity
+
+    Only Pizzas created or voted on within the last
+    WORKSHOP_TRENDING_HORIZON hours are scored, the rest count as 0.
+
+    :param now: The time the scores are worked out for
+    :return: A dictionary in the format of {pizza_id: score}
+    """
+    since = get_hour(now - timedelta(hours=settings.WORKSHOP_TRENDING_HORIZON))
+    scores = defaultdict(float)
+
+    new_pizzas = Pizza.objects.filter(
+        time_created__gte=since
+    ).values_list('id', 'time_created')
+    for pizza_id, time_created in new_pizzas:
+        scores[pizza_id] += NEW_PIZZA_VOTES * get_decay(now - time_created)
+
+    windows = PizzaVoteWindow.objects.filter(
+        hour__gte=since
+    ).values_list('pizza_id', 'hour', 'likes', 'dislikes')
+    for pizza_id, hour, likes, dislikes in windows:
+        scores[pizza_id] += (likes - dislikes) * get_decay(now - hour)
+
+    return scores
+
+
+def get_decay(age: timedelta):
+    """
+    Works out how much a vote of some age still counts for
+
+    :param age: How long ago the vote was cast
+    :return: A float from 1 for a new vote down towards 0
+    """
+    hours = max(age.total_seconds(), 0) / 3600
+
+    return 0.5 ** (hours / settings.WORKSHOP_TRENDING_HALF_LIFE)
+
+
+def recompute_trending():
+    """
+    Saves a fresh trending score to every Pizza whose score changed
+
+    Pizzas that were trending but have no recent activity left go back to 0,
+    and hours too old to count any more are deleted. Their votes are still
+    kept in the VoteEvent and PizzaVoteDay rows.
+
+    :return: The number of Pizzas that were updated
+    """
+    roll_up_vote_events()
+
+    now = timezone.now()
+    scores = compute_trending_scores(now)
+
+    old_scores = dict(
+        Pizza.objects.exclude(trending=0).values_list('id', 'trending')
+    )
+    changed = []
+    for pizza_id in scores.keys() | old_scores.keys():
+        score = round(scores.get(pizza_id, 0), SCORE_PRECISION)
+        if score != old_scores.get(pizza_id, 0):
+            changed.append(Pizza(pk=pizza_id, trending=score))
+
+    since = get_hour(now - timedelta(hours=settings.WORKSHOP_TRENDING_HORIZON))
+    with transaction.atomic():
+        Pizza.objects.bulk_update(changed, ['trending'], batch_size=BATCH_SIZE)
+        PizzaVoteWindow.objects.filter(hour__lt=since).delete()
+
+    # The trending order of the cached listings has changed
+    if changed:
+        bump_catalog_version()
+
+    return len(changed)
@@ -1,11 +1,28 @@
 from django.urls import path
 
-from . import views
+from . import api, export, live, views
 
 app_name = 'workshop'
 
 urlpatterns = [
     path('', views.workshop_homepage, name='homepage'),
+    path(
+        'api/ingredients/',
+        api.ingredient_autocomplete,
+        name='api_ingredient_autocomplete'
+    ),
+    path(
+        'api/leaderboards/<str:metric>',
+        api.leaderboard,
+        name='api_leaderboard'
+    ),
+    path('api/pizzas/', api.pizza_list, name='api_pizza_list'),
+    path('api/pizzas/<int:pk>', api.pizza_detail, name='api_pizza_detail'),
+    path(
+        'api/pizzas/<int:pk>/votes',
+        api.pizza_votes,
+        name='api_pizza_votes'
+    ),
     path(
         'sorted_by/<str:sorted_by>',
         views.workshop_homepage_sorted,
@@ -22,12 +39,20 @@ urlpatterns = [
         name='create_pizza'
     ),
     path('delete/<int:pk>', views.delete_pizza, name='delete_pizza'),
+    path(
+        'export/<str:table>',
+        export.download_catalog,
+        name='download_catalog'
+    ),
     path('dislike_pizza/<int:pk>', views.dislike_pizza, name='dislike_pizza'),
     path('like_pizza/<int:pk>', views.like_pizza, name='like_pizza'),
+    path('live/votes', live.vote_stream, name='vote_stream'),
+    path('search/', views.search, name='search'),
     path(
         'update_pizza/<int:pk>',
         views.UpdatePizza.as_view(),
         name='update_pizza'
     ),
     path('view/<int:pk>', views.view_pizza, name='view_pizza'),
+    path('vote/<int:pk>', live.vote_pizza, name='vote_pizza'),
 ]
@@ -1,16 +1,45 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Count
+from django.views.decorators.http import condition
 from django.views.generic.edit import UpdateView
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
 
+from pizzeria.query_budget import query_budget
+
+from .cache import cache_response, get_catalog_version, get_pizza_version
+from .conditional import (
+    create_catalog_etag, create_pizza_etag, get_catalog_last_modified,
+    get_pizza_last_modified
+)
 from .forms import IngredientForm, PizzaForm
-from .models import Pizza
+from .live import publish_vote_counts
+from .models import Ingredient, Pizza
+from .pagination import (
+    MAX_DATABASE_INT, create_next_page_url, paginate_by_keyset
+)
+from .search import RESULTS_PER_PAGE, search_pizzas
+from .votes import merge_pending_votes, record_vote
+
+# How the homepage sorts Pizzas when no other sort is chosen
+DEFAULT_SORTED_BY = '-time_created'
+
+# Every way the homepage can be sorted. Each has a matching index on Pizza.
+SORTED_BY_OPTIONS = [
+    DEFAULT_SORTED_BY, 'state', '-likes', '-dislikes', '-trending'
+]
 
 """ Views """
 
+# Each view has a query budget, see pizzeria/query_budget.py. The budgets
+# include loading the session and the logged in user.
+
 
+@query_budget(8)
 @login_required
 def create_ingredient(request):
     """
@@ -44,6 +73,7 @@ def create_ingredient(request):
     return render(request, 'workshop/create_ingredient.html', {'form': form})
 
 
+@query_budget(20)
 @login_required
 def create_pizza(request):
     """
@@ -66,6 +96,7 @@ def create_pizza(request):
     return render(request, 'workshop/create_pizza.html', {'form': form})
 
 
+@query_budget(12)
 @login_required
 def delete_pizza(request, pk: int):
     """
@@ -90,6 +121,7 @@ def delete_pizza(request, pk: int):
     return redirect('workshop:homepage')
 
 
+@query_budget(8)
 @login_required
 def dislike_pizza(request, pk: int):
     """
@@ -99,11 +131,13 @@ def dislike_pizza(request, pk: int):
     :param pk: The PK value of a Pizza Object
     :return: redirect to 'workshop:homepage'
     """
-    pizza = get_object_or_404(Pizza, pk=pk)
+    pizza = get_object_or_404(Pizza.objects.only('name'), pk=pk)
 
-    # Add one to the Pizza's dislikes and save it
-    pizza.dislikes += 1
-    pizza.save()
+    # Add one to the Pizza's dislikes in the database
+    record_vote(pizza, liked=False, user_id=request.user.pk)
+
+    # Show the new counts on every page open on the Pizza
+    publish_vote_counts(pizza.pk)
 
     # Create success message
     create_and_apply_liked_disliked_message(request, pizza.name, False)
@@ -111,6 +145,7 @@ def dislike_pizza(request, pk: int):
     return redirect('workshop:homepage')
 
 
+@query_budget(8)
 @login_required
 def like_pizza(request, pk: int):
     """
@@ -120,11 +155,13 @@ def like_pizza(request, pk: int):
     :param pk: The PK value of a Pizza Object
     :return: redirect to 'workshop:homepage'
     """
-    pizza = get_object_or_404(Pizza, pk=pk)
+    pizza = get_object_or_404(Pizza.objects.only('name'), pk=pk)
 
-    # Add one to the Pizza's likes and save it
-    pizza.likes += 1
-    pizza.save()
+    # Add one to the Pizza's likes in the database
+    record_vote(pizza, liked=True, user_id=request.user.pk)
+
+    # Show the new counts on every page open on the Pizza
+    publish_vote_counts(pizza.pk)
 
     # Create success message
     create_and_apply_liked_disliked_message(request, pizza.name, True)
@@ -132,6 +169,46 @@ def like_pizza(request, pk: int):
     return redirect('workshop:homepage')
 
 
+@query_budget(6)
+@condition(
+    etag_func=create_catalog_etag,
+    last_modified_func=get_catalog_last_modified
+)
+@cache_response(get_catalog_version)
+def search(request):
+    """
+    Allows a user to search Pizzas by name, summary, city and Ingredients
+
+    :param request: Standard Django request object
+    :return: Render 'workshop:homepage.html' with the best matches first
+    """
+    query = request.GET.get('q', '')
+    page = validate_page_number_or_404(request.GET.get('page', '1'))
+
+    pizza_ids, has_next_page = search_pizzas(query, page)
+
+    # Load the matching Pizzas, keeping them in the order they ranked
+    pizzas_by_id = create_homepage_queryset().in_bulk(pizza_ids)
+    pizzas = [pizzas_by_id[pk] for pk in pizza_ids if pk in pizzas_by_id]
+    merge_pending_votes(pizzas)
+
+    latest_pizzas = Pizza.objects.order_by('-time_created')[:2]
+
+    return render(
+        request,
+        'workshop/homepage.html',
+        {
+            'pizzas': pizzas,
+            'latest_pizzas': latest_pizzas,
+            'next_page_url': create_next_page_url(
+                request, str(page + 1) if has_next_page else None, 'page'
+            ),
+            'searching_by_message': create_searching_by_message(query)
+        }
+    )
+
+
+@method_decorator(query_budget(24), name='dispatch')
 class UpdatePizza(LoginRequiredMixin, UpdateView):
     """Allows a user to update a Pizza object"""
     model = Pizza
@@ -139,6 +216,12 @@ class UpdatePizza(LoginRequiredMixin, UpdateView):
     template_name = 'workshop/update_pizza.html'
 
 
+@query_budget(6)
+@condition(
+    etag_func=create_pizza_etag,
+    last_modified_func=get_pizza_last_modified
+)
+@cache_response(get_pizza_version)
 def view_pizza(request, pk: int):
     """
     Allows a user to view a particular pizza
@@ -147,11 +230,20 @@ def view_pizza(request, pk: int):
     :param pk: Primary key for Pizza object
     :return: render 'workshop/view_pizza.html'
     """
-    pizza = get_object_or_404(Pizza, pk=pk)
+    pizza = get_object_or_404(create_homepage_queryset(), pk=pk)
+
+    # Show any votes that have not been added to the Pizza yet
+    merge_pending_votes([pizza])
 
     return render(request, 'workshop/view_pizza.html', {'pizza': pizza})
 
 
+@query_budget(8)
+@condition(
+    etag_func=create_catalog_etag,
+    last_modified_func=get_catalog_last_modified
+)
+@cache_response(get_catalog_version)
 def workshop_homepage(request):
     """
     The main homepage for the pizzeria project
@@ -159,20 +251,42 @@ def workshop_homepage(request):
     :param request: Standard Django request object
     :return: Render 'workshop:homepage.html'
     """
-    all_pizzas = Pizza.objects.all()
+    # Only show the Pizzas with every Ingredient asked for
+    ingredient_names = request.GET.getlist('ingredient')
+    all_pizzas = filter_by_ingredients(
+        create_homepage_queryset(), ingredient_names
+    )
+
+    # Grab the page of Pizzas the cursor points to, newest first
+    pizzas, next_cursor = paginate_by_keyset(
+        all_pizzas, DEFAULT_SORTED_BY, request.GET.get('cursor')
+    )
+    merge_pending_votes(pizzas)
 
-    # Sort all_pizzas by the newest time created and grab the first two
-    latest_pizzas = all_pizzas.order_by('-time_created')[:2]
+    # Sort all Pizzas by the newest time created and grab the first two
+    latest_pizzas = Pizza.objects.order_by('-time_created')[:2]
 
     return render(
         request,
         'workshop/homepage.html',
 
-        # Send the all_pizza and latest_pizza queryset to the template
-        {'pizzas': all_pizzas, 'latest_pizzas': latest_pizzas}
+        # Send the Pizza page and latest_pizza queryset to the template
+        {
+            'pizzas': pizzas,
+            'latest_pizzas': latest_pizzas,
+            'next_page_url': create_next_page_url(request, next_cursor),
+            'ingredient_names': ingredient_names,
+            'ingredient_query': create_ingredient_query(ingredient_names)
+        }
     )
 
 
+@query_budget(8)
+@condition(
+    etag_func=create_catalog_etag,
+    last_modified_func=get_catalog_last_modified
+)
+@cache_response(get_catalog_version)
 def workshop_homepage_sorted(request, sorted_by: str):
     """
     Allows the main homepage to be sorted by various conditions
@@ -184,22 +298,32 @@ def workshop_homepage_sorted(request, sorted_by: str):
     # Ensure that the sorted by string is correct or raise 404
     validate_sorted_by_string_or_404(sorted_by)
 
-    all_pizzas_query = Pizza.objects.all()
+    # Only show the Pizzas with every Ingredient asked for
+    ingredient_names = request.GET.getlist('ingredient')
+    all_pizzas_query = filter_by_ingredients(
+        create_homepage_queryset(), ingredient_names
+    )
 
-    # Sort all_pizzas_query based upon the sort_by parameter
-    all_pizzas = all_pizzas_query.order_by(sorted_by)
+    # Grab the page of Pizzas the cursor points to, sorted by sorted_by
+    pizzas, next_cursor = paginate_by_keyset(
+        all_pizzas_query, sorted_by, request.GET.get('cursor')
+    )
+    merge_pending_votes(pizzas)
 
-    latest_pizzas = all_pizzas_query.order_by('-time_created')[:2]
+    latest_pizzas = Pizza.objects.order_by('-time_created')[:2]
     searching_by_message = create_searching_by_message(sorted_by)
 
     return render(
         request,
         'workshop/homepage.html',
 
-        # Send the all_pizza and latest_pizza queryset to the template
+        # Send the Pizza page and latest_pizza queryset to the template
         {
-            'pizzas': all_pizzas,
+            'pizzas': pizzas,
             'latest_pizzas': latest_pizzas,
+            'next_page_url': create_next_page_url(request, next_cursor),
+            'ingredient_names': ingredient_names,
+            'ingredient_query': create_ingredient_query(ingredient_names),
             'searching_by_message': searching_by_message
         }
     )
@@ -208,6 +332,20 @@ def workshop_homepage_sorted(request, sorted_by: str):
 """Functions"""
 
 
+def create_homepage_queryset():
+    """
+    Creates the Pizza queryset used to display Pizzas on the homepage
+
+    The crust is joined in and the ingredients are prefetched, so rendering
+    the Pizzas takes the same number of queries no matter how many exist.
+
+    :return: A Pizza queryset with its crust and ingredients preloaded
+    """
+    return Pizza.objects.select_related('crust').prefetch_related(
+        'ingredients'
+    )
+
+
 def create_and_apply_liked_disliked_message(request, name: str, liked: bool):
     """
     Creates a django message and applies it
@@ -225,6 +363,16 @@ def create_and_apply_liked_disliked_message(request, name: str, liked: bool):
     messages.success(request, message)
 
 
+def create_ingredient_query(ingredient_names: list):
+    """
+    Creates a query string filtering the homepage by Ingredients
+
+    :param ingredient_names: The names of the Ingredients being filtered by
+    :return: A string in the format of 'ingredient=Onion&ingredient=Bacon'
+    """
+    return urlencode({'ingredient': ingredient_names}, doseq=True)
+
+
 def create_searching_by_message(searching_by: str):
     """
     Creates a message informing the user how something is being searched
@@ -240,6 +388,61 @@ def create_searching_by_message(searching_by: str):
     return f'Searching: {formatted_string}'
 
 
+def filter_by_ingredients(queryset, ingredient_names: list):
+    """
+    Narrows a Pizza queryset down to the Pizzas with every Ingredient named
+
+    Rather than joining the Pizza/Ingredient table once per Ingredient, the
+    Pizzas are found with a single GROUP BY over the table's
+    (ingredient_id, pizza_id) index.
+
+    :param queryset: A Pizza queryset
+    :param ingredient_names:
+        The Ingredient names, title cased the same way IngredientForm does
+    :return: The filtered queryset
+    """
+    names = {name.title() for name in ingredient_names}
+    if not names:
+        return queryset
+
+    ingredient_ids = list(
+        Ingredient.objects.filter(name__in=names).values_list('pk', flat=True)
+    )
+
+    # An Ingredient that does not exist can not be on any Pizza
+    if len(ingredient_ids) < len(names):
+        return queryset.none()
+
+    pizza_ids = Pizza.ingredients.through.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values('pizza_id').annotate(
+        matches=Count('ingredient_id')
+    ).filter(matches=len(ingredient_ids)).values('pizza_id')
+
+    return queryset.filter(pk__in=pizza_ids)
+
+
+def validate_page_number_or_404(page: str):
+    """
+    Ensures that page is a page number
+
+    Pages so far in that their offset would not fit in the database are not
+    valid either.
+
+    :param page: A string holding the page number
+    :return if valid: The page number as an int
+    :return if False: HTTP 404
+    """
+    try:
+        number = int(page) if page.isascii() else 0
+    except ValueError:
+        number = 0
+
+    if 0 < number <= MAX_DATABASE_INT // (RESULTS_PER_PAGE + 1):
+        return number
+    raise Http404('The page requested can not be found.')
+
+
 def validate_sorted_by_string_or_404(sorted_by: str):
     """
     Ensures that searching_by is a valid option
@@ -248,8 +451,6 @@ def validate_sorted_by_string_or_404(sorted_by: str):
     :return if valid: boolean stating True
     :return if False: HTTP 404
     """
-    valid_options = ['state', '-likes', '-dislikes']
-
-    if sorted_by in valid_options:
+    if sorted_by in SORTED_BY_OPTIONS:
         return True
     raise Http404('The search requested can not be found.')
@@ -0,0 +1,717 @@
+import os
+import random
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files import locks
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .cache import bump_catalog_version, bump_pizza_version
+from .leaderboards import update_leaderboards
+from .models import (
+    ImportedVoteEventFile, Pizza, PizzaVoteDay, PizzaVoteShard,
+    PizzaVoteWindow, VoteEvent, VoteRollupCheckpoint
+)
+
+# Cache keys used by the vote buffer
+BUFFERED_VOTES_KEY = 'workshop:votes:{pizza_id}:{field_name}'
+FLUSH_LOCK_KEY = 'workshop:votes:flush_lock'
+FLUSHED_AT_KEY = 'workshop:votes:flushed_at'
+FLUSHED_COUNT_KEY = 'workshop:votes:flushed'
+REGISTERED_COUNT_KEY = 'workshop:votes:registered'
+REGISTERED_VOTE_KEY = 'workshop:votes:registered:{number}'
+SHARDS_SYNCED_KEY = 'workshop:votes:shards_synced'
+
+# Cache key used to run one vote event roll up at a time
+ROLLUP_LOCK_KEY = 'workshop:vote_events:rollup_lock'
+
+# How many vote events or rollup rows are written to the database at a time
+EVENT_BATCH_SIZE = 500
+
+# The endings of vote event files being written to and being imported
+EVENT_FILE_SUFFIX = '.log'
+IMPORTING_FILE_SUFFIX = '.importing'
+
+# How long the names of imported vote event files are kept, so a file left
+# behind by an import that stopped part way is not imported again
+IMPORTED_FILE_RETENTION = timedelta(days=7)
+
+# How many VoteEvent rows are rolled up in each transaction
+ROLLUP_BATCH_SIZE = 5000
+
+VOTE_FIELD_NAMES = ['likes', 'dislikes']
+
+# Cache backends that keep a separate store in each process
+PER_PROCESS_CACHES = (DummyCache, LocMemCache)
+
+
+def record_vote(pizza, liked: bool, user_id: int = None):
+    """
+    Adds a like or dislike to a Pizza, and logs it as a vote event
+
+    The counter is increased by the database in a single UPDATE, so votes
+    cast at the same time are never lost and no other columns are written.
+    When WORKSHOP_VOTE_BUFFERING is on the vote goes into the vote buffer
+    instead and is written to the database later in a batch. Otherwise, when
+    WORKSHOP_VOTE_STORAGE is 'sharded', the vote goes to one of the Pizza's
+    PizzaVoteShard rows.
+
+    :param pizza: The Pizza object being voted on
+    :param liked: Whether the Pizza was liked or disliked
+    :param user_id: The id of the User who voted, or None
+    """
+    field_name = 'likes' if liked else 'dislikes'
+    counted = False
+
+    if settings.WORKSHOP_VOTE_BUFFERING:
+        buffer_vote(pizza.pk, field_name)
+    elif settings.WORKSHOP_VOTE_STORAGE == 'sharded':
+        shard_vote(pizza.pk, field_name)
+    else:
+        Pizza.objects.filter(pk=pizza.pk).update(
+            **{field_name: F(field_name) + 1}
+        )
+        update_leaderboards([pizza.pk])
+        counted = True
+
+    log_vote(pizza.pk, user_id, liked)
+
+    # Stop serving the Pizza's cached page with the old vote counts. The
+    # listings only change once the vote is in the Pizza's own columns, for
+    # buffered and sharded votes that is done by add_votes_to_pizzas.
+    bump_pizza_version(pizza.pk, catalog=counted)
+
+
+def add_votes_to_pizzas(pending_votes: dict):
+    """
+    Adds new votes to the Pizzas' likes and dislikes in the database
+
+    Pizzas with the same number of new likes and dislikes are updated
+    together, so far fewer UPDATEs are needed than there are Pizzas.
+
+    :param pending_votes:
+        A dictionary in the format of
+        {pizza_id: {'likes': int, 'dislikes': int}}
+    """
+    batches = defaultdict(list)
+    for pizza_id, votes in pending_votes.items():
+        batches[(votes['likes'], votes['dislikes'])].append(pizza_id)
+
+    with transaction.atomic():
+        for (likes, dislikes), batch_ids in batches.items():
+            Pizza.objects.filter(pk__in=batch_ids).update(
+                likes=F('likes') + likes,
+                dislikes=F('dislikes') + dislikes
+            )
+
+    # The vote counts shown do not change, but the sort order by them can
+    if pending_votes:
+        bump_catalog_version()
+        update_leaderboards(pending_votes)
+
+
+def merge_pending_votes(pizzas):
+    """
+    Adds any votes not yet in the Pizzas' own columns to their counts
+
+    This covers votes waiting in the vote buffer and in PizzaVoteShard rows,
+    and lets a user see their vote right away.
+
+    :param pizzas: A list of Pizza objects to update in place
+    :return: The same Pizza objects
+    """
+    pending_votes = []
+    if settings.WORKSHOP_VOTE_BUFFERING:
+        pending_votes.append(
+            get_buffered_votes(pizza.pk for pizza in pizzas)
+        )
+    if settings.WORKSHOP_VOTE_STORAGE == 'sharded':
+        pending_votes.append(
+            get_sharded_votes(pizza.pk for pizza in pizzas)
+        )
+
+    for votes_by_pizza in pending_votes:
+        for pizza in pizzas:
+            votes = votes_by_pizza.get(pizza.pk)
+            if votes:
+                pizza.likes += votes['likes']
+                pizza.dislikes += votes['dislikes']
+
+    return pizzas
+
+
+"""Vote buffer"""
+
+
+def buffer_vote(pizza_id: int, field_name: str):
+    """
+    Adds a vote to the vote buffer and flushes the buffer when it is due
+
+    Every vote is registered under an increasing number, so a flush knows
+    which Pizzas have votes waiting without scanning the whole table.
+
+    :param pizza_id: The id of the Pizza being voted on
+    :param field_name: Either 'likes' or 'dislikes'
+    """
+    cache = get_vote_buffer_cache()
+
+    key = BUFFERED_VOTES_KEY.format(pizza_id=pizza_id, field_name=field_name)
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+    cache.add(REGISTERED_COUNT_KEY, 0, timeout=None)
+    number = cache.incr(REGISTERED_COUNT_KEY)
+    cache.set(
+        REGISTERED_VOTE_KEY.format(number=number), pizza_id, timeout=None
+    )
+
+    # Flush once enough votes are waiting or the last flush is too old
+    waiting = number - cache.get(FLUSHED_COUNT_KEY, 0)
+    flushed_at = cache.get_or_set(FLUSHED_AT_KEY, time.time(), timeout=None)
+    interval = settings.WORKSHOP_VOTE_BUFFER_FLUSH_INTERVAL
+
+    if (waiting >= settings.WORKSHOP_VOTE_BUFFER_FLUSH_SIZE or
+            time.time() - flushed_at >= interval):
+        flush_vote_buffer()
+
+
+def flush_vote_buffer():
+    """
+    Writes every buffered vote to the database
+
+    Only one flush can run at a time, and votes cast during a flush are kept
+    for the next one.
+
+    :return: The number of Pizzas that were updated
+    """
+    cache = get_vote_buffer_cache()
+
+    # Another flush is already running
+    if not cache.add(FLUSH_LOCK_KEY, True, timeout=60):
+        return 0
+
+    try:
+        flushed = cache.get(FLUSHED_COUNT_KEY, 0)
+        registered = cache.get(REGISTERED_COUNT_KEY, 0)
+
+        registered_keys = [
+            REGISTERED_VOTE_KEY.format(number=number)
+            for number in range(flushed + 1, registered + 1)
+        ]
+        registered_votes = cache.get_many(registered_keys)
+
+        # Stop at the first vote that is still being registered, it will be
+        # picked up by the next flush
+        pizza_ids = set()
+        consumed_keys = []
+        for key in registered_keys:
+            if key not in registered_votes:
+                break
+            pizza_ids.add(registered_votes[key])
+            consumed_keys.append(key)
+
+        pending_votes = get_buffered_votes(pizza_ids)
+        add_votes_to_pizzas(pending_votes)
+
+        # The votes are saved, so take them out of the buffer. Any votes that
+        # came in during the flush stay behind.
+        for pizza_id, votes in pending_votes.items():
+            for field_name in VOTE_FIELD_NAMES:
+                if votes[field_name]:
+                    cache.decr(
+                        BUFFERED_VOTES_KEY.format(
+                            pizza_id=pizza_id, field_name=field_name
+                        ),
+                        votes[field_name]
+                    )
+
+        cache.delete_many(consumed_keys)
+        cache.set(
+            FLUSHED_COUNT_KEY, flushed + len(consumed_keys), timeout=None
+        )
+        cache.set(FLUSHED_AT_KEY, time.time(), timeout=None)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+    return len(pending_votes)
+
+
+def get_buffered_votes(pizza_ids):
+    """
+    Looks up the votes waiting in the buffer for some Pizzas
+
+    :param pizza_ids: An iterable of Pizza ids
+    :return:
+        A dictionary in the format of
+        {pizza_id: {'likes': int, 'dislikes': int}}, holding only the Pizzas
+        that have votes waiting
+    """
+    keys = {
+        BUFFERED_VOTES_KEY.format(pizza_id=pizza_id, field_name=field_name):
+            (pizza_id, field_name)
+        for pizza_id in pizza_ids
+        for field_name in VOTE_FIELD_NAMES
+    }
+
+    pending_votes = {}
+    for key, count in get_vote_buffer_cache().get_many(keys).items():
+        pizza_id, field_name = keys[key]
+        if count:
+            votes = pending_votes.setdefault(
+                pizza_id, {'likes': 0, 'dislikes': 0}
+            )
+            votes[field_name] = count
+
+    return pending_votes
+
+
+def get_vote_buffer_cache():
+    """
+    Finds the cache the vote buffer is kept in
+
+    :return: The cache named by WORKSHOP_VOTE_BUFFER_CACHE
+    """
+    return caches[settings.WORKSHOP_VOTE_BUFFER_CACHE]
+
+
+def is_vote_buffer_shared():
+    """
+    Checks if every process sees the same vote buffer
+
+    :return: False when WORKSHOP_VOTE_BUFFER_CACHE is kept in each process
+    """
+    return not isinstance(get_vote_buffer_cache(), PER_PROCESS_CACHES)
+
+
+"""Vote shards"""
+
+
+def get_sharded_votes(pizza_ids):
+    """
+    Adds up the votes held in the PizzaVoteShard rows for some Pizzas
+
+    :param pizza_ids: An iterable of Pizza ids
+    :return:
+        A dictionary in the format of
+        {pizza_id: {'likes': int, 'dislikes': int}}, holding only the Pizzas
+        that have shard rows
+    """
+    shard_totals = PizzaVoteShard.objects.filter(
+        pizza_id__in=list(pizza_ids)
+    ).values('pizza_id').annotate(likes=Sum('likes'), dislikes=Sum('dislikes'))
+
+    return {
+        totals['pizza_id']: {
+            'likes': totals['likes'], 'dislikes': totals['dislikes']
+        }
+        for totals in shard_totals
+    }
+
+
+def shard_vote(pizza_id: int, field_name: str):
+    """
+    Adds a vote to a randomly picked PizzaVoteShard row of a Pizza
+
+    The shard totals are added into the Pizza's own columns at most once
+    every WORKSHOP_VOTE_SHARD_SYNC_INTERVAL seconds.
+
+    :param pizza_id: The id of the Pizza being voted on
+    :param field_name: Either 'likes' or 'dislikes'
+    """
+    shard = random.randrange(settings.WORKSHOP_VOTE_SHARD_COUNT)
+    shard_rows = PizzaVoteShard.objects.filter(pizza_id=pizza_id, shard=shard)
+
+    updated = shard_rows.update(**{field_name: F(field_name) + 1})
+
+    # The first vote on a shard creates its row
+    if not updated:
+        try:
+            with transaction.atomic():
+                PizzaVoteShard.objects.create(
+                    pizza_id=pizza_id, shard=shard, **{field_name: 1}
+                )
+        except IntegrityError:
+            # Someone else created the row first, so add to theirs
+            shard_rows.update(**{field_name: F(field_name) + 1})
+
+    # cache.add only succeeds once the last sync's key has expired
+    if caches['default'].add(
+            SHARDS_SYNCED_KEY, True,
+            timeout=settings.WORKSHOP_VOTE_SHARD_SYNC_INTERVAL):
+        try:
+            sync_vote_shards()
+        except OperationalError:
+            # SQLite gives up straight away when a transaction that has
+            # already read has to wait to write. The vote itself was saved,
+            # so let the next vote try the sync again.
+            caches['default'].delete(SHARDS_SYNCED_KEY)
+
+
+def sync_vote_shards():
+    """
+    Moves the votes held in PizzaVoteShard rows into the Pizzas' own columns
+
+    The Pizzas' likes and dislikes are used for listing and sorting, so this
+    keeps them close to the real totals. Votes cast while syncing stay in
+    their shards for the next sync.
+
+    :return: The number of Pizzas that were updated
+    """
+    with transaction.atomic():
+        shards = list(
+            PizzaVoteShard.objects.select_for_update().exclude(
+                likes=0, dislikes=0
+            ).values('id', 'pizza_id', 'likes', 'dislikes')
+        )
+
+        pending_votes = {}
+        shard_batches = defaultdict(list)
+        for shard in shards:
+            votes = pending_votes.setdefault(
+                shard['pizza_id'], {'likes': 0, 'dislikes': 0}
+            )
+            votes['likes'] += shard['likes']
+            votes['dislikes'] += shard['dislikes']
+            shard_batches[(shard['likes'], shard['dislikes'])].append(
+                shard['id']
+            )
+
+        add_votes_to_pizzas(pending_votes)
+
+        # Take away only what was moved, in case new votes came in
+        for (likes, dislikes), shard_ids in shard_batches.items():
+            PizzaVoteShard.objects.filter(pk__in=shard_ids).update(
+                likes=F('likes') - likes,
+                dislikes=F('dislikes') - dislikes
+            )
+
+    return len(pending_votes)
+
+
+"""Vote events"""
+
+# Every vote is also logged as a VoteEvent, for its history. Casting a vote
+# only appends a line to this process's vote event file, so voting never
+# waits on the database for it. import_vote_events moves the files into
+# VoteEvent in batches, and roll_up_vote_events then adds the events to the
+# PizzaVoteWindow (hourly) and PizzaVoteDay rows, so trending and reports
+# read a few small rows instead of every event. Run the roll_up_votes
+# command regularly, it does both.
+#
+# An import claims a file by renaming it, then locks it until any vote being
+# written to it is done. Writers hold a shared lock while they append and
+# check the file is still in place first, starting a new one when it is not.
+
+
+class VoteEventWriter:
+    """Appends vote events to a file of this process's own"""
+
+    def __init__(self):
+        """Creates a writer, its file is opened on the first vote"""
+        self.lock = threading.Lock()
+        self.file = None
+        self.directory = None
+        self.path = None
+
+        # The process the file was opened by, so a forked worker opens its own
+        self.pid = None
+
+    def write(self, line: str):
+        """
+        Appends a line to the file, starting a new file if it was claimed
+
+        :param line: A line of text, ending in a newline
+        """
+        data = line.encode()
+
+        with self.lock:
+            while True:
+                if not self.is_open():
+                    self.open()
+
+                locks.lock(self.file, locks.LOCK_SH)
+                try:
+                    if self.is_in_place():
+                        self.file.write(data)
+                        return
+                finally:
+                    locks.unlock(self.file)
+
+                # An import has claimed the file
+                self.file.close()
+                self.file = None
+
+    def is_open(self):
+        """
+        Checks if this process has a file open in WORKSHOP_VOTE_EVENT_DIR
+
+        :return: boolean
+        """
+        return (self.file is not None and self.pid == os.getpid() and
+                self.directory == settings.WORKSHOP_VOTE_EVENT_DIR)
+
+    def is_in_place(self):
+        """
+        Checks the open file has not been renamed by an import
+
+        :return: boolean
+        """
+        try:
+            in_place = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        return in_place.st_ino == os.fstat(self.file.fileno()).st_ino
+
+    def open(self):
+        """Starts a new file, with a name no other process will use"""
+        if self.file is not None and self.pid == os.getpid():
+            self.file.close()
+
+        self.directory = settings.WORKSHOP_VOTE_EVENT_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.pid = os.getpid()
+        name = f'{socket.gethostname()}-{self.pid}-{time.time_ns()}'
+        self.path = os.path.join(self.directory, name + EVENT_FILE_SUFFIX)
+        self.file = open(self.path, 'ab', buffering=0)
+
+
+# The vote event writer for this process
+vote_event_writer = VoteEventWriter()
+
+
+def log_vote(pizza_id: int, user_id: int, liked: bool):
+    """
+    Appends a vote to this process's vote event file
+
+    :param pizza_id: The id of the Pizza voted on
+    :param user_id: The id of the User who voted, or None
+    :param liked: Whether the Pizza was liked or disliked
+    """
+    user_id = '' if user_id is None else user_id
+    vote_event_writer.write(
+        f'{pizza_id},{user_id},{int(liked)},{time.time()}\n'
+    )
+
+
+def import_vote_events():
+    """
+    Moves the events in every vote event file into VoteEvent
+
+    :return: The number of events that were imported
+    """
+    directory = settings.WORKSHOP_VOTE_EVENT_DIR
+    try:
+        file_names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return 0
+
+    imported = 0
+    for file_name in file_names:
+        path = os.path.join(directory, file_name)
+        name, suffix = os.path.splitext(file_name)
+
+        if suffix == EVENT_FILE_SUFFIX:
+            # Only one import can claim each file
+            claimed_path = os.path.join(
+                directory, name + IMPORTING_FILE_SUFFIX
+            )
+            try:
+                os.rename(path, claimed_path)
+            except FileNotFoundError:
+                continue
+        elif suffix == IMPORTING_FILE_SUFFIX:
+            # Left behind by an import that stopped part way
+            claimed_path = path
+        else:
+            continue
+
+        imported += import_vote_event_file(name, claimed_path)
+
+    ImportedVoteEventFile.objects.filter(
+        imported_at__lt=timezone.now() - IMPORTED_FILE_RETENTION
+    ).delete()
+
+    return imported
+
+
+def import_vote_event_file(name: str, path: str):
+    """
+    Adds the events in a claimed vote event file to VoteEvent and deletes it
+
+    :param name: The file's name, without its ending
+    :param path: Where the claimed file is
+    :return: The number of events that were imported
+    """
+    try:
+        with open(path, 'rb') as event_file:
+            # Wait for any vote still being written to it
+            locks.lock(event_file, locks.LOCK_EX)
+            lines = event_file.read().decode(errors='replace').splitlines()
+    except FileNotFoundError:
+        return 0
+
+    events = []
+    for line in lines:
+        try:
+            pizza_id, user_id, liked, timestamp = line.split(',')
+            events.append(VoteEvent(
+                pizza_id=int(pizza_id),
+                user_id=int(user_id) if user_id else None,
+                liked=liked == '1',
+                time=datetime.fromtimestamp(
+                    float(timestamp), tz=dt_timezone.utc
+                )
+            ))
+        except ValueError:
+            # Half a line, from a process that stopped while writing it
+            continue
+
+    try:
+        with transaction.atomic():
+            ImportedVoteEventFile.objects.create(name=name)
+            VoteEvent.objects.bulk_create(events, batch_size=EVENT_BATCH_SIZE)
+    except IntegrityError:
+        # Another import got to the file first
+        events = []
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+    return len(events)
+
+
+def roll_up_vote_events():
+    """
+    Adds every VoteEvent not yet rolled up to the hourly and daily rows
+
+    The vote event files are imported first. The rows and
+    VoteRollupCheckpoint are saved together, a batch of events at a time, so
+    each event is counted exactly once. Events for Pizzas that have been
+    deleted are skipped.
+
+    :return: The number of events that were rolled up
+    """
+    cache = get_vote_buffer_cache()
+    import_vote_events()
+
+    # Another roll up is already running
+    if not cache.add(ROLLUP_LOCK_KEY, True, timeout=300):
+        return 0
+
+    rolled_up = 0
+    try:
+        while True:
+            with transaction.atomic():
+                checkpoint = VoteRollupCheckpoint.objects.select_for_update(
+                ).get_or_create(pk=1)[0]
+
+                events = list(
+                    VoteEvent.objects.filter(
+                        id__gt=checkpoint.last_event_id
+                    ).order_by('id').values_list(
+                        'id', 'pizza_id', 'liked', 'time'
+                    )[:ROLLUP_BATCH_SIZE]
+                )
+                if not events:
+                    break
+
+                add_events_to_rollups(events)
+
+                checkpoint.last_event_id = events[-1][0]
+                checkpoint.save()
+
+            rolled_up += len(events)
+    finally:
+        cache.delete(ROLLUP_LOCK_KEY)
+
+    return rolled_up
+
+
+def add_events_to_rollups(events: list):
+    """
+    Counts events into the hourly and daily rows of their Pizzas
+
+    :param events: A list of (id, pizza_id, liked, time) tuples
+    """
+    hours = defaultdict(lambda: {'likes': 0, 'dislikes': 0})
+    days = defaultdict(lambda: {'likes': 0, 'dislikes': 0})
+
+    for _, pizza_id, liked, moment in events:
+        field_name = 'likes' if liked else 'dislikes'
+        moment = timezone.localtime(moment)
+
+        hours[(pizza_id, get_hour(moment))][field_name] += 1
+        days[(pizza_id, moment.date())][field_name] += 1
+
+    pizza_ids = set(
+        Pizza.objects.filter(
+            pk__in={pizza_id for pizza_id, _ in hours}
+        ).values_list('pk', flat=True)
+    )
+
+    for model, period_field, counts in [(PizzaVoteWindow, 'hour', hours),
+                                        (PizzaVoteDay, 'day', days)]:
+        add_to_rollup(model, period_field, {
+            key: votes for key, votes in counts.items()
+            if key[0] in pizza_ids
+        })
+
+
+def add_to_rollup(model, period_field: str, counts: dict):
+    """
+    Adds vote counts to hourly or daily rows, creating the missing rows
+
+    :param model: PizzaVoteWindow or PizzaVoteDay
+    :param period_field: The model's period field, 'hour' or 'day'
+    :param counts:
+        A dictionary in the format of
+        {(pizza_id, period): {'likes': int, 'dislikes': int}}
+    """
+    rows = model.objects.filter(**{
+        'pizza_id__in': {pizza_id for pizza_id, _ in counts},
+        f'{period_field}__in': {period for _, period in counts},
+    })
+    existing = {
+        (row.pizza_id, getattr(row, period_field)): row for row in rows
+    }
+
+    changed = []
+    created = []
+    for (pizza_id, period), votes in counts.items():
+        row = existing.get((pizza_id, period))
+        if row is None:
+            created.append(
+                model(pizza_id=pizza_id, **{period_field: period}, **votes)
+            )
+        else:
+            row.likes += votes['likes']
+            row.dislikes += votes['dislikes']
+            changed.append(row)
+
+    model.objects.bulk_update(
+        changed, ['likes', 'dislikes'], batch_size=EVENT_BATCH_SIZE
+    )
+    model.objects.bulk_create(created, batch_size=EVENT_BATCH_SIZE)
+
+
+def get_hour(moment):
+    """
+    Finds the start of the hour a moment falls in
+
+    :param moment: A datetime
+    :return: The datetime with the minutes and anything smaller cleared
+    """
+    return moment.replace(minute=0, second=0, microsecond=0)